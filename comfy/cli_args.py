@@ -100,6 +100,7 @@ class LatentPreviewMethod(enum.Enum):
 parser.add_argument("--preview-method", type=LatentPreviewMethod, default=LatentPreviewMethod.NoPreviews, help="Default preview method for sampler nodes.", action=EnumAction)
 
 parser.add_argument("--preview-size", type=int, default=512, help="Sets the maximum preview size for sampler nodes.")
+parser.add_argument("--preview-video-frames", type=int, default=0, help="Send animated previews with up to this many frames for video latents instead of only their first frame. 0 (default) disables animated previews.")
 
 cache_group = parser.add_mutually_exclusive_group()
 cache_group.add_argument("--cache-classic", action="store_true", help="Use the old style (aggressive) caching.")
@@ -115,6 +116,7 @@ attn_group.add_argument("--use-sage-attention", action="store_true", help="Use s
 attn_group.add_argument("--use-flash-attention", action="store_true", help="Use FlashAttention.")
 
 parser.add_argument("--disable-xformers", action="store_true", help="Disable xformers.")
+parser.add_argument("--attention-oom-fallback", action="store_true", help="Retry attention in query chunks instead of failing when it runs out of memory. Basic attention gets chunked ahead of time when its attention matrix is predicted to not fit.")
 
 upcast = parser.add_mutually_exclusive_group()
 upcast.add_argument("--force-upcast-attention", action="store_true", help="Force enable attention upcasting, please report if it fixes black images.")
@@ -139,6 +141,10 @@ parser.add_argument("--default-hashing-function", type=str, choices=['md5', 'sha
 
 parser.add_argument("--disable-smart-memory", action="store_true", help="Force ComfyUI to agressively offload to regular ram instead of keeping models in vram when it can.")
 parser.add_argument("--deterministic", action="store_true", help="Make pytorch use slower deterministic algorithms when it can. Note that this might not make images deterministic in all cases.")
+parser.add_argument("--noise-generator", type=str, choices=['cpu', 'philox'], default='cpu', help="Random noise generator used for sampling. cpu (default) generates noise on the CPU and matches the seeds of older versions. philox generates counter based noise directly on the sampling device, each batch item only depends on the seed and its batch index.")
+parser.add_argument("--quantize-cache-size", type=float, default=64.0, help="Maximum size in GB of the disk cache of models quantized on load (user/cache/quantized_models). Every model and quantization format is stored as a full quantized copy, the least recently used ones get deleted when the cache grows over this. 0 disables the cache.")
+parser.add_argument("--vae-decode-cache", type=float, default=0, help="Maximum size in GB of the VAE decode results kept in RAM to reuse when the same latent gets decoded again by a different node. Disabled by default.")
+parser.add_argument("--png-compression", type=str, choices=["default", "fast", "auto"], default="default", help="PNG compression profile of the image save nodes. default uses compress level 4, fast uses level 1 which saves several times faster for larger files, auto uses fast only for large batches.")
 
 class PerformanceFeature(enum.Enum):
     Fp16Accumulation = "fp16_accumulation"
@@ -3,11 +3,14 @@ from typing import TYPE_CHECKING, Callable
 import torch
 import numpy as np
 import collections
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
 import logging
 import comfy.model_management
 import comfy.patcher_extension
+from comfy.patcher_extension import CallbacksMP
 if TYPE_CHECKING:
     from comfy.model_base import BaseModel
     from comfy.model_patcher import ModelPatcher
@@ -94,7 +97,7 @@ class ContextFuseMethod:
 
 ContextResults = collections.namedtuple("ContextResults", ['window_idx', 'sub_conds_out', 'sub_conds', 'window'])
 class IndexListContextHandler(ContextHandlerABC):
-    def __init__(self, context_schedule: ContextSchedule, fuse_method: ContextFuseMethod, context_length: int=1, context_overlap: int=0, context_stride: int=1, closed_loop=False, dim=0):
+    def __init__(self, context_schedule: ContextSchedule, fuse_method: ContextFuseMethod, context_length: int=1, context_overlap: int=0, context_stride: int=1, closed_loop=False, dim=0, batch_windows=False):
         self.context_schedule = context_schedule
         self.fuse_method = fuse_method
         self.context_length = context_length
@@ -102,7 +105,12 @@ class IndexListContextHandler(ContextHandlerABC):
         self.context_stride = context_stride
         self.closed_loop = closed_loop
         self.dim = dim
+        # stack windows of the same length into one forward pass when there is enough free memory;
+        # only possible when windows are not on the batch dim since the batch dim is used for stacking
+        self.batch_windows = batch_windows
         self._step = 0
+        # threads of the devices, kept for the whole sampling run
+        self.executor: ThreadPoolExecutor = None
 
         self.callbacks = {}
 
@@ -191,11 +199,24 @@ class IndexListContextHandler(ContextHandlerABC):
         for callback in comfy.patcher_extension.get_all_callbacks(IndexListCallbacks.EXECUTE_START, self.callbacks):
             callback(self, model, x_in, conds, timestep, model_options)
 
-        for enum_window in enumerated_context_windows:
-            results = self.evaluate_context_windows(calc_cond_batch, model, x_in, conds, timestep, [enum_window], model_options)
+        device_models = get_multidevice_models(model)
+        if len(device_models) > 0 and len(enumerated_context_windows) > 1 and self.conds_allow_split(conds):
+            results = self.evaluate_context_windows_multidevice(calc_cond_batch, model, device_models, x_in, conds, timestep, enumerated_context_windows, model_options)
+            # combine in window order so the fused result is the same as a sequential run
+            for result in sorted(results, key=lambda r: r.window_idx):
+                self.combine_context_window_results(x_in, result.sub_conds_out, result.sub_conds, result.window, result.window_idx, len(enumerated_context_windows), timestep,
+                                            conds_final, counts_final, biases_final)
+        elif self.batch_windows and self.dim > 0 and len(enumerated_context_windows) > 1 and self.conds_allow_split(conds):
+            results = self.evaluate_context_windows_batched(calc_cond_batch, model, x_in, conds, timestep, enumerated_context_windows, model_options)
             for result in results:
                 self.combine_context_window_results(x_in, result.sub_conds_out, result.sub_conds, result.window, result.window_idx, len(enumerated_context_windows), timestep,
                                             conds_final, counts_final, biases_final)
+        else:
+            for enum_window in enumerated_context_windows:
+                results = self.evaluate_context_windows(calc_cond_batch, model, x_in, conds, timestep, [enum_window], model_options)
+                for result in results:
+                    self.combine_context_window_results(x_in, result.sub_conds_out, result.sub_conds, result.window, result.window_idx, len(enumerated_context_windows), timestep,
+                                                conds_final, counts_final, biases_final)
         try:
             # finalize conds
             if self.fuse_method.name == ContextFuseMethods.RELATIVE:
@@ -237,6 +258,102 @@ class IndexListContextHandler(ContextHandlerABC):
         return results
 
 
+    def get_window_batch_size(self, model: BaseModel, x_in: torch.Tensor, conds, window: IndexListContextWindow, max_batch: int) -> int:
+        window_shape = list(x_in.shape)
+        window_shape[self.dim] = window.context_length
+        conds_count = max(1, sum(1 for c in conds if c is not None))
+        free_memory = comfy.model_management.get_free_memory(x_in.device)
+        batch = 1
+        while batch < max_batch:
+            input_shape = [window_shape[0] * (batch + 1) * conds_count] + window_shape[1:]
+            if model.memory_required(input_shape) * 1.5 >= free_memory:
+                break
+            batch += 1
+        return batch
+
+    def get_window_batches(self, model: BaseModel, x_in: torch.Tensor, conds, enumerated_context_windows: list[tuple[int, IndexListContextWindow]]) -> list[list[tuple[int, IndexListContextWindow]]]:
+        # consecutive windows of the same length can be stacked on the batch dim
+        groups: list[list[tuple[int, IndexListContextWindow]]] = []
+        for enum_window in enumerated_context_windows:
+            if len(groups) > 0 and groups[-1][-1][1].context_length == enum_window[1].context_length:
+                groups[-1].append(enum_window)
+            else:
+                groups.append([enum_window])
+        batches = []
+        for group in groups:
+            batch_size = self.get_window_batch_size(model, x_in, conds, group[0][1], len(group))
+            for i in range(0, len(group), batch_size):
+                batches.append(group[i:i + batch_size])
+        return batches
+
+    def evaluate_context_windows_batched(self, calc_cond_batch: Callable, model: BaseModel, x_in: torch.Tensor, conds, timestep: torch.Tensor,
+                                         enumerated_context_windows: list[tuple[int, IndexListContextWindow]], model_options):
+        results: list[ContextResults] = []
+        for batch in self.get_window_batches(model, x_in, conds, enumerated_context_windows):
+            batched_conds = None
+            if len(batch) > 1:
+                windows_conds = [[self.get_resized_cond(cond, x_in, window) for cond in conds] for _, window in batch]
+                batched_conds = [stack_window_conds([wc[i] for wc in windows_conds]) for i in range(len(conds))]
+                if any(batched_conds[i] is False for i in range(len(conds))):
+                    batched_conds = None
+            if batched_conds is None:
+                results.extend(self.evaluate_context_windows(calc_cond_batch, model, x_in, conds, timestep, batch, model_options))
+                continue
+
+            comfy.model_management.throw_exception_if_processing_interrupted()
+            for window_idx, window in batch:
+                for callback in comfy.patcher_extension.get_all_callbacks(IndexListCallbacks.EVALUATE_CONTEXT_WINDOWS, self.callbacks):
+                    callback(self, model, x_in, conds, timestep, model_options, window_idx, window, model_options, None, None)
+
+            model_options["transformer_options"]["context_window"] = batch[0][1]
+            sub_x = torch.cat([window.get_tensor(x_in) for _, window in batch])
+            sub_timestep = torch.cat([window.get_tensor(timestep, dim=0) for _, window in batch])
+            batched_out = calc_cond_batch(model, batched_conds, sub_x, sub_timestep, model_options)
+            batched_out = [o.chunk(len(batch)) for o in batched_out]
+            for i, (window_idx, window) in enumerate(batch):
+                results.append(ContextResults(window_idx, [o[i] for o in batched_out], windows_conds[i], window))
+        return results
+
+    def conds_allow_split(self, conds) -> bool:
+        # control objects are bound to the device and batch of the main model
+        for cond in conds:
+            if cond is None:
+                continue
+            for c in cond:
+                if c.get("control", None) is not None:
+                    return False
+        return True
+
+    def evaluate_context_windows_multidevice(self, calc_cond_batch: Callable, model: BaseModel, device_models: list[BaseModel], x_in: torch.Tensor, conds, timestep: torch.Tensor,
+                                             enumerated_context_windows: list[tuple[int, IndexListContextWindow]], model_options):
+        # each device gets a contiguous run of windows, the main model keeps the first one
+        workers = [(model, None)] + [(m, m.current_patcher.load_device) for m in device_models]
+        workers = workers[:len(enumerated_context_windows)]
+        window_groups = [list(g) for g in np.array_split(np.arange(len(enumerated_context_windows)), len(workers))]
+
+        # evaluate_context_windows writes the current window into transformer_options and the patches may keep state in
+        # the nested dicts so each thread needs its own copy, made here so the threads never read the shared options
+        worker_options = [comfy.patcher_extension.copy_nested_dicts(model_options) for _ in workers]
+
+        def run_on_device(worker_idx):
+            worker_model, device = workers[worker_idx]
+            windows = [enumerated_context_windows[i] for i in window_groups[worker_idx]]
+            with torch_device_context(device):
+                return self.evaluate_context_windows(calc_cond_batch, worker_model, x_in, conds, timestep, windows, worker_options[worker_idx], device=device, first_device=x_in.device)
+
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=len(device_models) + 1, thread_name_prefix="context_windows")
+        futures = [self.executor.submit(run_on_device, i) for i in range(len(workers))]
+        results: list[ContextResults] = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+
+    def shutdown_executor(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
     def combine_context_window_results(self, x_in: torch.Tensor, sub_conds_out, sub_conds, window: IndexListContextWindow, window_idx: int, total_windows: int, timestep: torch.Tensor,
                                     conds_final: list[torch.Tensor], counts_final: list[torch.Tensor], biases_final: list[torch.Tensor]):
         if self.fuse_method.name == ContextFuseMethods.RELATIVE:
@@ -267,6 +384,89 @@ class IndexListContextHandler(ContextHandlerABC):
             callback(self, x_in, sub_conds_out, sub_conds, window, window_idx, total_windows, timestep, conds_final, counts_final, biases_final)
 
 
+def stack_window_conds(window_conds: list[list[dict]]):
+    """
+    Merge the resized conds of several windows into conds for the windows stacked on the batch dim.
+    Items that were not sliced per window are the same object in every window and get repeated to the
+    batch size by process_cond, sliced items get concatenated. Returns False if the conds can't be merged.
+    """
+    first = window_conds[0]
+    if first is None:
+        return None
+    others = window_conds[1:]
+    stacked = []
+    for j, actual_cond in enumerate(first):
+        new_cond = actual_cond.copy()
+        for key, value in actual_cond.items():
+            other_values = [o[j][key] for o in others]
+            if all(v is value for v in other_values):
+                continue
+            if key != "model_conds" or not isinstance(value, dict):
+                return False
+            model_conds = value.copy()
+            for cond_key, cond_value in value.items():
+                other_cond_values = [v[cond_key] for v in other_values]
+                if all(v is cond_value for v in other_cond_values):
+                    continue
+                if isinstance(cond_value, torch.Tensor):
+                    model_conds[cond_key] = torch.cat([cond_value] + other_cond_values)
+                elif hasattr(cond_value, "cond") and isinstance(cond_value.cond, torch.Tensor):
+                    model_conds[cond_key] = cond_value._copy_with(torch.cat([cond_value.cond] + [v.cond for v in other_cond_values]))
+                else:
+                    return False
+            new_cond[key] = model_conds
+        stacked.append(new_cond)
+    return stacked
+
+MULTIDEVICE_MODELS_KEY = "context_windows_multidevice"
+
+def _multidevice_pre_run(model: ModelPatcher):
+    for m in model.get_additional_models_with_key(MULTIDEVICE_MODELS_KEY):
+        m.pre_run()
+
+def _multidevice_cleanup(model: ModelPatcher):
+    for m in model.get_additional_models_with_key(MULTIDEVICE_MODELS_KEY):
+        m.cleanup()
+    handler = model.model_options.get("context_handler", None)
+    if isinstance(handler, IndexListContextHandler):
+        handler.shutdown_executor()
+
+def create_multidevice_clones(model: ModelPatcher, devices: list[torch.device]) -> ModelPatcher:
+    """
+    Returns a clone of model that carries a deep copy of the base model for every extra device.
+    The copies get loaded together with the main model and context windows are split between them.
+    """
+    model = model.clone()
+    model.remove_additional_models(MULTIDEVICE_MODELS_KEY)
+    clones = []
+    for device in devices:
+        if device == model.load_device:
+            continue
+        logging.info(f"Creating context window model copy for device {device}")
+        clones.append(model.deepclone_to_device(device))
+    model.set_additional_models(MULTIDEVICE_MODELS_KEY, clones)
+    model.remove_callbacks_with_key(CallbacksMP.ON_PRE_RUN, MULTIDEVICE_MODELS_KEY)
+    model.remove_callbacks_with_key(CallbacksMP.ON_CLEANUP, MULTIDEVICE_MODELS_KEY)
+    model.add_callback_with_key(CallbacksMP.ON_PRE_RUN, MULTIDEVICE_MODELS_KEY, _multidevice_pre_run)
+    model.add_callback_with_key(CallbacksMP.ON_CLEANUP, MULTIDEVICE_MODELS_KEY, _multidevice_cleanup)
+    return model
+
+def get_multidevice_models(model: BaseModel) -> list[BaseModel]:
+    patcher = getattr(model, "current_patcher", None)
+    if patcher is None:
+        return []
+    models = []
+    for m in patcher.get_additional_models_with_key(MULTIDEVICE_MODELS_KEY):
+        # only use copies that actually got loaded for this run
+        if getattr(m.model, "current_patcher", None) is m:
+            models.append(m.model)
+    return models
+
+def torch_device_context(device):
+    if device is not None and comfy.model_management.is_device_cuda(device):
+        return torch.cuda.device(device)
+    return contextlib.nullcontext()
+
 def _prepare_sampling_wrapper(executor, model, noise_shape: torch.Tensor, *args, **kwargs):
     # limit noise_shape length to context_length for more accurate vram use estimation
     model_options = kwargs.get("model_options", None)
@@ -0,0 +1,121 @@
+"""
+Background PNG encoding for the image save nodes.
+
+The images of a batch get encoded in parallel by a thread pool: PIL releases the GIL while zlib compresses so
+threads scale like processes without pickling every image or importing ComfyUI again in the workers.
+The save nodes return as soon as the images are queued so the encoding overlaps with the next nodes. The image is
+written to a temporary file next to it that gets created right away so the counter of the next save doesn't reuse its
+name and renamed once it is complete, anything that reads the files before they are written (like the /view route) has
+to wait on pending() first. Failed saves get raised by wait_all() so the prompt that made them fails.
+"""
+
+import concurrent.futures
+import logging
+import os
+import threading
+from io import BytesIO
+
+from PIL import Image
+
+from comfy.cli_args import args
+
+PNG_COMPRESS_LEVELS = {"default": 4, "fast": 1}
+# the auto profile switches to fast compression for batches where saving takes a few seconds
+AUTO_FAST_PIXELS = 8 * 1024 * 1024
+
+
+def png_compress_level(images, default=4):
+    """compress_level to save images ([B, H, W, C]) with according to --png-compression."""
+    profile = args.png_compression
+    if profile == "auto":
+        pixels = images.shape[0] * images.shape[1] * images.shape[2]
+        return min(default, PNG_COMPRESS_LEVELS["fast"]) if pixels >= AUTO_FAST_PIXELS else default
+    if profile == "fast":
+        return min(default, PNG_COMPRESS_LEVELS["fast"])
+    return default
+
+
+def encode_png(image, path, pnginfo, compress_level):
+    buffer = BytesIO()
+    Image.fromarray(image).save(buffer, format="PNG", pnginfo=pnginfo, compress_level=compress_level)
+    with open(path, "wb") as f:
+        f.write(buffer.getbuffer())
+
+
+def temp_path(path):
+    return "{}.tmp".format(path)
+
+
+def write_png(image, path, pnginfo, compress_level):
+    encode_png(image, temp_path(path), pnginfo, compress_level)
+    os.replace(temp_path(path), path)
+
+
+class ImageSaveError(Exception):
+    def __init__(self, path, node_id, error):
+        super().__init__("Failed to save image {}: {}".format(path, error))
+        self.path = path
+        # id of the node that saved the image, None if it wasn't saved by a node
+        self.node_id = node_id
+
+
+class ImageSaver:
+    def __init__(self, max_workers=None):
+        if max_workers is None:
+            max_workers = max(1, min(8, (os.cpu_count() or 2) // 2))
+        self.max_workers = max_workers
+        self.executor = None
+        self.pending_saves = {}
+        self.errors = []
+        self.lock = threading.Lock()
+
+    def save_png(self, image, path, pnginfo=None, compress_level=4, node_id=None):
+        """Queue a uint8 [H, W, C] numpy image to be saved as a png at path by the node node_id."""
+        path = os.path.abspath(path)
+        # reserve the name
+        open(temp_path(path), "wb").close()
+        with self.lock:
+            if self.executor is None:
+                self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="image_saver")
+            future = self.executor.submit(self.write, image, path, pnginfo, compress_level, node_id)
+            self.pending_saves[path] = future
+        future.add_done_callback(lambda f: self.finished(path, f))
+        return future
+
+    def write(self, image, path, pnginfo, compress_level, node_id):
+        try:
+            write_png(image, path, pnginfo, compress_level)
+        except Exception as e:
+            logging.error("Failed to save image {}: {}".format(path, e))
+            try:
+                os.remove(temp_path(path))
+            except OSError:
+                pass
+            # recorded before the future is done so wait_all() sees it
+            with self.lock:
+                self.errors.append(ImageSaveError(path, node_id, e))
+            raise
+
+    def finished(self, path, future):
+        with self.lock:
+            if self.pending_saves.get(path, None) is future:
+                del self.pending_saves[path]
+
+    def pending(self, path):
+        """The future of the save of path if it's still being written, None otherwise."""
+        with self.lock:
+            return self.pending_saves.get(os.path.abspath(path), None)
+
+    def wait_all(self):
+        """Waits for all the queued saves, raises the ImageSaveError of the first one that failed since the last call."""
+        with self.lock:
+            futures = list(self.pending_saves.values())
+        concurrent.futures.wait(futures)
+        with self.lock:
+            errors = self.errors
+            self.errors = []
+        if len(errors) > 0:
+            raise errors[0]
+
+
+IMAGE_SAVER = ImageSaver()
@@ -12,6 +12,8 @@ from . import deis
 from . import sa_solver
 import comfy.model_patcher
 import comfy.model_sampling
+import comfy.philox
+from comfy.cli_args import args
 
 def append_zero(x):
     return torch.cat([x, x.new_zeros([1])])
@@ -73,6 +75,9 @@ def get_ancestral_step(sigma_from, sigma_to, eta=1.):
 
 
 def default_noise_sampler(x, seed=None):
+    if seed is not None and args.noise_generator == "philox":
+        return comfy.philox.PhiloxNoiseSampler(x, seed)
+
     if seed is not None:
         generator = torch.Generator(device=x.device)
         generator.manual_seed(seed)
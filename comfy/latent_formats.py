@@ -371,6 +371,7 @@ class HunyuanVideo(LatentFormat):
     latent_channels = 16
     latent_dimensions = 3
     scale_factor = 0.476986
+    taesd_decoder_name = "taehv"
     latent_rgb_factors = [
         [-0.0395, -0.0331,  0.0445],
         [ 0.0696,  0.0795,  0.0518],
@@ -454,7 +455,7 @@ class Wan21(LatentFormat):
         ]).view(1, self.latent_channels, 1, 1, 1)
 
 
-        self.taesd_decoder_name = None #TODO
+        self.taesd_decoder_name = "taew2_1"
 
     def process_in(self, latent):
         latents_mean = self.latents_mean.to(latent.device, latent.dtype)
@@ -542,6 +543,8 @@ class Wan22(Wan21):
                 0.3971, 1.0600, 0.3943, 0.5537, 0.5444, 0.4089, 0.7468, 0.7744
             ]).view(1, self.latent_channels, 1, 1, 1)
 
+        self.taesd_decoder_name = "taew2_2"
+
 class HunyuanImage21(LatentFormat):
     latent_channels = 64
     latent_dimensions = 2
@@ -1,5 +1,8 @@
 import torch
+import collections
+import threading
 import comfy.rmsnorm
+import comfy.model_management
 
 
 def pad_to_patch_size(img, patch_size=(2, 2), padding_mode="circular"):
@@ -14,3 +17,71 @@ def pad_to_patch_size(img, patch_size=(2, 2), padding_mode="circular"):
 
 
 rms_norm = comfy.rmsnorm.rms_norm
+
+
+class RopeCache:
+    """
+    Small LRU cache for rope frequency tensors. They only depend on the token grid so they are the same
+    for every sampling step, every cond/uncond pass and every block.
+    """
+    def __init__(self, max_entries=8, max_entry_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_entry_bytes = max_entry_bytes
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, compute):
+        """
+        key must describe everything the result depends on including device and dtype, only callers that can build
+        it from scalars should use the cache: comparing the ids on the device would cost as much as computing the rope.
+        """
+        # cached tensors are created without grad so they can't be used for training
+        if torch.is_grad_enabled():
+            return compute()
+
+        with self.lock:
+            entry = self.entries.get(key, None)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry
+
+        out = compute()
+        if out.nelement() * out.element_size() > self.max_entry_bytes:
+            return out
+
+        with self.lock:
+            self.entries[key] = out
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return out
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+rope_cache = RopeCache()
+# the cached tensors are on the device of the model, free them with the rest of the cached memory (like when models get unloaded)
+comfy.model_management.register_soft_empty_cache_callback(rope_cache.clear)
+
+
+def apply_token_chunked(func, x, chunk_size, *token_args):
+    """
+    Runs a token wise func(x, *token_args) on chunks of chunk_size tokens (dim 1) so the intermediate activations
+    (mostly the FFN hidden states) only exist for one chunk at a time. token_args with the same number of tokens
+    as x are sliced with it, others are passed as they are. Only used for inference.
+    """
+    if chunk_size is None or chunk_size <= 0 or x.shape[1] <= chunk_size or torch.is_grad_enabled():
+        return func(x, *token_args)
+
+    tokens = x.shape[1]
+    out = None
+    for i in range(0, tokens, chunk_size):
+        args = [a[:, i:i + chunk_size] if (torch.is_tensor(a) and a.ndim > 1 and a.shape[1] == tokens) else a for a in token_args]
+        o = func(x[:, i:i + chunk_size], *args)
+        if out is None:
+            out = torch.empty((o.shape[0], tokens) + tuple(o.shape[2:]), dtype=o.dtype, device=o.device)
+        out[:, i:i + chunk_size] = o
+        del o
+    return out
@@ -293,6 +293,9 @@ class Flux(nn.Module):
         w_len = ((w_orig + (patch_size // 2)) // patch_size)
         img, img_ids = self.process_img(x, transformer_options=transformer_options)
         img_tokens = img.shape[1]
+        # where the image tokens are in the sequence of each block type, for patches that need the spatial layout
+        txt_len = context.shape[1]
+        transformer_options["token_grid"] = {"grid_sizes": (1, h_len, w_len), "offsets": {"double_block": 0, "single_block": txt_len}, "pe_offsets": {"double_block": txt_len, "single_block": txt_len}, "pe_dim": 2}
         if ref_latents is not None:
             h = 0
             w = 0
@@ -8,6 +8,7 @@ from einops import rearrange, repeat
 from typing import Optional, Any, Callable, Union
 import logging
 import functools
+import threading
 
 from .diffusionmodules.util import AlphaBlender, timestep_embedding
 from .sub_quadratic_attention import efficient_dot_product_attention
@@ -127,12 +128,78 @@ def wrap_attn(func):
                 if transformer_options is not None:
                     if "optimized_attention_override" in transformer_options:
                         return transformer_options["optimized_attention_override"](func, *args, **kwargs)
+                if ATTENTION_OOM_FALLBACK:
+                    return attention_memory_fallback(func, *args, **kwargs)
             return func(*args, **kwargs)
         finally:
             if remove_attn_wrapper_key:
                 del kwargs["_inside_attn_wrapper"]
     return wrapper
 
+ATTENTION_OOM_FALLBACK = args.attention_oom_fallback
+ATTENTION_ARG_NAMES = ("mask", "attn_precision", "skip_reshape", "skip_output_reshape")
+ATTENTION_CHUNK_THRESHOLD = 512 * 1024 * 1024
+ATTENTION_MAX_QUERY_CHUNKS = 64
+
+def attention_query_chunked(func, q, k, v, heads, chunks, mask=None, skip_reshape=False, skip_output_reshape=False, **kwargs):
+    # every query row is independent so attention can be computed for slices of the queries and concatenated
+    seq_dim = 2 if skip_reshape else 1
+    out_dim = 2 if skip_output_reshape else 1
+    seq_q = q.shape[seq_dim]
+    slice_size = math.ceil(seq_q / chunks)
+    out = []
+    for i in range(0, seq_q, slice_size):
+        m = mask
+        if mask is not None and mask.ndim >= 2 and mask.shape[-2] == seq_q:
+            m = mask[..., i:i + slice_size, :]
+        out.append(func(q.narrow(seq_dim, i, min(slice_size, seq_q - i)), k, v, heads, mask=m, skip_reshape=skip_reshape, skip_output_reshape=skip_output_reshape, **kwargs))
+    return torch.cat(out, dim=out_dim)
+
+def attention_memory_fallback(func, *args, **kwargs):
+    """
+    Retries func in query chunks instead of failing when it runs out of memory.
+    Basic attention materializes the whole attention matrix so it gets chunked ahead of time when the matrix is predicted
+    to not fit in free memory, the fused kernels (pytorch, flash, sage, xformers) never do and only get chunked after an OOM.
+    """
+    # func is the undecorated function
+    if func in (attention_split.__wrapped__, attention_sub_quad.__wrapped__) or torch.compiler.is_compiling():
+        return func(*args, **kwargs)
+
+    q, k, v, heads = args[:4]
+    kwargs = kwargs.copy()
+    for name, a in zip(ATTENTION_ARG_NAMES, args[4:]):
+        kwargs[name] = a
+    if kwargs.get("skip_reshape", False):
+        b, _, seq_q, _ = q.shape
+        seq_k = k.shape[2]
+    else:
+        b, seq_q, _ = q.shape
+        seq_k = k.shape[1]
+
+    chunks = 1
+    attn_size = b * heads * seq_q * seq_k * max(q.element_size(), 4)
+    if func is attention_basic.__wrapped__ and attn_size > ATTENTION_CHUNK_THRESHOLD:
+        mem_free_total = model_management.get_free_memory(q.device)
+        if attn_size * 2 > mem_free_total:
+            chunks = min(2 ** math.ceil(math.log2(attn_size * 2 / max(mem_free_total, 1))), ATTENTION_MAX_QUERY_CHUNKS, seq_q)
+
+    while True:
+        try:
+            if chunks == 1:
+                return func(q, k, v, heads, **kwargs)
+            return attention_query_chunked(func, q, k, v, heads, chunks, **kwargs)
+        except model_management.OOM_EXCEPTION as e:
+            model_management.soft_empty_cache(True)
+            if chunks >= min(ATTENTION_MAX_QUERY_CHUNKS, seq_q):
+                # the keys are chunked too by sub quadratic attention, it is the last resort
+                logging.warning("out of memory error in attention with {} query chunks, using sub quadratic attention".format(chunks))
+                try:
+                    return attention_sub_quad(q, k, v, heads, **kwargs)
+                except model_management.OOM_EXCEPTION:
+                    raise e
+            chunks = min(chunks * 2, ATTENTION_MAX_QUERY_CHUNKS, seq_q)
+            logging.warning("out of memory error in attention, retrying with {} query chunks".format(chunks))
+
 @wrap_attn
 def attention_basic(q, k, v, heads, mask=None, attn_precision=None, skip_reshape=False, skip_output_reshape=False, **kwargs):
     attn_precision = get_attn_precision(attn_precision, q.dtype)
@@ -672,6 +739,50 @@ def optimized_attention_for_device(device, mask=False, small_input=False):
     return optimized_attention
 
 
+class CrossAttentionKVCache:
+    """
+    Caches the key/value projections of static cross attention contexts (text, clip vision) for one sampling run.
+    The context tensor is usually recomputed every step so it is matched by content the first time it is seen in a step
+    and by identity for the rest of the blocks.
+    Set as transformer_options["cross_attn_kv_cache"].
+    """
+    def __init__(self, max_contexts=4):
+        self.max_contexts = max_contexts
+        self.contexts = []
+        self.lock = threading.Lock()
+
+    def find_entry(self, context):
+        for entry in self.contexts:
+            if entry[0] is context:
+                return entry
+        for entry in self.contexts:
+            c = entry[0]
+            if c.shape == context.shape and c.dtype == context.dtype and c.device == context.device and torch.equal(c, context):
+                entry[0] = context
+                return entry
+        entry = [context, {}]
+        self.contexts.append(entry)
+        if len(self.contexts) > self.max_contexts:
+            self.contexts.pop(0)
+        return entry
+
+    def get(self, module, context, compute):
+        if torch.is_grad_enabled():
+            return compute()
+        with self.lock:
+            entry = self.find_entry(context)
+            kv = entry[1].get(id(module), None)
+        if kv is None:
+            kv = compute()
+            with self.lock:
+                entry[1][id(module)] = kv
+        return kv
+
+    def clear(self):
+        with self.lock:
+            self.contexts = []
+
+
 class CrossAttention(nn.Module):
     def __init__(self, query_dim, context_dim=None, heads=8, dim_head=64, dropout=0., attn_precision=None, dtype=None, device=None, operations=ops):
         super().__init__()
@@ -688,15 +799,20 @@ class CrossAttention(nn.Module):
 
         self.to_out = nn.Sequential(operations.Linear(inner_dim, query_dim, dtype=dtype, device=device), nn.Dropout(dropout))
 
-    def forward(self, x, context=None, value=None, mask=None, transformer_options={}):
+    def forward(self, x, context=None, value=None, mask=None, transformer_options={}, static_context=False):
         q = self.to_q(x)
-        context = default(context, x)
-        k = self.to_k(context)
-        if value is not None:
-            v = self.to_v(value)
-            del value
+        kv_cache = transformer_options.get("cross_attn_kv_cache", None)
+        # static_context: the context is the same for every sampling step (text conditioning) so k/v can be cached
+        if kv_cache is not None and static_context and context is not None and value is None:
+            k, v = kv_cache.get(self, context, lambda: (self.to_k(context), self.to_v(context)))
         else:
-            v = self.to_v(context)
+            context = default(context, x)
+            k = self.to_k(context)
+            if value is not None:
+                v = self.to_v(value)
+                del value
+            else:
+                v = self.to_v(context)
 
         if mask is None:
             out = optimized_attention(q, k, v, self.heads, attn_precision=self.attn_precision, transformer_options=transformer_options)
@@ -845,7 +961,7 @@ class BasicTransformerBlock(nn.Module):
                 n = attn2_replace_patch[block_attn2](n, context_attn2, value_attn2, extra_options)
                 n = self.attn2.to_out(n)
             else:
-                n = self.attn2(n, context=context_attn2, value=value_attn2, transformer_options=transformer_options)
+                n = self.attn2(n, context=context_attn2, value=value_attn2, transformer_options=transformer_options, static_context=context_attn2 is context)
 
         if "attn2_output_patch" in transformer_patches:
             patch = transformer_patches["attn2_output_patch"]
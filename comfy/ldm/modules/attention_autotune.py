@@ -0,0 +1,139 @@
+import json
+import logging
+import os
+import threading
+import time
+
+import torch
+
+from comfy import model_management
+from . import attention
+
+
+def attention_signature(q, k, heads, mask=None, skip_reshape=False):
+    if skip_reshape:
+        _, heads, seq_q, dim_head = q.shape
+        seq_k = k.shape[2]
+    else:
+        seq_q = q.shape[1]
+        seq_k = k.shape[1]
+        dim_head = q.shape[-1] // heads
+    return (seq_q, seq_k, heads, dim_head, str(q.dtype).replace("torch.", ""), mask is not None)
+
+
+def signature_to_key(signature):
+    return ",".join(map(str, signature))
+
+
+class AttentionAutotuner:
+    """
+    Picks the fastest registered attention function for every (seq_q, seq_k, heads, dim_head, dtype, mask) signature.
+    The first call with a new signature times every candidate on the real inputs, later calls reuse the winner.
+    Winners are stored per device name so a cache file can be shared between machines.
+    Used as transformer_options["optimized_attention_override"].
+    """
+    def __init__(self, cache_path=None, warmup=1, iterations=3, exclude=()):
+        self.cache_path = cache_path
+        self.warmup = warmup
+        self.iterations = iterations
+        self.exclude = set(exclude)
+        self.lock = threading.Lock()
+        self.winners = {}
+        self.load()
+
+    def load(self):
+        if self.cache_path is None or not os.path.isfile(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                self.winners = json.load(f)
+        except Exception as e:
+            logging.warning(f"Could not load attention autotune cache {self.cache_path}: {e}")
+            self.winners = {}
+
+    def save(self):
+        if self.cache_path is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = f"{self.cache_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.winners, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            logging.warning(f"Could not save attention autotune cache {self.cache_path}: {e}")
+
+    def device_key(self, device):
+        return f"{model_management.get_torch_device_name(device)} torch {torch.__version__}"
+
+    def candidates(self, mask):
+        out = {}
+        for name, f in attention.REGISTERED_ATTENTION_FUNCTIONS.items():
+            if name in self.exclude:
+                continue
+            # flash has no mask support and would only time its fallback
+            if mask is not None and name == "flash":
+                continue
+            out[name] = f
+        return out
+
+    def time_function(self, func, args, kwargs, device):
+        for _ in range(self.warmup):
+            out = func(*args, **kwargs)
+        model_management.synchronize(device)
+        start = time.perf_counter()
+        for _ in range(self.iterations):
+            out = func(*args, **kwargs)
+        model_management.synchronize(device)
+        return (time.perf_counter() - start) / self.iterations, out
+
+    def tune(self, args, kwargs, mask, device):
+        results = {}
+        reference = None
+        for name, f in self.candidates(mask).items():
+            try:
+                elapsed, out = self.time_function(f, args, kwargs, device)
+            except model_management.OOM_EXCEPTION:
+                model_management.soft_empty_cache()
+                continue
+            except Exception as e:
+                logging.debug(f"Attention autotune: {name} failed: {e}")
+                continue
+            if reference is None:
+                reference = out.shape
+            if out.shape != reference:
+                continue
+            results[name] = elapsed
+            del out
+
+        if len(results) == 0:
+            return None
+        return min(results, key=results.get), results
+
+    def __call__(self, func, *args, **kwargs):
+        q = args[0]
+        if torch.compiler.is_compiling() or q.device.type == "cpu":
+            return func(*args, **kwargs)
+
+        heads = args[3] if len(args) > 3 else kwargs["heads"]
+        mask = args[4] if len(args) > 4 else kwargs.get("mask", None)
+        signature = signature_to_key(attention_signature(q, args[1], heads, mask=mask, skip_reshape=kwargs.get("skip_reshape", False)))
+        device_key = self.device_key(q.device)
+        with self.lock:
+            name = self.winners.get(device_key, {}).get(signature, None)
+
+        if name is not None:
+            winner = attention.get_attention_function(name, default=None)
+            if winner is not None:
+                return winner(*args, **kwargs)
+
+        with self.lock:
+            tuned = self.tune(args, kwargs, mask, q.device)
+            if tuned is None:
+                return func(*args, **kwargs)
+            name, results = tuned
+            logging.info("Attention autotune {}: {} ({})".format(signature, name, ", ".join("{} {:.3f}ms".format(n, t * 1000) for n, t in results.items())))
+            self.winners.setdefault(device_key, {})[signature] = name
+            self.save()
+
+        return attention.get_attention_function(name)(*args, **kwargs)
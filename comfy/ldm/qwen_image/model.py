@@ -258,8 +258,11 @@ class QwenImageTransformerBlock(nn.Module):
         del img_gate1
         del txt_gate1
 
-        img_modulated2, img_gate2 = self._modulate(self.img_norm2(hidden_states), img_mod2)
-        hidden_states = torch.addcmul(hidden_states, img_gate2, self.img_mlp(img_modulated2))
+        def img_ffn(hidden_states):
+            img_modulated2, img_gate2 = self._modulate(self.img_norm2(hidden_states), img_mod2)
+            return torch.addcmul(hidden_states, img_gate2, self.img_mlp(img_modulated2))
+
+        hidden_states = comfy.ldm.common_dit.apply_token_chunked(img_ffn, hidden_states, transformer_options.get("block_token_chunk_size", None))
 
         txt_modulated2, txt_gate2 = self._modulate(self.txt_norm2(encoder_hidden_states), txt_mod2)
         encoder_hidden_states = torch.addcmul(encoder_hidden_states, txt_gate2, self.txt_mlp(txt_modulated2))
@@ -6,7 +6,7 @@ import torch
 import torch.nn as nn
 from einops import rearrange
 
-from comfy.ldm.modules.attention import optimized_attention
+from comfy.ldm.modules.attention import optimized_attention, CrossAttentionKVCache
 from comfy.ldm.flux.layers import EmbedND
 from comfy.ldm.flux.math import apply_rope1
 import comfy.ldm.common_dit
@@ -100,8 +100,12 @@ class WanT2VCrossAttention(WanSelfAttention):
         """
         # compute query, key, value
         q = self.norm_q(self.q(x))
-        k = self.norm_k(self.k(context))
-        v = self.v(context)
+        kv_cache = transformer_options.get("cross_attn_kv_cache", None)
+        if kv_cache is not None:
+            k, v = kv_cache.get(self, context, lambda: (self.norm_k(self.k(context)), self.v(context)))
+        else:
+            k = self.norm_k(self.k(context))
+            v = self.v(context)
 
         # compute attention
         x = optimized_attention(q, k, v, heads=self.num_heads, transformer_options=transformer_options)
@@ -131,15 +135,18 @@ class WanI2VCrossAttention(WanSelfAttention):
             x(Tensor): Shape [B, L1, C]
             context(Tensor): Shape [B, L2, C]
         """
-        context_img = context[:, :context_img_len]
-        context = context[:, context_img_len:]
+        def compute_kv():
+            context_img = context[:, :context_img_len]
+            context_txt = context[:, context_img_len:]
+            return self.norm_k(self.k(context_txt)), self.v(context_txt), self.norm_k_img(self.k_img(context_img)), self.v_img(context_img)
 
         # compute query, key, value
         q = self.norm_q(self.q(x))
-        k = self.norm_k(self.k(context))
-        v = self.v(context)
-        k_img = self.norm_k_img(self.k_img(context_img))
-        v_img = self.v_img(context_img)
+        kv_cache = transformer_options.get("cross_attn_kv_cache", None)
+        if kv_cache is not None:
+            k, v, k_img, v_img = kv_cache.get(self, context, compute_kv)
+        else:
+            k, v, k_img, v_img = compute_kv()
         img_x = optimized_attention(q, k_img, v_img, heads=self.num_heads, transformer_options=transformer_options)
         # compute attention
         x = optimized_attention(q, k, v, heads=self.num_heads, transformer_options=transformer_options)
@@ -168,6 +175,16 @@ def repeat_e(e, x):
         return torch.repeat_interleave(e, repeats + 1, dim=1)[:, :x.size(1)]
 
 
+def repeat_e_tokens(e, x, tokens):
+    """repeat_e(e, x)[:, tokens] for a 1D tensor of token indexes without repeating e over the whole sequence."""
+    if e.size(1) == 1:
+        return e
+    repeats = x.size(1) // e.size(1)
+    if repeats > 1 and repeats * e.size(1) != x.size(1):
+        repeats += 1
+    return e.index_select(1, tokens // repeats)
+
+
 class WanAttentionBlock(nn.Module):
 
     def __init__(self,
@@ -240,11 +257,29 @@ class WanAttentionBlock(nn.Module):
         x = torch.addcmul(x, y, repeat_e(e[2], x))
         del y
 
-        # cross-attention & ffn
-        x = x + self.cross_attn(self.norm3(x), context, context_img_len=context_img_len, transformer_options=transformer_options)
-        y = self.ffn(torch.addcmul(repeat_e(e[3], x), self.norm2(x), 1 + repeat_e(e[4], x)))
-        x = torch.addcmul(x, y, repeat_e(e[5], x))
-        return x
+        chunk_size = transformer_options.get("block_token_chunk_size", None)
+        if chunk_size is None:
+            # cross-attention & ffn
+            x = x + self.cross_attn(self.norm3(x), context, context_img_len=context_img_len, transformer_options=transformer_options)
+            y = self.ffn(torch.addcmul(repeat_e(e[3], x), self.norm2(x), 1 + repeat_e(e[4], x)))
+            x = torch.addcmul(x, y, repeat_e(e[5], x))
+            return x
+
+        # every token is independent in the cross-attention & ffn so they can run in token chunks,
+        # the per token modulation only gets repeated for the tokens of the chunk
+        if transformer_options.get("cross_attn_kv_cache", None) is None:
+            # the cross attention K/V only depend on the context so they get projected once for all the chunks
+            transformer_options = transformer_options.copy()
+            transformer_options["cross_attn_kv_cache"] = CrossAttentionKVCache(max_contexts=1)
+
+        def cross_attn_ffn(x_chunk, tokens):
+            tokens = tokens[0]
+            x_chunk = x_chunk + self.cross_attn(self.norm3(x_chunk), context, context_img_len=context_img_len, transformer_options=transformer_options)
+            y = self.ffn(torch.addcmul(repeat_e_tokens(e[3], x, tokens), self.norm2(x_chunk), 1 + repeat_e_tokens(e[4], x, tokens)))
+            return torch.addcmul(x_chunk, y, repeat_e_tokens(e[5], x, tokens))
+
+        tokens = torch.arange(x.shape[1], device=x.device).unsqueeze(0)
+        return comfy.ldm.common_dit.apply_token_chunked(cross_attn_ffn, x, chunk_size, tokens)
 
 
 class VaceWanAttentionBlock(WanAttentionBlock):
@@ -566,6 +601,10 @@ class WanModel(torch.nn.Module):
                 context = torch.concat([context_clip, context], dim=1)
             context_img_len = clip_fea.shape[-2]
 
+        # where the video tokens are in the sequence, for patches that need the spatial/temporal layout
+        grid_offset = x.shape[1] - math.prod(grid_sizes)
+        transformer_options["token_grid"] = {"grid_sizes": tuple(grid_sizes), "offsets": {"double_block": grid_offset}, "pe_offsets": {"double_block": grid_offset}, "pe_dim": 1}
+
         patches_replace = transformer_options.get("patches_replace", {})
         blocks_replace = patches_replace.get("dit", {})
         for i, block in enumerate(self.blocks):
@@ -614,14 +653,18 @@ class WanModel(torch.nn.Module):
             h_start += rope_options.get("shift_y", 0.0)
             w_start += rope_options.get("shift_x", 0.0)
 
-        img_ids = torch.zeros((steps_t, steps_h, steps_w, 3), device=device, dtype=dtype)
-        img_ids[:, :, :, 0] = img_ids[:, :, :, 0] + torch.linspace(t_start, t_start + (t_len - 1), steps=steps_t, device=device, dtype=dtype).reshape(-1, 1, 1)
-        img_ids[:, :, :, 1] = img_ids[:, :, :, 1] + torch.linspace(h_start, h_start + (h_len - 1), steps=steps_h, device=device, dtype=dtype).reshape(1, -1, 1)
-        img_ids[:, :, :, 2] = img_ids[:, :, :, 2] + torch.linspace(w_start, w_start + (w_len - 1), steps=steps_w, device=device, dtype=dtype).reshape(1, 1, -1)
-        img_ids = img_ids.reshape(1, -1, img_ids.shape[-1])
+        def compute():
+            img_ids = torch.zeros((steps_t, steps_h, steps_w, 3), device=device, dtype=dtype)
+            img_ids[:, :, :, 0] = img_ids[:, :, :, 0] + torch.linspace(t_start, t_start + (t_len - 1), steps=steps_t, device=device, dtype=dtype).reshape(-1, 1, 1)
+            img_ids[:, :, :, 1] = img_ids[:, :, :, 1] + torch.linspace(h_start, h_start + (h_len - 1), steps=steps_h, device=device, dtype=dtype).reshape(1, -1, 1)
+            img_ids[:, :, :, 2] = img_ids[:, :, :, 2] + torch.linspace(w_start, w_start + (w_len - 1), steps=steps_w, device=device, dtype=dtype).reshape(1, 1, -1)
+            img_ids = img_ids.reshape(1, -1, img_ids.shape[-1])
+            return self.rope_embedder.embed(img_ids).movedim(1, 2)
 
-        freqs = self.rope_embedder(img_ids).movedim(1, 2)
-        return freqs
+        # everything the ids depend on is known here so the key is exact and a hit doesn't build the ids at all
+        key = ("WanRope", self.rope_embedder.theta, tuple(self.rope_embedder.axes_dim), float(t_start), float(h_start), float(w_start),
+               float(t_len), float(h_len), float(w_len), steps_t, steps_h, steps_w, str(device), dtype)
+        return comfy.ldm.common_dit.rope_cache.get(key, compute)
 
     def forward(self, x, timestep, context, clip_fea=None, time_dim_concat=None, transformer_options={}, **kwargs):
         return comfy.patcher_extension.WrapperExecutor.new_class_executor(
@@ -761,6 +804,10 @@ class VaceWanModel(WanModel):
         # arguments
         x_orig = x
 
+        # where the video tokens are in the sequence, for patches that need the spatial/temporal layout
+        grid_offset = x.shape[1] - math.prod(grid_sizes)
+        transformer_options["token_grid"] = {"grid_sizes": tuple(grid_sizes), "offsets": {"double_block": grid_offset}, "pe_offsets": {"double_block": grid_offset}, "pe_dim": 1}
+
         patches_replace = transformer_options.get("patches_replace", {})
         blocks_replace = patches_replace.get("dit", {})
         for i, block in enumerate(self.blocks):
@@ -860,6 +907,10 @@ class CameraWanModel(WanModel):
                 context = torch.concat([context_clip, context], dim=1)
             context_img_len = clip_fea.shape[-2]
 
+        # where the video tokens are in the sequence, for patches that need the spatial/temporal layout
+        grid_offset = x.shape[1] - math.prod(grid_sizes)
+        transformer_options["token_grid"] = {"grid_sizes": tuple(grid_sizes), "offsets": {"double_block": grid_offset}, "pe_offsets": {"double_block": grid_offset}, "pe_dim": 1}
+
         patches_replace = transformer_options.get("patches_replace", {})
         blocks_replace = patches_replace.get("dit", {})
         for i, block in enumerate(self.blocks):
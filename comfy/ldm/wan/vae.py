@@ -467,8 +467,8 @@ class WanVAE(nn.Module):
         self.decoder = Decoder3d(dim, z_dim, dim_mult, num_res_blocks,
                                  attn_scales, self.temperal_upsample, dropout)
 
-    def encode(self, x):
-        conv_idx = [0]
+    def encode_stream(self, x):
+        """Yields the latent one latent frame at a time, the causal conv caches carry the context between the chunks of frames."""
         feat_map = [None] * count_conv3d(self.decoder)
         ## cache
         t = x.shape[2]
@@ -482,16 +482,18 @@ class WanVAE(nn.Module):
                     feat_cache=feat_map,
                     feat_idx=conv_idx)
             else:
-                out_ = self.encoder(
+                out = self.encoder(
                     x[:, :, 1 + 4 * (i - 1):1 + 4 * i, :, :],
                     feat_cache=feat_map,
                     feat_idx=conv_idx)
-                out = torch.cat([out, out_], 2)
-        mu, log_var = self.conv1(out).chunk(2, dim=1)
-        return mu
+            mu, log_var = self.conv1(out).chunk(2, dim=1)
+            yield mu
 
-    def decode(self, z):
-        conv_idx = [0]
+    def encode(self, x):
+        return torch.cat(list(self.encode_stream(x)), 2)
+
+    def decode_stream(self, z):
+        """Yields the decoded video one latent frame at a time, the causal conv caches carry the context between them."""
         feat_map = [None] * count_conv3d(self.decoder)
         # z: [b,c,t,h,w]
 
@@ -499,15 +501,10 @@ class WanVAE(nn.Module):
         x = self.conv2(z)
         for i in range(iter_):
             conv_idx = [0]
-            if i == 0:
-                out = self.decoder(
-                    x[:, :, i:i + 1, :, :],
-                    feat_cache=feat_map,
-                    feat_idx=conv_idx)
-            else:
-                out_ = self.decoder(
-                    x[:, :, i:i + 1, :, :],
-                    feat_cache=feat_map,
-                    feat_idx=conv_idx)
-                out = torch.cat([out, out_], 2)
-        return out
+            yield self.decoder(
+                x[:, :, i:i + 1, :, :],
+                feat_cache=feat_map,
+                feat_idx=conv_idx)
+
+    def decode(self, z):
+        return torch.cat(list(self.decode_stream(z)), 2)
@@ -187,6 +187,23 @@ def get_torch_device():
         else:
             return torch.device(torch.cuda.current_device())
 
+def get_all_torch_devices(exclude_current=False):
+    global cpu_state
+    global directml_enabled
+    devices = []
+    if cpu_state == CPUState.GPU and not directml_enabled:
+        if is_nvidia() or is_amd():
+            for i in range(torch.cuda.device_count()):
+                devices.append(torch.device(i))
+        elif is_intel_xpu():
+            for i in range(torch.xpu.device_count()):
+                devices.append(torch.device("xpu", i))
+    if len(devices) == 0:
+        devices.append(get_torch_device())
+    if exclude_current:
+        devices = [d for d in devices if d != get_torch_device()]
+    return devices
+
 def get_total_memory(dev=None, torch_total_too=False):
     global directml_enabled
     if dev is None:
@@ -1469,8 +1486,16 @@ def extended_fp16_support():
 
     return True
 
+# functions that free the memory of caches that hold device tensors, called before the torch cache gets emptied
+SOFT_EMPTY_CACHE_CALLBACKS = []
+
+def register_soft_empty_cache_callback(callback):
+    SOFT_EMPTY_CACHE_CALLBACKS.append(callback)
+
 def soft_empty_cache(force=False):
     global cpu_state
+    for callback in SOFT_EMPTY_CACHE_CALLBACKS:
+        callback()
     if cpu_state == CPUState.MPS:
         torch.mps.empty_cache()
     elif is_intel_xpu():
@@ -1483,9 +1508,34 @@ def soft_empty_cache(force=False):
         torch.cuda.empty_cache()
         torch.cuda.ipc_collect()
 
+def synchronize(device=None):
+    if device is None:
+        device = get_torch_device()
+    if not hasattr(device, "type"):
+        device = torch.device(device)
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+    elif device.type == "xpu":
+        torch.xpu.synchronize(device)
+    elif device.type == "mps":
+        torch.mps.synchronize()
+    elif device.type == "npu":
+        torch.npu.synchronize(device)
+    elif device.type == "mlu":
+        torch.mlu.synchronize(device)
+
 def unload_all_models():
     free_memory(1e30, get_torch_device())
 
+def unload_model_and_clones(model, unpatch_weights=True):
+    to_unload = []
+    for i in range(len(current_loaded_models)):
+        if model.is_clone(current_loaded_models[i].model):
+            to_unload = [i] + to_unload
+    for i in to_unload:
+        current_loaded_models.pop(i).model_unload(unpatch_weights=unpatch_weights)
+    return len(to_unload) > 0
+
 
 #TODO: might be cleaner to put this somewhere else
 import threading
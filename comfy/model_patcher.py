@@ -343,6 +343,22 @@ class ModelPatcher:
             callback(self, n)
         return n
 
+    def deepclone_to_device(self, load_device):
+        """
+        Clone that owns a deep copy of the base model so it can be loaded on a different device than this one.
+        Any loaded clone of this model gets unloaded first so the copied weights are unpatched.
+        """
+        comfy.model_management.unload_model_and_clones(self)
+        n = self.clone()
+        n.load_device = load_device
+        # backups must not be shared since the base model is no longer the same object
+        n.backup = copy.deepcopy(n.backup)
+        n.object_patches_backup = copy.deepcopy(n.object_patches_backup)
+        n.hook_backup = copy.deepcopy(n.hook_backup)
+        n.model = copy.deepcopy(n.model)
+        n.parent = None
+        return n
+
     def is_clone(self, other):
         if hasattr(other, 'model') and self.model is other.model:
             return True
@@ -466,6 +482,9 @@ class ModelPatcher:
 
         self.model_options["transformer_options"]["rope_options"] = rope_options
 
+    def set_model_block_token_chunk_size(self, chunk_size):
+        self.model_options["transformer_options"]["block_token_chunk_size"] = chunk_size
+
 
     def add_object_patch(self, name, obj):
         self.object_patches[name] = obj
@@ -116,6 +116,7 @@ def cast_bias_weight(s, input=None, dtype=None, device=None, bias_dtype=None, of
 
     if weight_has_function or weight.dtype != dtype:
         with wf_context:
+            # on a QuantizedTensor this only sets the dtype it dequantizes to, the weight stays compressed
             weight = weight.to(dtype=dtype)
             for f in s.weight_function:
                 weight = f(weight)
@@ -538,14 +539,33 @@ if CUBLAS_IS_AVAILABLE:
 # ==============================================================================
 # Mixed Precision Operations
 # ==============================================================================
-from .quant_ops import QuantizedTensor, QUANT_ALGOS
+from .quant_ops import QuantizedTensor, QUANT_ALGOS, LAYOUTS, requantize_like
 
+QUANTIZE_ON_LOAD_MIN_FEATURES = 256
 
-def mixed_precision_ops(layer_quant_config={}, compute_dtype=torch.bfloat16, full_precision_mm=False):
+def quantize_on_load_eligible(weight, quant_format):
+    # only big float matrices are worth it, small layers are often the precision sensitive ones (embedders, final layers)
+    if not (weight.ndim == 2 and
+            weight.dtype in (torch.float32, torch.float16, torch.bfloat16) and
+            min(weight.shape) >= QUANTIZE_ON_LOAD_MIN_FEATURES):
+        return False
+    qconfig = QUANT_ALGOS[quant_format]
+    supports = getattr(LAYOUTS[qconfig["comfy_tensor_layout"]], "supports", None)
+    if supports is not None:
+        return supports(weight, qconfig.get("group_size", None))
+    return True
+
+
+def mixed_precision_ops(layer_quant_config={}, compute_dtype=torch.bfloat16, full_precision_mm=False, quantize_on_load=None):
+    """
+    quantize_on_load: optional dict {"format": QUANT_ALGOS key, "calibration": "absmax" or "mse"}, the weights
+    of the layers that aren't already quantized get quantized while loading and are added to layer_quant_config.
+    """
     class MixedPrecisionOps(manual_cast):
         _layer_quant_config = layer_quant_config
         _compute_dtype = compute_dtype
         _full_precision_mm = full_precision_mm
+        _quantize_on_load = quantize_on_load
 
         class Linear(torch.nn.Module, CastWeightBiasOp):
             def __init__(
@@ -587,7 +607,10 @@ def mixed_precision_ops(layer_quant_config={}, compute_dtype=torch.bfloat16, ful
                 manually_loaded_keys = [weight_key]
 
                 if layer_name not in MixedPrecisionOps._layer_quant_config:
-                    self.weight = torch.nn.Parameter(weight.to(device=device, dtype=MixedPrecisionOps._compute_dtype), requires_grad=False)
+                    if MixedPrecisionOps._quantize_on_load is not None and quantize_on_load_eligible(weight, MixedPrecisionOps._quantize_on_load["format"]):
+                        self.quantize_weight_on_load(layer_name, weight, device)
+                    else:
+                        self.weight = torch.nn.Parameter(weight.to(device=device, dtype=MixedPrecisionOps._compute_dtype), requires_grad=False)
                 else:
                     quant_format = MixedPrecisionOps._layer_quant_config[layer_name].get("format", None)
                     if quant_format is None:
@@ -605,6 +628,12 @@ def mixed_precision_ops(layer_quant_config={}, compute_dtype=torch.bfloat16, ful
                     if layout_params['scale'] is not None:
                         manually_loaded_keys.append(weight_scale_key)
 
+                    for key_suffix, param_name in qconfig.get("layout_parameters", {}).items():
+                        param_key = f"{prefix}{key_suffix}"
+                        layout_params[param_name] = state_dict.pop(param_key, None)
+                        if layout_params[param_name] is not None:
+                            manually_loaded_keys.append(param_key)
+
                     self.weight = torch.nn.Parameter(
                         QuantizedTensor(weight.to(device=device), self.layout_type, layout_params),
                         requires_grad=False
@@ -624,6 +653,39 @@ def mixed_precision_ops(layer_quant_config={}, compute_dtype=torch.bfloat16, ful
                     if key in missing_keys:
                         missing_keys.remove(key)
 
+            def quantize_weight_on_load(self, layer_name, weight, device):
+                quant_format = MixedPrecisionOps._quantize_on_load["format"]
+                qconfig = QUANT_ALGOS[quant_format]
+                self.layout_type = qconfig["comfy_tensor_layout"]
+                quantize_kwargs = {"calibration": MixedPrecisionOps._quantize_on_load.get("calibration", "absmax")}
+                if qconfig.get("group_size", None) is not None:
+                    quantize_kwargs["block_size"] = qconfig["group_size"]
+                # quantize on the compute device, the calibration is too slow on the cpu for big models
+                weight = weight.to(device=comfy.model_management.get_torch_device())
+                qdata, layout_params = LAYOUTS[self.layout_type].quantize(weight, **quantize_kwargs)
+                layout_params = {k: v.to(device=device) if isinstance(v, torch.Tensor) else v for k, v in layout_params.items()}
+                layout_params['orig_dtype'] = MixedPrecisionOps._compute_dtype
+                self.weight = torch.nn.Parameter(QuantizedTensor(qdata.to(device=device), self.layout_type, layout_params), requires_grad=False)
+                MixedPrecisionOps._layer_quant_config[layer_name] = {"format": quant_format}
+
+            def convert_weight(self, weight, inplace=False, **kwargs):
+                # the weight patches (loras) are applied to the dequantized weight
+                if isinstance(weight, QuantizedTensor):
+                    return weight.dequantize()
+                return weight
+
+            def set_weight(self, weight, inplace_update=False, seed=None, return_weight=False, **kwargs):
+                if isinstance(self.weight, QuantizedTensor):
+                    weight = requantize_like(self.weight, weight)
+                else:
+                    weight = comfy.float.stochastic_rounding(weight, self.weight.dtype, seed=seed)
+                if return_weight:
+                    return weight
+                if inplace_update:
+                    self.weight.data.copy_(weight)
+                else:
+                    self.weight = torch.nn.Parameter(weight, requires_grad=False)
+
             def _forward(self, input, weight, bias):
                 return torch.nn.functional.linear(input, weight, bias)
 
@@ -648,6 +710,12 @@ def mixed_precision_ops(layer_quant_config={}, compute_dtype=torch.bfloat16, ful
 def pick_operations(weight_dtype, compute_dtype, load_device=None, disable_fast_fp8=False, fp8_optimizations=False, scaled_fp8=None, model_config=None):
     fp8_compute = comfy.model_management.supports_fp8_compute(load_device) # TODO: if we support more ops this needs to be more granular
 
+    if model_config and getattr(model_config, 'quantize_on_load', None) is not None:
+        if model_config.layer_quant_config is None:
+            model_config.layer_quant_config = {}
+        logging.info(f"Using mixed precision operations with {model_config.quantize_on_load['format']} quantization on load")
+        return mixed_precision_ops(model_config.layer_quant_config, compute_dtype, full_precision_mm=not fp8_compute, quantize_on_load=model_config.quantize_on_load)
+
     if model_config and hasattr(model_config, 'layer_quant_config') and model_config.layer_quant_config:
         logging.info(f"Using mixed precision operations: {len(model_config.layer_quant_config)} quantized layers")
         return mixed_precision_ops(model_config.layer_quant_config, compute_dtype, full_precision_mm=not fp8_compute)
@@ -0,0 +1,93 @@
+"""
+Counter based Philox4x32-10 random number generator implemented with plain torch integer ops.
+
+Every output value is a pure function of (seed, counter) so noise can be generated directly on
+the device the sampler runs on and a batch item only depends on its own index, not on what else
+is in the batch. Results are bit identical for the same device type, different device types can
+differ in the last ulp because of the log/sin/cos implementations.
+"""
+
+import math
+import torch
+
+PHILOX_M0 = 0xD2511F53
+PHILOX_M1 = 0xCD9E8D57
+PHILOX_W0 = 0x9E3779B9
+PHILOX_W1 = 0xBB67AE85
+MASK32 = 0xFFFFFFFF
+
+STREAM_INITIAL_NOISE = 0
+STREAM_SAMPLER_NOISE = 1
+
+
+def mulhilo32(a, b):
+    # 32x32 -> 64 bit multiply split in 16 bit halves of b so nothing overflows int64
+    p_lo = a * (b & 0xFFFF)
+    p_hi = a * (b >> 16)
+    lo = (((p_hi & 0xFFFF) << 16) + p_lo) & MASK32
+    hi = (p_hi + (p_lo >> 16)) >> 16
+    return hi, lo
+
+
+def philox4x32(c0, c1, c2, c3, k0, k1, rounds=10):
+    for _ in range(rounds):
+        hi0, lo0 = mulhilo32(c0, PHILOX_M0)
+        hi1, lo1 = mulhilo32(c2, PHILOX_M1)
+        c0, c1, c2, c3 = hi1 ^ c1 ^ k0, lo1, hi0 ^ c3 ^ k1, lo0
+        k0 = (k0 + PHILOX_W0) & MASK32
+        k1 = (k1 + PHILOX_W1) & MASK32
+    return c0, c1, c2, c3
+
+
+def uint32_to_uniform(x):
+    # top 24 bits so the float32 value is exact, result is in the open interval (0, 1)
+    return ((x >> 8).to(torch.float32) + 0.5) * (1.0 / 16777216.0)
+
+
+def randn(shape, seed, index=0, offset=0, stream=STREAM_INITIAL_NOISE, dtype=torch.float32, device="cpu"):
+    """
+    Standard normal noise of the given shape.
+    index is the batch index (or noise index), offset is the call number for noise samplers that
+    draw fresh noise every step and stream separates the initial latent noise from sampler noise.
+    """
+    numel = math.prod(shape)
+    blocks = (numel + 3) // 4
+    seed = int(seed) & 0xFFFFFFFFFFFFFFFF
+
+    c0 = torch.arange(blocks, dtype=torch.int64, device=device)
+    c1 = torch.full_like(c0, int(offset) & MASK32)
+    c2 = torch.full_like(c0, int(index) & MASK32)
+    c3 = torch.full_like(c0, ((int(stream) & 0xFFFF) << 16) | ((int(offset) >> 32) & 0xFFFF))
+    r = philox4x32(c0, c1, c2, c3, seed & MASK32, (seed >> 32) & MASK32)
+
+    u0, u1, u2, u3 = map(uint32_to_uniform, r)
+    radius0 = torch.sqrt(-2.0 * torch.log(u0))
+    radius1 = torch.sqrt(-2.0 * torch.log(u2))
+    theta0 = (2.0 * math.pi) * u1
+    theta1 = (2.0 * math.pi) * u3
+    out = torch.stack((radius0 * torch.cos(theta0), radius0 * torch.sin(theta0), radius1 * torch.cos(theta1), radius1 * torch.sin(theta1)), dim=-1)
+    return out.flatten()[:numel].reshape(shape).to(dtype)
+
+
+def randn_batch(shape, seed, indexes=None, offset=0, stream=STREAM_INITIAL_NOISE, dtype=torch.float32, device="cpu"):
+    """Noise for a full batch, shape[0] is the batch size and item i uses indexes[i] (default i)."""
+    if indexes is None:
+        indexes = range(shape[0])
+    item_shape = list(shape[1:])
+    return torch.stack([randn(item_shape, seed, index=int(i), offset=offset, stream=stream, dtype=dtype, device=device) for i in indexes])
+
+
+class PhiloxNoiseSampler:
+    """Drop in replacement for k_diffusion default_noise_sampler that draws every call on x.device."""
+
+    def __init__(self, x, seed):
+        self.shape = x.shape
+        self.dtype = x.dtype
+        self.device = x.device
+        self.seed = seed
+        self.calls = 0
+
+    def __call__(self, sigma, sigma_next):
+        noise = randn_batch(self.shape, self.seed, offset=self.calls, stream=STREAM_SAMPLER_NOISE, dtype=self.dtype, device=self.device)
+        self.calls += 1
+        return noise
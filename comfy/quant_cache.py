@@ -0,0 +1,124 @@
+"""
+Disk cache for models quantized on load.
+
+The cache key is a fingerprint of the source file (size, modification time and the first and last MiB)
+together with the quantization settings. Hashing a full 30GB checkpoint would take longer than
+quantizing it again, the fingerprint is enough to notice a file that was replaced or changed.
+
+Every cached model is a full quantized copy so the cache only keeps one copy per source file and format
+(the older fingerprints and settings get deleted) and the least recently used files get deleted once the
+cache is larger than --quantize-cache-size.
+"""
+
+import hashlib
+import json
+import logging
+import os
+
+import torch
+
+import comfy.utils
+from comfy.cli_args import args
+from comfy.quant_ops import QuantizedTensor, LAYOUT_PARAM_KEYS
+
+CACHE_VERSION = 1
+FINGERPRINT_CHUNK = 1024 * 1024
+
+
+def source_fingerprint(path):
+    h = hashlib.sha256()
+    stat = os.stat(path)
+    h.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    with open(path, "rb") as f:
+        h.update(f.read(FINGERPRINT_CHUNK))
+        if stat.st_size > FINGERPRINT_CHUNK:
+            f.seek(max(stat.st_size - FINGERPRINT_CHUNK, FINGERPRINT_CHUNK))
+            h.update(f.read(FINGERPRINT_CHUNK))
+    return h.hexdigest()
+
+
+def enabled():
+    return args.quantize_cache_size > 0
+
+
+def cache_prefix(source_path, quantize):
+    """Start of the names of all the cache files of source_path in this format, whatever its fingerprint or settings."""
+    name = os.path.splitext(os.path.basename(source_path))[0]
+    path_key = hashlib.sha256(os.path.abspath(source_path).encode()).hexdigest()[:8]
+    return f"{name}_{quantize['format']}_{path_key}_"
+
+
+def cache_path(cache_dir, source_path, quantize):
+    settings = json.dumps({"version": CACHE_VERSION, "quantize": quantize}, sort_keys=True)
+    key = hashlib.sha256(f"{source_fingerprint(source_path)}:{settings}".encode()).hexdigest()[:32]
+    return os.path.join(cache_dir, f"{cache_prefix(source_path, quantize)}{key}.safetensors")
+
+
+def touch(path):
+    """Marks a cache file as used, the eviction goes by modification time."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+        logging.info(f"Removed quantized model from cache: {path}")
+    except OSError as e:
+        logging.warning(f"Could not remove quantized model cache {path}: {e}")
+
+
+def cleanup(cache_dir, keep_path, prefix, max_bytes):
+    """Deletes the other copies of the same model and format, then the least recently used files over max_bytes."""
+    files = []
+    for entry in os.scandir(cache_dir):
+        if not entry.is_file() or not entry.name.endswith(".safetensors") or entry.path == keep_path:
+            continue
+        if entry.name.startswith(prefix):
+            remove_file(entry.path)
+            continue
+        stat = entry.stat()
+        files.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in files)
+    if os.path.isfile(keep_path):
+        total += os.path.getsize(keep_path)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        remove_file(path)
+        total -= size
+
+
+def quantized_state_dict(model):
+    """State dict with the QuantizedTensor weights split in the same keys a pre quantized checkpoint uses."""
+    sd = {}
+    for k, v in model.state_dict().items():
+        if isinstance(v, QuantizedTensor):
+            sd[k] = v._qdata.contiguous()
+            prefix = k[:-len("weight")]
+            for param_name, key_suffix in LAYOUT_PARAM_KEYS.items():
+                param = v._layout_params.get(param_name, None)
+                if isinstance(param, torch.Tensor):
+                    sd[f"{prefix}{key_suffix}"] = param.contiguous()
+        else:
+            sd[k] = v.contiguous()
+    return sd
+
+
+def save(path, model, layer_quant_config, prefix=None):
+    metadata = {"_quantization_metadata": json.dumps({"format_version": "1.0", "layers": layer_quant_config})}
+    tmp_path = f"{path}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        comfy.utils.save_torch_file(quantized_state_dict(model), tmp_path, metadata=metadata)
+        os.replace(tmp_path, path)
+        logging.info(f"Saved quantized model to cache: {path}")
+    except Exception as e:
+        logging.warning(f"Could not save quantized model to cache {path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    if prefix is not None:
+        cleanup(os.path.dirname(path), path, prefix, args.quantize_cache_size * 1024 * 1024 * 1024)
@@ -424,19 +424,297 @@ class TensorCoreFP8Layout(QuantizedLayout):
     def get_plain_tensors(cls, qtensor):
         return qtensor._qdata, qtensor._layout_params['scale']
 
+# ==============================================================================
+# Per Channel Weight Only Layouts
+# ==============================================================================
+CALIBRATION_CLIP_RATIOS = (1.0, 0.95, 0.9, 0.85, 0.8, 0.75, 0.7, 0.6, 0.5)
+
+def calibrate_channelwise_scale(tensor, qmax, round_fn, calibration="absmax"):
+    """
+    One scale per output channel (dim 0).
+    absmax: the largest value of the channel maps to qmax.
+    mse: searches the clipping ratio per channel that gives the lowest quantization error,
+         clipping a few outliers usually gives better precision for all the other values.
+    """
+    w = tensor.float().reshape(tensor.shape[0], -1)
+    amax = w.abs().amax(dim=1).clamp(min=1e-12)
+    scale = amax / qmax
+    if calibration == "absmax":
+        return scale
+    if calibration != "mse":
+        raise ValueError(f"Unknown calibration method: {calibration}")
+
+    best_error = None
+    best_scale = scale
+    for ratio in CALIBRATION_CLIP_RATIOS:
+        s = scale * ratio
+        error = (round_fn(w / s.unsqueeze(1)) * s.unsqueeze(1) - w).square_().sum(dim=1)
+        if best_error is None:
+            best_error = error
+            continue
+        better = error < best_error
+        best_error = torch.where(better, error, best_error)
+        best_scale = torch.where(better, s, best_scale)
+    return best_scale
+
+
+class ChannelwiseWeightLayout(QuantizedLayout):
+    """
+    Weight only quantization with one symmetric scale per output channel, the matmul runs in the
+    compute dtype on the dequantized weight so it works on every device.
+    Storage format:
+    - qdata: storage_dtype tensor
+    - scale: float32 tensor of shape (out_features, 1, ...)
+    - orig_dtype: Original dtype before quantization (for casting back)
+    """
+    storage_dtype = None
+    qmax = None
+
+    @classmethod
+    def round(cls, x):
+        raise NotImplementedError(f"{cls.__name__} must implement round()")
+
+    @classmethod
+    def quantize(cls, tensor, scale=None, calibration="absmax", **kwargs):
+        orig_dtype = tensor.dtype
+        if scale is None:
+            scale = calibrate_channelwise_scale(tensor, cls.qmax, cls.round, calibration)
+        if not isinstance(scale, torch.Tensor):
+            scale = torch.tensor(scale)
+        scale = scale.to(device=tensor.device, dtype=torch.float32)
+        if scale.ndim > 0:
+            scale = scale.reshape(-1, *([1] * (tensor.ndim - 1)))
+
+        qdata = cls.round(tensor.float() / scale).to(cls.storage_dtype, memory_format=torch.contiguous_format)
+        layout_params = {
+            'scale': scale,
+            'orig_dtype': orig_dtype
+        }
+        return qdata, layout_params
+
+    @staticmethod
+    def dequantize(qdata, scale, orig_dtype, **kwargs):
+        plain_tensor = torch.ops.aten._to_copy.default(qdata, dtype=orig_dtype)
+        return plain_tensor * scale.to(orig_dtype)
+
+    @classmethod
+    def get_plain_tensors(cls, qtensor):
+        return qtensor._qdata, qtensor._layout_params['scale']
+
+
+class ChannelwiseInt8Layout(ChannelwiseWeightLayout):
+    storage_dtype = torch.int8
+    qmax = 127.0
+
+    @classmethod
+    def round(cls, x):
+        return torch.round(x).clamp_(-cls.qmax, cls.qmax)
+
+
+class ChannelwiseFP8Layout(ChannelwiseWeightLayout):
+    storage_dtype = torch.float8_e4m3fn
+    qmax = torch.finfo(torch.float8_e4m3fn).max
+
+    @classmethod
+    def round(cls, x):
+        return x.clamp(-cls.qmax, cls.qmax).to(cls.storage_dtype).float()
+
+
+# ==============================================================================
+# Block / Group Scaled Layouts
+# ==============================================================================
+def _pad_to_multiple(tensor, multiple, dims):
+    pad = []
+    for d in reversed(range(tensor.ndim)):
+        pad += [0, (-tensor.shape[d]) % multiple if d in dims else 0]
+    if any(pad):
+        tensor = torch.nn.functional.pad(tensor, pad)
+    return tensor
+
+
+class BlockwiseFP8Layout(QuantizedLayout):
+    """
+    FP8 with one scale per block_size x block_size block of the weight, an outlier only affects the precision
+    of its own block instead of the whole tensor.
+    Storage format:
+    - qdata: FP8 tensor (torch.float8_e4m3fn)
+    - scale: float32 tensor of shape (ceil(out_features / block_size), ceil(in_features / block_size))
+    - block_size: Block edge length
+    - orig_dtype: Original dtype before quantization (for casting back)
+    """
+    @classmethod
+    def quantize(cls, tensor, scale=None, block_size=128, dtype=torch.float8_e4m3fn, **kwargs):
+        orig_dtype = tensor.dtype
+        out_features, in_features = tensor.shape
+        lp_amax = torch.finfo(dtype).max
+        w = _pad_to_multiple(tensor.float(), block_size, (0, 1))
+        blocks = w.reshape(w.shape[0] // block_size, block_size, w.shape[1] // block_size, block_size)
+        if scale is None:
+            scale = blocks.abs().amax(dim=(1, 3)).clamp(min=1e-12) / lp_amax
+        scale = scale.to(device=tensor.device, dtype=torch.float32)
+
+        blocks = (blocks / scale[:, None, :, None]).clamp(min=-lp_amax, max=lp_amax)
+        qdata = blocks.reshape(w.shape)[:out_features, :in_features].to(dtype, memory_format=torch.contiguous_format)
+        layout_params = {
+            'scale': scale,
+            'block_size': block_size,
+            'orig_dtype': orig_dtype
+        }
+        return qdata, layout_params
+
+    @staticmethod
+    def dequantize(qdata, scale, orig_dtype, block_size=128, **kwargs):
+        out_features, in_features = qdata.shape
+        scale = scale.to(orig_dtype).repeat_interleave(block_size, dim=0).repeat_interleave(block_size, dim=1)
+        plain_tensor = torch.ops.aten._to_copy.default(qdata, dtype=orig_dtype)
+        return plain_tensor * scale[:out_features, :in_features]
+
+    @classmethod
+    def get_plain_tensors(cls, qtensor):
+        return qtensor._qdata, qtensor._layout_params['scale']
+
+
+class Int4GroupwiseLayout(QuantizedLayout):
+    """
+    Asymmetric 4 bit weights with a scale and zero point for every group_size input features (GPTQ/AWQ style).
+    w = (q - zero_point) * scale
+    Storage format:
+    - qdata: uint8 tensor of shape (out_features, in_features // 2), two weights per byte, low nibble first
+    - scale: float32 tensor of shape (out_features, in_features // group_size)
+    - zero_point: uint8 tensor of shape (out_features, in_features // group_size)
+    - block_size: group size
+    - orig_dtype: Original dtype before quantization (for casting back)
+    """
+    @staticmethod
+    def supports(tensor, block_size=128):
+        return tensor.ndim == 2 and tensor.shape[1] % block_size == 0
+
+    @staticmethod
+    def pack(q):
+        return q[:, 0::2] | (q[:, 1::2] << 4)
+
+    @staticmethod
+    def unpack(packed):
+        return torch.stack((packed & 0xF, packed >> 4), dim=-1).reshape(packed.shape[0], -1)
+
+    @classmethod
+    def quantize(cls, tensor, block_size=128, **kwargs):
+        if not cls.supports(tensor, block_size):
+            raise ValueError(f"Int4GroupwiseLayout needs a 2D tensor with in_features divisible by {block_size}, got {tuple(tensor.shape)}")
+        orig_dtype = tensor.dtype
+        out_features, in_features = tensor.shape
+        groups = tensor.float().reshape(out_features, in_features // block_size, block_size)
+        w_min = groups.amin(dim=-1).clamp(max=0.0)
+        w_max = groups.amax(dim=-1).clamp(min=0.0)
+        scale = ((w_max - w_min) / 15.0).clamp(min=1e-12)
+        zero_point = torch.round(-w_min / scale).clamp(0, 15)
+
+        q = torch.round(groups / scale.unsqueeze(-1) + zero_point.unsqueeze(-1)).clamp(0, 15).to(torch.uint8)
+        layout_params = {
+            'scale': scale,
+            'zero_point': zero_point.to(torch.uint8),
+            'block_size': block_size,
+            'orig_dtype': orig_dtype
+        }
+        return cls.pack(q.reshape(out_features, in_features)).contiguous(), layout_params
+
+    @classmethod
+    def dequantize(cls, qdata, scale, zero_point, orig_dtype, block_size=128, **kwargs):
+        q = cls.unpack(qdata)
+        out_features, in_features = q.shape
+        q = q.reshape(out_features, in_features // block_size, block_size).to(orig_dtype)
+        w = (q - zero_point.to(orig_dtype).unsqueeze(-1)) * scale.to(orig_dtype).unsqueeze(-1)
+        return w.reshape(out_features, in_features)
+
+    @classmethod
+    def get_plain_tensors(cls, qtensor):
+        return qtensor._qdata, qtensor._layout_params['scale'], qtensor._layout_params['zero_point']
+
+
+def requantize_like(qtensor, tensor):
+    """
+    Quantizes the high precision tensor with the layout and settings (block size, storage dtype) of qtensor,
+    used to store a quantized weight again after the weight patches got applied to its dequantized values.
+    """
+    layout_params = qtensor._layout_params
+    quantize_kwargs = {}
+    if layout_params.get('block_size', None) is not None:
+        quantize_kwargs['block_size'] = layout_params['block_size']
+    if qtensor._qdata.dtype.is_floating_point:
+        quantize_kwargs['dtype'] = qtensor._qdata.dtype
+    qdata, new_params = LAYOUTS[qtensor._layout_type].quantize(tensor, **quantize_kwargs)
+    new_params['orig_dtype'] = layout_params['orig_dtype']
+    return QuantizedTensor(qdata, qtensor._layout_type, new_params)
+
+
 QUANT_ALGOS = {
     "float8_e4m3fn": {
         "storage_t": torch.float8_e4m3fn,
         "parameters": {"weight_scale", "input_scale"},
         "comfy_tensor_layout": "TensorCoreFP8Layout",
     },
+    "int8_channelwise": {
+        "storage_t": torch.int8,
+        "parameters": {"weight_scale"},
+        "comfy_tensor_layout": "ChannelwiseInt8Layout",
+    },
+    "float8_e4m3fn_channelwise": {
+        "storage_t": torch.float8_e4m3fn,
+        "parameters": {"weight_scale"},
+        "comfy_tensor_layout": "ChannelwiseFP8Layout",
+    },
+    "float8_e4m3fn_blockwise": {
+        "storage_t": torch.float8_e4m3fn,
+        "parameters": {"weight_scale"},
+        "comfy_tensor_layout": "BlockwiseFP8Layout",
+        "group_size": 128,
+    },
+    "int4_groupwise": {
+        "storage_t": torch.uint8,
+        "parameters": {"weight_scale"},
+        "layout_parameters": {"weight_zero_point": "zero_point"},
+        "comfy_tensor_layout": "Int4GroupwiseLayout",
+        "group_size": 128,
+    },
 }
 
 LAYOUTS = {
     "TensorCoreFP8Layout": TensorCoreFP8Layout,
+    "ChannelwiseInt8Layout": ChannelwiseInt8Layout,
+    "ChannelwiseFP8Layout": ChannelwiseFP8Layout,
+    "BlockwiseFP8Layout": BlockwiseFP8Layout,
+    "Int4GroupwiseLayout": Int4GroupwiseLayout,
+}
+
+# state dict key suffix of the tensor layout params when saved in a checkpoint
+LAYOUT_PARAM_KEYS = {
+    "scale": "weight_scale",
+    "zero_point": "weight_zero_point",
 }
 
 
+@register_layout_op(torch.ops.aten.linear.default, "ChannelwiseInt8Layout")
+@register_layout_op(torch.ops.aten.linear.default, "ChannelwiseFP8Layout")
+@register_layout_op(torch.ops.aten.linear.default, "BlockwiseFP8Layout")
+@register_layout_op(torch.ops.aten.linear.default, "Int4GroupwiseLayout")
+def weight_only_linear(func, args, kwargs):
+    """Dequantizes the weight on the device it is used on so only the compressed weight has to be transferred in lowvram mode."""
+    input_tensor = args[0]
+    weight = args[1]
+    bias = args[2] if len(args) > 2 else None
+
+    if isinstance(input_tensor, QuantizedTensor):
+        input_tensor = input_tensor.dequantize()
+    if isinstance(weight, QuantizedTensor):
+        layout_params = dict(weight._layout_params)
+        layout_params['orig_dtype'] = input_tensor.dtype
+        weight = LAYOUTS[weight._layout_type].dequantize(weight._qdata, **layout_params)
+    if isinstance(bias, QuantizedTensor):
+        bias = bias.dequantize()
+
+    return torch.nn.functional.linear(input_tensor, weight, bias)
+
+
 @register_layout_op(torch.ops.aten.linear.default, "TensorCoreFP8Layout")
 def fp8_linear(func, args, kwargs):
     input_tensor = args[0]
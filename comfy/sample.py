@@ -5,6 +5,8 @@ import comfy.utils
 import numpy as np
 import logging
 import comfy.nested_tensor
+import comfy.philox
+from comfy.cli_args import args
 
 def prepare_noise_inner(latent_image, generator, noise_inds=None):
     if noise_inds is None:
@@ -19,11 +21,28 @@ def prepare_noise_inner(latent_image, generator, noise_inds=None):
     noises = [noises[i] for i in inverse]
     return torch.cat(noises, axis=0)
 
-def prepare_noise(latent_image, seed, noise_inds=None):
+def prepare_noise_philox(latent_image, seed, noise_inds=None, stream=comfy.philox.STREAM_INITIAL_NOISE):
+    if noise_inds is None:
+        noise_inds = range(latent_image.shape[0])
+    device = comfy.model_management.get_torch_device()
+    # stays on the sampling device, the sampler would move it right back there
+    return comfy.philox.randn_batch(latent_image.shape, seed, indexes=noise_inds, stream=stream, dtype=latent_image.dtype, device=device)
+
+def prepare_noise(latent_image, seed, noise_inds=None, generator=None):
     """
     creates random noise given a latent image and a seed.
     optional arg skip can be used to skip and discard x number of noise generations for a given seed
+    generator can be "cpu" or "philox", by default the --noise-generator option is used.
     """
+    if generator is None:
+        generator = args.noise_generator
+
+    if generator == "philox":
+        if latent_image.is_nested:
+            # each nested latent gets its own stream so they don't share noise
+            return comfy.nested_tensor.NestedTensor([prepare_noise_philox(t, seed, noise_inds, stream=comfy.philox.STREAM_INITIAL_NOISE + 2 * i) for i, t in enumerate(latent_image.unbind())])
+        return prepare_noise_philox(latent_image, seed, noise_inds)
+
     generator = torch.manual_seed(seed)
 
     if latent_image.is_nested:
@@ -726,6 +726,22 @@ KSAMPLER_NAMES = ["euler", "euler_cfg_pp", "euler_ancestral", "euler_ancestral_c
                   "ipndm", "ipndm_v", "deis", "res_multistep", "res_multistep_cfg_pp", "res_multistep_ancestral", "res_multistep_ancestral_cfg_pp",
                   "gradient_estimation", "gradient_estimation_cfg_pp", "er_sde", "seeds_2", "seeds_3", "sa_solver", "sa_solver_pece"]
 
+class SamplingConverged(Exception):
+    """
+    Raised from inside a model call to end sampling early. The sampler output becomes a single
+    euler (DDIM) jump from x to the last sigma using the denoised prediction.
+    """
+    def __init__(self, x, denoised, sigma, step):
+        super().__init__("Sampling converged at step {}".format(step))
+        self.x = x
+        self.denoised = denoised
+        self.sigma = sigma
+        self.step = step
+
+    def jump_to_sigma(self, denoised, sigma_next):
+        ratio = sigma_next / self.sigma
+        return denoised + (self.x - denoised) * ratio.reshape(ratio.shape[:1] + (1,) * (self.x.ndim - 1))
+
 class KSAMPLER(Sampler):
     def __init__(self, sampler_function, extra_options={}, inpaint_options={}):
         self.sampler_function = sampler_function
@@ -749,7 +765,15 @@ class KSAMPLER(Sampler):
         if callback is not None:
             k_callback = lambda x: callback(x["i"], x["denoised"], x["x"], total_steps)
 
-        samples = self.sampler_function(model_k, noise, sigmas, extra_args=extra_args, callback=k_callback, disable=disable_pbar, **self.extra_options)
+        try:
+            samples = self.sampler_function(model_k, noise, sigmas, extra_args=extra_args, callback=k_callback, disable=disable_pbar, **self.extra_options)
+        except SamplingConverged as e:
+            denoised = e.denoised
+            if denoise_mask is not None:
+                denoised = denoised * denoise_mask + latent_image * (1.0 - denoise_mask)
+            samples = e.jump_to_sigma(denoised, sigmas[-1])
+            if k_callback is not None:
+                k_callback({"x": samples, "i": total_steps - 1, "sigma": sigmas[-2], "sigma_hat": sigmas[-2], "denoised": denoised})
         samples = model_wrap.inner_model.model_sampling.inverse_noise_scaling(sigmas[-1], samples)
         return samples
 
@@ -1046,6 +1070,76 @@ class CFGGuider:
         return output
 
 
+class ProgressiveCFGGuider(CFGGuider):
+    """
+    CFGGuider that samples the high sigma part of the schedule at a reduced latent resolution.
+    Each low resolution stage is finished with a jump to sigma 0, the denoised latent gets upscaled
+    and noised again to the first sigma of the next stage, like a KSampler -> LatentUpscale -> KSampler chain.
+    """
+    def __init__(self, model_patcher: ModelPatcher):
+        super().__init__(model_patcher)
+        self.resolution_schedule = []
+        self.upscale_method = "bislerp"
+
+    def set_resolution_schedule(self, resolution_schedule, upscale_method="bislerp"):
+        # list of (scale, sigma_end) tuples, the latent is sampled at scale while sigma > sigma_end
+        self.resolution_schedule = sorted(resolution_schedule, key=lambda a: -a[1])
+        self.upscale_method = upscale_method
+
+    def get_stages(self, sigmas):
+        stages = []
+        start = 0
+        last_step = sigmas.shape[-1] - 1
+        for scale, sigma_end in self.resolution_schedule:
+            end = start
+            while end < last_step and sigmas[end] > sigma_end:
+                end += 1
+            # the full resolution stage needs at least one step
+            if scale != 1.0 and end > start and end < last_step:
+                stages.append((scale, start, end))
+                start = end
+        stages.append((1.0, start, last_step))
+        return stages
+
+    def resize_latent(self, latent, full_shape, scale, upscale_method):
+        height = max(2, round(full_shape[-2] * scale / 2) * 2) if scale != 1.0 else full_shape[-2]
+        width = max(2, round(full_shape[-1] * scale / 2) * 2) if scale != 1.0 else full_shape[-1]
+        if latent.shape[-2] == height and latent.shape[-1] == width:
+            return latent
+        return comfy.utils.common_upscale(latent, width, height, upscale_method, "disabled")
+
+    def resize_noise(self, noise, scale):
+        resized = self.resize_latent(noise, noise.shape, scale, "area")
+        if resized is noise:
+            return noise
+        # averaging lowers the std of the noise, bring it back to the one of the original noise
+        # the clamp keeps all zero noise (DisableNoise) at zero instead of 0/0
+        return resized * (noise.std() / resized.std().clamp(min=1e-12))
+
+    def sample(self, noise, latent_image, sampler, sigmas, denoise_mask=None, callback=None, disable_pbar=False, seed=None):
+        stages = self.get_stages(sigmas)
+        if len(stages) == 1 or latent_image.is_nested:
+            return super().sample(noise, latent_image, sampler, sigmas, denoise_mask, callback, disable_pbar, seed)
+
+        total_steps = sigmas.shape[-1] - 1
+        full_shape = latent_image.shape
+        output = latent_image
+        for i, (scale, start, end) in enumerate(stages):
+            if end == total_steps:
+                stage_sigmas = sigmas[start:]
+            else:
+                stage_sigmas = torch.cat([sigmas[start:end], sigmas.new_zeros([1])])
+            logging.info("Progressive sampling stage {}: steps {}-{} at {}x resolution".format(i, start, end, scale))
+
+            stage_callback = None
+            if callback is not None:
+                stage_callback = lambda step, x0, x, _, offset=start: callback(step + offset, x0, x, total_steps)
+
+            stage_latent = self.resize_latent(output, full_shape, scale, self.upscale_method if i > 0 else "area")
+            output = super().sample(self.resize_noise(noise, scale), stage_latent, sampler, stage_sigmas, denoise_mask, stage_callback, disable_pbar, seed)
+        return output
+
+
 def sample(model, noise, positive, negative, cfg, device, sampler, sigmas, model_options={}, latent_image=None, denoise_mask=None, callback=None, disable_pbar=False, seed=None):
     cfg_guider = CFGGuider(model)
     cfg_guider.set_conds(positive, negative)
@@ -23,8 +23,11 @@ import comfy.pixel_space_convert
 import yaml
 import math
 import os
+import uuid
 
 import comfy.utils
+import comfy.quant_cache
+import comfy.vae_decode_cache
 
 from . import clip_vision
 from . import gligen
@@ -59,6 +62,7 @@ import comfy.lora_convert
 import comfy.hooks
 import comfy.t2i_adapter.adapter
 import comfy.taesd.taesd
+import comfy.taesd.taehv
 
 import comfy.ldm.flux.redux
 
@@ -275,7 +279,7 @@ class CLIP:
         return self.patcher.get_key_patches()
 
 class VAE:
-    def __init__(self, sd=None, device=None, config=None, dtype=None, metadata=None):
+    def __init__(self, sd=None, device=None, config=None, dtype=None, metadata=None, latent_format=None):
         if 'decoder.up_blocks.0.resnets.0.norm1.weight' in sd.keys(): #diffusers format
             sd = diffusers_convert.convert_vae_state_dict(sd)
 
@@ -314,7 +318,23 @@ class VAE:
                                                             decoder_config={'target': "comfy.ldm.modules.temporal_ae.VideoDecoder", 'params': decoder_config})
             elif "taesd_decoder.1.weight" in sd:
                 self.latent_channels = sd["taesd_decoder.1.weight"].shape[1]
-                self.first_stage_model = comfy.taesd.taesd.TAESD(latent_channels=self.latent_channels)
+                self.first_stage_model = comfy.taesd.taesd.TAESD(latent_channels=self.latent_channels, latent_format=latent_format)
+                if "taesd_encoder.1.weight" not in sd: # decoder only, used for draft decodes
+                    self.first_stage_model.taesd_encoder = None
+            elif "decoder.7.conv.weight" in sd and "decoder.22.weight" in sd: # TAEHV: tiny temporal decoder for video latents
+                taehv_config = comfy.taesd.taehv.taehv_config(sd)
+                self.latent_channels = taehv_config["latent_channels"]
+                self.first_stage_model = comfy.taesd.taehv.TAEHV(latent_format=latent_format, **taehv_config)
+                time_upscale = self.first_stage_model.time_upscale
+                spacial_upscale = 8 * self.first_stage_model.patch_size
+                self.upscale_ratio = (lambda a: max(0, a * time_upscale - (time_upscale - 1)), spacial_upscale, spacial_upscale)
+                self.upscale_index_formula = (time_upscale, spacial_upscale, spacial_upscale)
+                self.downscale_ratio = (lambda a: max(0, math.floor((a + time_upscale - 1) / time_upscale)), spacial_upscale, spacial_upscale)
+                self.downscale_index_formula = (time_upscale, spacial_upscale, spacial_upscale)
+                self.latent_dim = 3
+                self.working_dtypes = [torch.float16, torch.bfloat16, torch.float32]
+                # the activations of a chunk of frames plus the decoded video
+                self.memory_used_decode = lambda shape, dtype: (1500 + 12 * shape[2]) * shape[3] * shape[4] * (spacial_upscale * spacial_upscale) * model_management.dtype_size(dtype)
             elif "vquantizer.codebook.weight" in sd: #VQGan: stage a of stable cascade
                 self.first_stage_model = StageA()
                 self.downscale_ratio = 4
@@ -609,6 +629,7 @@ class VAE:
         self.output_device = model_management.intermediate_device()
 
         self.patcher = comfy.model_patcher.ModelPatcher(self.first_stage_model, load_device=self.device, offload_device=offload_device)
+        self.decode_cache_id = uuid.uuid4()
         logging.info("VAE load device: {}, offload device: {}, dtype: {}".format(self.device, offload_device, self.vae_dtype))
         self.model_size()
 
@@ -621,6 +642,12 @@ class VAE:
     def get_ram_usage(self):
         return self.model_size()
 
+    def decode_cache_key(self, samples):
+        """Key of the decode results of samples in comfy.vae_decode_cache, None when the cache is disabled."""
+        if not comfy.vae_decode_cache.DECODE_CACHE.enabled():
+            return None
+        return (self.decode_cache_id, self.patcher.patches_uuid, comfy.vae_decode_cache.latent_hash(samples))
+
     def throw_exception_if_invalid(self):
         if self.first_stage_model is None:
             raise RuntimeError("ERROR: VAE is invalid: None\n\nIf the VAE is from a checkpoint loader node your checkpoint does not contain a valid VAE.")
@@ -647,9 +674,9 @@ class VAE:
 
         decode_fn = lambda a: self.first_stage_model.decode(a.to(self.vae_dtype).to(self.device)).float()
         output = self.process_output(
-            (comfy.utils.tiled_scale(samples, decode_fn, tile_x // 2, tile_y * 2, overlap, upscale_amount = self.upscale_ratio, output_device=self.output_device, pbar = pbar) +
-            comfy.utils.tiled_scale(samples, decode_fn, tile_x * 2, tile_y // 2, overlap, upscale_amount = self.upscale_ratio, output_device=self.output_device, pbar = pbar) +
-             comfy.utils.tiled_scale(samples, decode_fn, tile_x, tile_y, overlap, upscale_amount = self.upscale_ratio, output_device=self.output_device, pbar = pbar))
+            (self.tiled_scale_decode(samples, decode_fn, (tile_y * 2, tile_x // 2), overlap, pbar=pbar) +
+            self.tiled_scale_decode(samples, decode_fn, (tile_y // 2, tile_x * 2), overlap, pbar=pbar) +
+             self.tiled_scale_decode(samples, decode_fn, (tile_y, tile_x), overlap, pbar=pbar))
             / 3.0)
         return output
 
@@ -664,8 +691,51 @@ class VAE:
         return self.process_output(comfy.utils.tiled_scale_multidim(samples, decode_fn, tile=(tile_x,), overlap=overlap, upscale_amount=self.upscale_ratio, out_channels=self.output_channels, output_device=self.output_device))
 
     def decode_tiled_3d(self, samples, tile_t=999, tile_x=32, tile_y=32, overlap=(1, 8, 8)):
+        if hasattr(self.first_stage_model, "decode_stream"):
+            # causal video VAEs already decode a chunk of frames at a time carrying their conv caches between the chunks,
+            # tiling them in time only recomputes the overlapping frames without the causal context
+            tile_t = samples.shape[2]
         decode_fn = lambda a: self.first_stage_model.decode(a.to(self.vae_dtype).to(self.device)).float()
-        return self.process_output(comfy.utils.tiled_scale_multidim(samples, decode_fn, tile=(tile_t, tile_x, tile_y), overlap=overlap, upscale_amount=self.upscale_ratio, out_channels=self.output_channels, index_formulas=self.upscale_index_formula, output_device=self.output_device))
+        return self.process_output(self.tiled_scale_decode(samples, decode_fn, (tile_t, tile_x, tile_y), overlap, out_channels=self.output_channels, index_formulas=self.upscale_index_formula))
+
+    def tiled_decode_options(self, samples, tile, out_channels=3):
+        """
+        Returns (tile_batch, accumulate_device) for decoding samples with tiles of shape tile: as many tiles as fit in the free
+        memory get decoded in one call and the tiles get blended on the vae device when the blend buffers fit next to them.
+        """
+        dims = samples.ndim - 2
+        tile_shape = [1, samples.shape[1]] + [min(t, s) for t, s in zip(tile, samples.shape[2:])]
+        tile_memory = self.memory_used_decode(tile_shape, self.vae_dtype)
+        free_memory = model_management.get_free_memory(self.device)
+
+        ratios = self.upscale_ratio if isinstance(self.upscale_ratio, tuple) else (self.upscale_ratio,) * dims
+        output_elements = out_channels + 1
+        for size, ratio in zip(samples.shape[2:], ratios):
+            output_elements *= ratio(size) if callable(ratio) else round(size * ratio)
+        output_memory = output_elements * 4
+
+        accumulate_device = self.output_device
+        if free_memory > output_memory + tile_memory:
+            accumulate_device = self.device
+            free_memory -= output_memory
+        return max(1, int(free_memory / tile_memory)), accumulate_device
+
+    def tiled_scale_decode(self, samples, decode_fn, tile, overlap, out_channels=3, index_formulas=None, pbar=None):
+        tile_batch, accumulate_device = self.tiled_decode_options(samples, tile, out_channels=out_channels)
+        do_fallback = False
+        try:
+            return comfy.utils.tiled_scale_multidim(samples, decode_fn, tile=tile, overlap=overlap, upscale_amount=self.upscale_ratio, out_channels=out_channels,
+                                                    index_formulas=index_formulas, output_device=self.output_device, pbar=pbar,
+                                                    tile_batch=tile_batch, accumulate_device=accumulate_device)
+        except model_management.OOM_EXCEPTION:
+            if tile_batch == 1 and accumulate_device == self.output_device:
+                raise
+            do_fallback = True
+
+        if do_fallback:
+            logging.warning("Warning: Ran out of memory when batching the VAE decode tiles, retrying one tile at a time.")
+            return comfy.utils.tiled_scale_multidim(samples, decode_fn, tile=tile, overlap=overlap, upscale_amount=self.upscale_ratio, out_channels=out_channels,
+                                                    index_formulas=index_formulas, output_device=self.output_device, pbar=pbar)
 
     def encode_tiled_(self, pixel_samples, tile_x=512, tile_y=512, overlap = 64):
         steps = pixel_samples.shape[0] * comfy.utils.get_tiled_scale_steps(pixel_samples.shape[3], pixel_samples.shape[2], tile_x, tile_y, overlap)
@@ -700,11 +770,19 @@ class VAE:
             return out.reshape(samples.shape[0], self.latent_channels, extra_channel_size, -1)
 
     def encode_tiled_3d(self, samples, tile_t=9999, tile_x=512, tile_y=512, overlap=(1, 64, 64)):
+        if hasattr(self.first_stage_model, "encode_stream"):
+            tile_t = samples.shape[2]
         encode_fn = lambda a: self.first_stage_model.encode((self.process_input(a)).to(self.vae_dtype).to(self.device)).float()
         return comfy.utils.tiled_scale_multidim(samples, encode_fn, tile=(tile_t, tile_x, tile_y), overlap=overlap, upscale_amount=self.downscale_ratio, out_channels=self.latent_channels, downscale=True, index_formulas=self.downscale_index_formula, output_device=self.output_device)
 
     def decode(self, samples_in, vae_options={}):
         self.throw_exception_if_invalid()
+        cache_key = self.decode_cache_key(samples_in) if len(vae_options) == 0 else None
+        if cache_key is not None:
+            cached = comfy.vae_decode_cache.DECODE_CACHE.get(cache_key + ("decode",))
+            if cached is not None:
+                return cached
+
         pixel_samples = None
         do_tile = False
         try:
@@ -740,10 +818,64 @@ class VAE:
                 pixel_samples = self.decode_tiled_3d(samples_in, tile_x=tile, tile_y=tile, overlap=(1, overlap, overlap))
 
         pixel_samples = pixel_samples.to(self.output_device).movedim(1,-1)
+        if cache_key is not None:
+            comfy.vae_decode_cache.DECODE_CACHE.put(cache_key + ("decode",), pixel_samples)
         return pixel_samples
 
+    def decode_stream(self, samples_in):
+        """
+        Decodes a video latent a few frames at a time without ever holding the full video, yields [frames, H, W, C]
+        tensors on the vae device with the batch folded into the frames like VAEDecode does.
+        Only causal video VAEs that have a decode_stream method actually stream, the others yield the whole decode at once.
+        """
+        self.throw_exception_if_invalid()
+        cache_key = self.decode_cache_key(samples_in)
+        cached = comfy.vae_decode_cache.DECODE_CACHE.get(cache_key + ("decode",)) if cache_key is not None else None
+        if cached is not None or samples_in.ndim != 5 or not hasattr(self.first_stage_model, "decode_stream"):
+            images = cached if cached is not None else self.decode(samples_in)
+            yield images.reshape((-1,) + tuple(images.shape[-3:]))
+            return
+
+        frames = 0
+        do_fallback = False
+        try:
+            memory_used = self.memory_used_decode(samples_in.shape, self.vae_dtype)
+            model_management.load_models_gpu([self.patcher], memory_required=memory_used, force_full_load=self.disable_offload)
+            for x in range(samples_in.shape[0]):
+                samples = samples_in[x:x + 1].to(self.vae_dtype).to(self.device)
+                for out in self.first_stage_model.decode_stream(samples):
+                    out = self.process_output(out.float())[0].movedim(0, -1)
+                    frames += out.shape[0]
+                    yield out
+        except model_management.OOM_EXCEPTION:
+            if frames > 0:
+                raise
+            do_fallback = True
+
+        if do_fallback:
+            logging.warning("Warning: Ran out of memory when streaming VAE decoding, retrying with regular VAE decoding.")
+            images = self.decode(samples_in)
+            yield images.reshape((-1,) + tuple(images.shape[-3:]))
+
+    def decode_output_shape(self, latent_shape):
+        """(frames, height, width) of the images that decoding a video latent of latent_shape gives, with the batch folded into the frames."""
+        ratios = self.upscale_ratio if isinstance(self.upscale_ratio, tuple) else (1, self.upscale_ratio, self.upscale_ratio)
+        out = []
+        for size, ratio in zip(latent_shape[2:], ratios):
+            out.append(ratio(size) if callable(ratio) else round(size * ratio))
+        out[0] *= latent_shape[0]
+        return tuple(out)
+
     def decode_tiled(self, samples, tile_x=None, tile_y=None, overlap=None, tile_t=None, overlap_t=None):
         self.throw_exception_if_invalid()
+        cache_key = self.decode_cache_key(samples)
+        if cache_key is not None:
+            # a regular decode of the same latent is at least as good as a tiled one
+            for options in (("decode",), ("decode_tiled", tile_x, tile_y, overlap, tile_t, overlap_t)):
+                cached = comfy.vae_decode_cache.DECODE_CACHE.get(cache_key + options)
+                if cached is not None:
+                    return cached
+
         memory_used = self.memory_used_decode(samples.shape, self.vae_dtype) #TODO: calculate mem required for tile
         model_management.load_models_gpu([self.patcher], memory_required=memory_used, force_full_load=self.disable_offload)
         dims = samples.ndim - 2
@@ -769,7 +901,10 @@ class VAE:
                 args["tile_t"] = max(2, tile_t)
 
             output = self.decode_tiled_3d(samples, **args)
-        return output.movedim(1, -1)
+        output = output.movedim(1, -1)
+        if cache_key is not None:
+            comfy.vae_decode_cache.DECODE_CACHE.put(cache_key + ("decode_tiled", tile_x, tile_y, overlap, tile_t, overlap_t), output)
+        return output
 
     def encode(self, pixel_samples):
         self.throw_exception_if_invalid()
@@ -1321,6 +1456,8 @@ def load_diffusion_model_state_dict(sd, model_options={}, metadata=None):
             - dtype: Override model data type
             - custom_operations: Custom model operations
             - fp8_optimizations: Enable FP8 optimizations
+            - quantize: {"format": a comfy.quant_ops.QUANT_ALGOS key, "calibration": "absmax" or "mse"}
+                        weight only quantization of the linear layers while loading
 
     Returns:
         ModelPatcher: A wrapped model instance that handles device management and weight loading.
@@ -1379,7 +1516,14 @@ def load_diffusion_model_state_dict(sd, model_options={}, metadata=None):
     else:
         unet_dtype = dtype
 
-    if model_config.layer_quant_config is not None:
+    quantize = model_options.get("quantize", None)
+    if quantize is not None:
+        if model_config.scaled_fp8 is not None:
+            logging.warning("Quantization on load is not supported for scaled fp8 models, ignoring it.")
+        else:
+            model_config.quantize_on_load = quantize
+
+    if model_config.layer_quant_config is not None or model_config.quantize_on_load is not None:
         manual_cast_dtype = model_management.unet_manual_cast(None, load_device, model_config.supported_inference_dtypes)
     else:
         manual_cast_dtype = model_management.unet_manual_cast(unet_dtype, load_device, model_config.supported_inference_dtypes)
@@ -1398,11 +1542,29 @@ def load_diffusion_model_state_dict(sd, model_options={}, metadata=None):
 
 
 def load_diffusion_model(unet_path, model_options={}):
+    quant_cache_path = None
+    if model_options.get("quantize", None) is not None and model_options.get("quantize_cache_dir", None) is not None and comfy.quant_cache.enabled():
+        quant_cache_path = comfy.quant_cache.cache_path(model_options["quantize_cache_dir"], unet_path, model_options["quantize"])
+        if os.path.isfile(quant_cache_path):
+            logging.info(f"Loading quantized model from cache: {quant_cache_path}")
+            comfy.quant_cache.touch(quant_cache_path)
+            sd, metadata = comfy.utils.load_torch_file(quant_cache_path, return_metadata=True)
+            cached_options = {k: v for k, v in model_options.items() if k not in ("quantize", "quantize_cache_dir")}
+            model = load_diffusion_model_state_dict(sd, model_options=cached_options, metadata=metadata)
+            if model is not None:
+                return model
+            logging.warning(f"Could not load quantized model cache {quant_cache_path}, quantizing again.")
+
     sd, metadata = comfy.utils.load_torch_file(unet_path, return_metadata=True)
     model = load_diffusion_model_state_dict(sd, model_options=model_options, metadata=metadata)
     if model is None:
         logging.error("ERROR UNSUPPORTED DIFFUSION MODEL {}".format(unet_path))
         raise RuntimeError("ERROR: Could not detect model type of: {}\n{}".format(unet_path, model_detection_error_hint(unet_path, sd)))
+
+    model_config = model.model.model_config
+    if quant_cache_path is not None and model_config.quantize_on_load is not None:
+        comfy.quant_cache.save(quant_cache_path, model.model.diffusion_model, model_config.layer_quant_config,
+                               prefix=comfy.quant_cache.cache_prefix(unet_path, model_options["quantize"]))
     return model
 
 def load_unet(unet_path, dtype=None):
@@ -51,6 +51,7 @@ class BASE:
     custom_operations = None
     scaled_fp8 = None
     layer_quant_config = None  # Per-layer quantization configuration for mixed precision
+    quantize_on_load = None  # {"format": ..., "calibration": ...} to quantize the weights while loading
     optimizations = {"fp8": False}
 
     @classmethod
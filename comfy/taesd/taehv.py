@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Tiny AutoEncoder for Hunyuan Video and Wan
+(DNN for decoding the latents of video VAEs a few frames at a time)
+"""
+import math
+
+import torch
+import torch.nn as nn
+
+import comfy.utils
+import comfy.ops
+from comfy.taesd.taesd import conv, Clamp
+
+# latent frames decoded at once, the MemBlocks carry the last frame of every chunk over to the next one
+DECODE_CHUNK_FRAMES = 2
+
+class MemBlock(nn.Module):
+    def __init__(self, n_in, n_out):
+        super().__init__()
+        self.conv = nn.Sequential(conv(n_in * 2, n_out), nn.ReLU(), conv(n_out, n_out), nn.ReLU(), conv(n_out, n_out))
+        self.skip = comfy.ops.disable_weight_init.Conv2d(n_in, n_out, 1, bias=False) if n_in != n_out else nn.Identity()
+        self.act = nn.ReLU()
+    def forward(self, x, past):
+        return self.act(self.conv(torch.cat([x, past], 1)) + self.skip(x))
+
+class TGrow(nn.Module):
+    def __init__(self, n_f, stride):
+        super().__init__()
+        self.stride = stride
+        self.conv = comfy.ops.disable_weight_init.Conv2d(n_f, n_f * stride, 1, bias=False)
+    def forward(self, x):
+        _NT, C, H, W = x.shape
+        x = self.conv(x)
+        return x.reshape(-1, C, H, W)
+
+def Decoder(latent_channels=16, time_upscale=(True, True), patch_size=1):
+    n_f = [256, 128, 64, 64]
+    return nn.Sequential(
+        Clamp(), conv(latent_channels, n_f[0]), nn.ReLU(),
+        MemBlock(n_f[0], n_f[0]), MemBlock(n_f[0], n_f[0]), MemBlock(n_f[0], n_f[0]), nn.Upsample(scale_factor=2), TGrow(n_f[0], 1), conv(n_f[0], n_f[1], bias=False),
+        MemBlock(n_f[1], n_f[1]), MemBlock(n_f[1], n_f[1]), MemBlock(n_f[1], n_f[1]), nn.Upsample(scale_factor=2), TGrow(n_f[1], 2 if time_upscale[0] else 1), conv(n_f[1], n_f[2], bias=False),
+        MemBlock(n_f[2], n_f[2]), MemBlock(n_f[2], n_f[2]), MemBlock(n_f[2], n_f[2]), nn.Upsample(scale_factor=2), TGrow(n_f[2], 2 if time_upscale[1] else 1), conv(n_f[2], n_f[3], bias=False),
+        nn.ReLU(), conv(n_f[3], 3 * patch_size * patch_size),
+    )
+
+def taehv_config(sd):
+    """TAEHV arguments matching the decoder weights in sd."""
+    return {
+        "latent_channels": sd["decoder.1.weight"].shape[1],
+        "time_upscale": tuple(sd["decoder.{}.conv.weight".format(i)].shape[0] > sd["decoder.{}.conv.weight".format(i)].shape[1] for i in (13, 19)),
+        "patch_size": round(math.sqrt(sd["decoder.22.weight"].shape[0] // 3)),
+    }
+
+class TAEHV(nn.Module):
+    def __init__(self, decoder_path=None, latent_channels=16, time_upscale=(True, True), patch_size=1, latent_format=None):
+        """
+        Initialize pretrained TAEHV from the given checkpoint, only the decoder is used.
+        The decoder works on the latents the diffusion model samples, with a latent_format the latents get converted
+        from the ones the full VAE decodes like VAE.decode expects.
+        """
+        super().__init__()
+        sd = None
+        if decoder_path is not None:
+            sd = comfy.utils.load_torch_file(decoder_path, safe_load=True)
+            sd = {k: v for k, v in sd.items() if k.startswith("decoder.")}
+            config = taehv_config(sd)
+            latent_channels = config["latent_channels"]
+            time_upscale = config["time_upscale"]
+            patch_size = config["patch_size"]
+        self.time_upscale = 2 ** sum(time_upscale)
+        self.patch_size = patch_size
+        # the first latent frame decodes to a single image
+        self.frames_to_trim = self.time_upscale - 1
+        self.latent_format = latent_format
+        self.decoder = Decoder(latent_channels=latent_channels, time_upscale=time_upscale, patch_size=patch_size)
+        if sd is not None:
+            self.load_state_dict(sd)
+
+    def decode_frames(self, x, memory):
+        """[B, T, C, H, W] latents to [B, frames, 3, H, W] images in 0..1, memory holds the last frame of every MemBlock input between calls."""
+        N, T = x.shape[:2]
+        x = x.reshape((N * T,) + tuple(x.shape[2:]))
+        for i, block in enumerate(self.decoder):
+            if isinstance(block, MemBlock):
+                frames = x.reshape((N, T) + tuple(x.shape[1:]))
+                past = memory.get(i, None)
+                if past is None:
+                    past = torch.zeros_like(frames[:, :1])
+                memory[i] = frames[:, -1:].clone()
+                x = block(x, torch.cat([past, frames[:, :-1]], 1).reshape(x.shape))
+            else:
+                x = block(x)
+                if isinstance(block, TGrow):
+                    T *= block.stride
+        if self.patch_size > 1:
+            x = torch.nn.functional.pixel_shuffle(x, self.patch_size)
+        return x.reshape((N, T) + tuple(x.shape[1:])).clamp(0, 1)
+
+    def decode_stream(self, x, chunk_frames=DECODE_CHUNK_FRAMES):
+        """Decodes [B, C, T, H, W] latents chunk_frames latent frames at a time, yields [B, 3, frames, H, W] images in -1..1."""
+        if self.latent_format is not None:
+            x = self.latent_format.process_in(x)
+        x = x.movedim(1, 2)
+        memory = {}
+        trim = self.frames_to_trim
+        for t in range(0, x.shape[1], chunk_frames):
+            out = self.decode_frames(x[:, t:t + chunk_frames], memory)
+            out = out[:, trim:]
+            trim = 0
+            yield out.movedim(1, 2).sub(0.5).mul(2)
+
+    def decode(self, x, **kwargs):
+        return torch.cat(list(self.decode_stream(x)), 2)
+
+    def encode(self, x):
+        raise RuntimeError("ERROR: TAEHV can only be used to decode.")
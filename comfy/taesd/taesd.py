@@ -48,13 +48,18 @@ class TAESD(nn.Module):
     latent_magnitude = 3
     latent_shift = 0.5
 
-    def __init__(self, encoder_path=None, decoder_path=None, latent_channels=4):
-        """Initialize pretrained TAESD on the given device from the given checkpoints."""
+    def __init__(self, encoder_path=None, decoder_path=None, latent_channels=4, latent_format=None):
+        """
+        Initialize pretrained TAESD on the given device from the given checkpoints.
+        With a latent_format the latents get converted with it instead of vae_scale and vae_shift.
+        """
         super().__init__()
         self.taesd_encoder = Encoder(latent_channels=latent_channels)
         self.taesd_decoder = Decoder(latent_channels=latent_channels)
-        self.vae_scale = torch.nn.Parameter(torch.tensor(1.0))
-        self.vae_shift = torch.nn.Parameter(torch.tensor(0.0))
+        self.latent_format = latent_format
+        if latent_format is None:
+            self.vae_scale = torch.nn.Parameter(torch.tensor(1.0))
+            self.vae_shift = torch.nn.Parameter(torch.tensor(0.0))
         if encoder_path is not None:
             self.taesd_encoder.load_state_dict(comfy.utils.load_torch_file(encoder_path, safe_load=True))
         if decoder_path is not None:
@@ -70,10 +75,22 @@ class TAESD(nn.Module):
         """[0, 1] -> raw latents"""
         return x.sub(TAESD.latent_shift).mul(2 * TAESD.latent_magnitude)
 
+    def process_in(self, x):
+        if self.latent_format is not None:
+            return self.latent_format.process_in(x)
+        return (x - self.vae_shift) * self.vae_scale
+
+    def process_out(self, x):
+        if self.latent_format is not None:
+            return self.latent_format.process_out(x)
+        return (x / self.vae_scale) + self.vae_shift
+
     def decode(self, x):
-        x_sample = self.taesd_decoder((x - self.vae_shift) * self.vae_scale)
+        x_sample = self.taesd_decoder(self.process_in(x))
         x_sample = x_sample.sub(0.5).mul(2)
         return x_sample
 
     def encode(self, x):
-        return (self.taesd_encoder(x * 0.5 + 0.5) / self.vae_scale) + self.vae_shift
+        if self.taesd_encoder is None:
+            raise RuntimeError("ERROR: this TAESD has no encoder, it can only be used to decode.")
+        return self.process_out(self.taesd_encoder(x * 0.5 + 0.5))
@@ -901,8 +901,34 @@ def get_tiled_scale_steps(width, height, tile_x, tile_y, overlap):
     cols = 1 if width <= tile_x else math.ceil((width - overlap) / (tile_x - overlap))
     return rows * cols
 
+def tiled_blend_mask(shape, feather, device="cpu"):
+    """
+    Blending weights of a tile with the spatial shape shape, linear ramps of feather[d] elements at both ends of every dim.
+    Returns a [1, 1, *shape] tensor that broadcasts over the batch and channels of the tile.
+    """
+    mask = None
+    for d in range(len(shape)):
+        ramp = torch.ones(shape[d])
+        if feather[d] < shape[d]:
+            for t in range(feather[d]):
+                a = (t + 1) / feather[d]
+                ramp[t] *= a
+                ramp[shape[d] - 1 - t] *= a
+        view = [1] * (len(shape) + 2)
+        view[d + 2] = shape[d]
+        ramp = ramp.view(view)
+        mask = ramp if mask is None else mask * ramp
+    return mask.to(device)
+
 @torch.inference_mode()
-def tiled_scale_multidim(samples, function, tile=(64, 64), overlap=8, upscale_amount=4, out_channels=3, output_device="cpu", downscale=False, index_formulas=None, pbar=None):
+def tiled_scale_multidim(samples, function, tile=(64, 64), overlap=8, upscale_amount=4, out_channels=3, output_device="cpu", downscale=False, index_formulas=None, pbar=None, tile_batch=1, accumulate_device=None):
+    """
+    Runs function on overlapping tiles of samples and blends the results together.
+
+    Tiles of the same shape are passed to function tile_batch at a time concatenated in the batch dim, so function has to
+    process the batch items independently. The tiles are blended in buffers on accumulate_device (output_device by default)
+    and only the finished result of every batch item is moved to output_device.
+    """
     dims = len(tile)
 
     if not (isinstance(upscale_amount, (tuple, list))):
@@ -917,6 +943,9 @@ def tiled_scale_multidim(samples, function, tile=(64, 64), overlap=8, upscale_am
     if not (isinstance(index_formulas, (tuple, list))):
         index_formulas = [index_formulas] * dims
 
+    if accumulate_device is None:
+        accumulate_device = output_device
+
     def get_upscale(dim, val):
         up = upscale_amount[dim]
         if callable(up):
@@ -959,6 +988,8 @@ def tiled_scale_multidim(samples, function, tile=(64, 64), overlap=8, upscale_am
         return out
 
     output = torch.empty([samples.shape[0], out_channels] + mult_list_upscale(samples.shape[2:]), device=output_device)
+    feather = [round(get_scale(d, overlap[d])) for d in range(dims)]
+    masks = {}
 
     for b in range(samples.shape[0]):
         s = samples[b:b+1]
@@ -970,51 +1001,65 @@ def tiled_scale_multidim(samples, function, tile=(64, 64), overlap=8, upscale_am
                 pbar.update(1)
             continue
 
-        out = torch.zeros([s.shape[0], out_channels] + mult_list_upscale(s.shape[2:]), device=output_device)
-        out_div = torch.zeros([s.shape[0], out_channels] + mult_list_upscale(s.shape[2:]), device=output_device)
+        out = torch.zeros([s.shape[0], out_channels] + mult_list_upscale(s.shape[2:]), device=accumulate_device)
+        # the weights are the same for every channel
+        out_div = torch.zeros([s.shape[0], 1] + mult_list_upscale(s.shape[2:]), device=accumulate_device)
 
         positions = [range(0, s.shape[d+2] - overlap[d], tile[d] - overlap[d]) if s.shape[d+2] > tile[d] else [0] for d in range(dims)]
 
+        # group the tiles by shape, only the ones at the edges can be smaller
+        tiles = {}
         for it in itertools.product(*positions):
-            s_in = s
-            upscaled = []
-
+            starts = []
+            lengths = []
             for d in range(dims):
                 pos = max(0, min(s.shape[d + 2] - overlap[d], it[d]))
-                l = min(tile[d], s.shape[d + 2] - pos)
-                s_in = s_in.narrow(d + 2, pos, l)
-                upscaled.append(round(get_pos(d, pos)))
-
-            ps = function(s_in).to(output_device)
-            mask = torch.ones_like(ps)
-
-            for d in range(2, dims + 2):
-                feather = round(get_scale(d - 2, overlap[d - 2]))
-                if feather >= mask.shape[d]:
-                    continue
-                for t in range(feather):
-                    a = (t + 1) / feather
-                    mask.narrow(d, t, 1).mul_(a)
-                    mask.narrow(d, mask.shape[d] - 1 - t, 1).mul_(a)
-
-            o = out
-            o_d = out_div
-            for d in range(dims):
-                o = o.narrow(d + 2, upscaled[d], mask.shape[d + 2])
-                o_d = o_d.narrow(d + 2, upscaled[d], mask.shape[d + 2])
-
-            o.add_(ps * mask)
-            o_d.add_(mask)
-
-            if pbar is not None:
-                pbar.update(1)
-
-        output[b:b+1] = out/out_div
+                starts.append(pos)
+                lengths.append(min(tile[d], s.shape[d + 2] - pos))
+            tiles.setdefault(tuple(lengths), []).append(starts)
+
+        for lengths, tile_starts in tiles.items():
+            for i in range(0, len(tile_starts), tile_batch):
+                batch = tile_starts[i:i + tile_batch]
+                s_in = []
+                for starts in batch:
+                    t = s
+                    for d in range(dims):
+                        t = t.narrow(d + 2, starts[d], lengths[d])
+                    s_in.append(t)
+
+                ps = function(s_in[0] if len(s_in) == 1 else torch.cat(s_in)).to(accumulate_device)
+
+                mask_shape = tuple(ps.shape[2:])
+                mask = masks.get(mask_shape, None)
+                if mask is None or mask.device != ps.device:
+                    mask = tiled_blend_mask(mask_shape, feather, device=ps.device)
+                    masks[mask_shape] = mask
+
+                for j, starts in enumerate(batch):
+                    o = out
+                    o_d = out_div
+                    for d in range(dims):
+                        upscaled = round(get_pos(d, starts[d]))
+                        o = o.narrow(d + 2, upscaled, mask_shape[d])
+                        o_d = o_d.narrow(d + 2, upscaled, mask_shape[d])
+
+                    o.addcmul_(ps[j:j + 1], mask)
+                    o_d.add_(mask)
+
+                if pbar is not None:
+                    pbar.update(len(batch))
+
+        output[b:b+1] = (out / out_div).to(output_device)
     return output
 
 def tiled_scale(samples, function, tile_x=64, tile_y=64, overlap = 8, upscale_amount = 4, out_channels = 3, output_device="cpu", pbar = None):
     return tiled_scale_multidim(samples, function, (tile_y, tile_x), overlap=overlap, upscale_amount=upscale_amount, out_channels=out_channels, output_device=output_device, pbar=pbar)
 
+def images_to_uint8(images):
+    """[..., H, W, C] images in the 0 to 1 range to a uint8 numpy array, converted in one op on the device they are on so only the uint8 data gets copied."""
+    return (images * 255.).clamp(0, 255).to(torch.uint8).cpu().numpy()
+
 PROGRESS_BAR_ENABLED = True
 def set_progress_bar_enabled(enabled):
     global PROGRESS_BAR_ENABLED
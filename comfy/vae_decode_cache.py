@@ -0,0 +1,69 @@
+"""
+Cache of VAE decode results keyed by the content of the latent.
+
+Different nodes often decode the same latent (a preview decode and the final decode, a tiled decode of a latent
+that was already decoded) and the execution cache can't notice that since the nodes and their inputs differ.
+The cache holds its own copy of the decoded images and hands out copies of it so a node that modifies its input in place
+can't change the images other nodes get. Hashing the latent costs a copy to the cpu for every decode so the cache is
+only enabled with --vae-decode-cache, the least recently used results get evicted once it goes over that many GB.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import torch
+
+from comfy.cli_args import args
+
+
+def latent_hash(samples):
+    h = hashlib.sha256()
+    h.update(f"{tuple(samples.shape)} {samples.dtype}".encode())
+    h.update(samples.detach().cpu().contiguous().reshape(-1).view(torch.uint8).numpy())
+    return h.hexdigest()
+
+
+def tensor_bytes(tensor):
+    return tensor.numel() * tensor.element_size()
+
+
+class DecodeCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def get(self, key):
+        with self.lock:
+            out = self.entries.get(key, None)
+            if out is not None:
+                self.entries.move_to_end(key)
+        return out.clone() if out is not None else None
+
+    def put(self, key, value):
+        size = tensor_bytes(value)
+        if size > self.max_bytes:
+            return
+        value = value.clone()
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= tensor_bytes(old)
+            self.entries[key] = value
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= tensor_bytes(evicted)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+DECODE_CACHE = DecodeCache(int(args.vae_decode_cache * 1024 * 1024 * 1024))
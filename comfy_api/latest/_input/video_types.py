@@ -27,10 +27,12 @@ class VideoInput(ABC):
         path: Union[str, IO[bytes]],
         format: VideoContainer = VideoContainer.AUTO,
         codec: VideoCodec = VideoCodec.AUTO,
-        metadata: Optional[dict] = None
+        metadata: Optional[dict] = None,
+        threads: int = 0
     ):
         """
         Abstract method to save the video input to a file.
+        threads is the number of encoder threads if the video gets encoded, 0 picks it automatically.
         """
         pass
 
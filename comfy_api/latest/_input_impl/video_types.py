@@ -2,14 +2,17 @@ from __future__ import annotations
 from av.container import InputContainer
 from av.subtitles.stream import SubtitleStream
 from fractions import Fraction
-from typing import Optional
+from typing import Callable, Iterable, Iterator, Optional
 from comfy_api.latest._input import AudioInput, VideoInput
 import av
 import io
 import json
 import numpy as np
 import math
+import threading
 import torch
+import weakref
+from collections import OrderedDict
 from comfy_api.latest._util import VideoContainer, VideoCodec, VideoComponents
 
 
@@ -52,6 +55,145 @@ def get_open_write_kwargs(
     return open_kwargs
 
 
+# frames converted to yuv at once when encoding a video that is already fully in memory
+ENCODE_CHUNK_FRAMES = 16
+# frames decoded at once by VideoFromFile.decode_frames
+DECODE_CHUNK_FRAMES = 16
+# decoded uint8 frames kept across all the VideoFromFile objects to reuse when the same frames get decoded again
+DECODE_CACHE_BYTES = 256 * 1024 * 1024
+
+
+class DecodedFramesCache:
+    """
+    LRU of the decoded uint8 chunks of frame selections, bounded by max_bytes for all the videos together.
+    Only selections of part of a video (a range or a stride) get cached, full clip decodes would evict everything else.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            chunks = self.entries.get(key, None)
+            if chunks is not None:
+                self.entries.move_to_end(key)
+            return chunks
+
+    def put(self, key, chunks: list[torch.Tensor]):
+        size = sum(c.nbytes for c in chunks)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            self.remove(key)
+            self.entries[key] = chunks
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= sum(c.nbytes for c in evicted)
+
+    def remove(self, key):
+        chunks = self.entries.pop(key, None)
+        if chunks is not None:
+            self.size -= sum(c.nbytes for c in chunks)
+
+    def drop(self, owner):
+        """Removes the selections of the video owner."""
+        with self.lock:
+            for key in [k for k in self.entries if k[0] is owner]:
+                self.remove(key)
+
+
+DECODE_CACHE = DecodedFramesCache(DECODE_CACHE_BYTES)
+
+
+def rgb_to_yuv420p(images: torch.Tensor) -> np.ndarray:
+    """
+    Convert [N, H, W, 3] images (0 to 1 range, even H and W) to [N, H * 3 // 2, W] uint8 arrays holding the
+    yuv420p planes, the layout av.VideoFrame.from_ndarray expects. Uses the BT.601 limited range matrix like
+    the swscale conversion of VideoFrame.reformat but converts the whole chunk in a few ops on the device the
+    images are on instead of one frame at a time on the cpu.
+    """
+    x = images.float().clamp(0, 1).movedim(-1, 1)
+    r, g, b = x[:, 0:1], x[:, 1:2], x[:, 2:3]
+    y = 16 + 219 * (0.299 * r + 0.587 * g + 0.114 * b)
+    u = 128 + 224 * (-0.168736 * r - 0.331264 * g + 0.5 * b)
+    v = 128 + 224 * (0.5 * r - 0.418688 * g - 0.081312 * b)
+    u = torch.nn.functional.avg_pool2d(u, 2)
+    v = torch.nn.functional.avg_pool2d(v, 2)
+    n, _, h, w = y.shape
+    planes = torch.cat((y.reshape(n, -1), u.reshape(n, -1), v.reshape(n, -1)), dim=1)
+    return planes.round_().clamp_(0, 255).to(torch.uint8).reshape(n, h * 3 // 2, w).cpu().numpy()
+
+
+def encode_video_frames(
+    path: str | io.BytesIO,
+    frames: Iterable[torch.Tensor],
+    width: int,
+    height: int,
+    frame_rate: Fraction,
+    audio: Optional[AudioInput] = None,
+    metadata: Optional[dict] = None,
+    threads: int = 0
+):
+    """
+    Encode an iterable of [N, H, W, 3] image tensors (0 to 1 range) to an h264 mp4, only one chunk of frames
+    has to be in memory at a time. threads is the number of encoder threads, 0 picks it automatically.
+    """
+    with av.open(path, mode='w', options={'movflags': 'use_metadata_tags'}) as output:
+        # Add metadata before writing any streams
+        if metadata is not None:
+            for key, value in metadata.items():
+                output.metadata[key] = json.dumps(value)
+
+        frame_rate = Fraction(round(frame_rate * 1000), 1000)
+        # Create a video stream
+        video_stream = output.add_stream('h264', rate=frame_rate)
+        video_stream.width = width
+        video_stream.height = height
+        video_stream.pix_fmt = 'yuv420p'
+        video_stream.codec_context.thread_type = 'AUTO'
+        video_stream.codec_context.thread_count = threads
+
+        # Create an audio stream
+        audio_sample_rate = 1
+        audio_stream: Optional[av.AudioStream] = None
+        if audio:
+            audio_sample_rate = int(audio['sample_rate'])
+            audio_stream = output.add_stream('aac', rate=audio_sample_rate)
+
+        # Encode video
+        frame_count = 0
+        for chunk in frames:
+            # convert on the device the frames are on, only the uint8 frames get copied
+            if width % 2 == 0 and height % 2 == 0:
+                video_frames = [av.VideoFrame.from_ndarray(img, format='yuv420p') for img in rgb_to_yuv420p(chunk)]
+            else:
+                chunk = (chunk * 255).clamp(0, 255).byte().cpu().numpy() # shape: (N, H, W, 3)
+                video_frames = [av.VideoFrame.from_ndarray(img, format='rgb24').reformat(format='yuv420p') for img in chunk]  # Convert to YUV420P as required by h264
+            for frame in video_frames:
+                packet = video_stream.encode(frame)
+                output.mux(packet)
+            frame_count += len(video_frames)
+
+        # Flush video
+        packet = video_stream.encode(None)
+        output.mux(packet)
+
+        if audio_stream and audio:
+            waveform = audio['waveform']
+            waveform = waveform[:, :, :math.ceil((audio_sample_rate / frame_rate) * frame_count)]
+            frame = av.AudioFrame.from_ndarray(waveform.movedim(2, 1).reshape(1, -1).float().numpy(), format='flt', layout='mono' if waveform.shape[1] == 1 else 'stereo')
+            frame.sample_rate = audio_sample_rate
+            frame.pts = 0
+            output.mux(audio_stream.encode(frame))
+
+            # Flush encoder
+            output.mux(audio_stream.encode(None))
+
+
 class VideoFromFile(VideoInput):
     """
     Class representing video input from a file.
@@ -63,6 +205,9 @@ class VideoFromFile(VideoInput):
         containing the file contents.
         """
         self.__file = file
+        # identifies the frames of this video in DECODE_CACHE, they get dropped with it
+        self.__cache_owner = object()
+        weakref.finalize(self, DECODE_CACHE.drop, self.__cache_owner)
 
     def get_stream_source(self) -> str | io.BytesIO:
         """
@@ -198,15 +343,94 @@ class VideoFromFile(VideoInput):
         with av.open(self.__file, mode='r') as container:
             return container.format.name
 
-    def get_components_internal(self, container: InputContainer) -> VideoComponents:
-        # Get video frames
+    def decode_frames_internal(self, container: InputContainer, start_frame: int = 0, frame_count: int = 0, stride: int = 1):
+        """
+        Yields the selected frames as [N, H, W, 3] uint8 tensors of up to DECODE_CHUNK_FRAMES frames.
+        When the stream has timestamps it seeks to the keyframe before start_frame instead of decoding everything before it.
+        The frames skipped by the stride still get decoded (inter coded frames depend on them) but never converted.
+        """
+        video_stream = self._get_first_video_stream(container)
+        video_stream.thread_type = "AUTO"
+        rate = video_stream.average_rate
+        time_base = video_stream.time_base
+        start_time = video_stream.start_time if video_stream.start_time is not None else 0
+        use_timestamps = rate is not None and time_base is not None
+
+        if start_frame > 0 and use_timestamps:
+            container.seek(start_time + int(Fraction(start_frame) / Fraction(rate) / Fraction(time_base)), stream=video_stream, backward=True)
+
         frames = []
-        for frame in container.decode(video=0):
-            img = frame.to_ndarray(format='rgb24')  # shape: (H, W, 3)
-            img = torch.from_numpy(img) / 255.0  # shape: (H, W, 3)
-            frames.append(img)
+        count = 0
+        index = -1
+        for frame in container.decode(video_stream):
+            if use_timestamps and frame.pts is not None:
+                index = round((frame.pts - start_time) * time_base * rate)
+            else:
+                index += 1
+            if index < start_frame or (index - start_frame) % stride != 0:
+                continue
+
+            frames.append(torch.from_numpy(frame.to_ndarray(format='rgb24')))  # shape: (H, W, 3)
+            count += 1
+            if len(frames) == DECODE_CHUNK_FRAMES:
+                yield torch.stack(frames)
+                frames = []
+            if frame_count > 0 and count >= frame_count:
+                break
+
+        if len(frames) > 0:
+            yield torch.stack(frames)
+
+    def decode_frames_cached(self, container: InputContainer, start_frame: int = 0, frame_count: int = 0, stride: int = 1):
+        if start_frame == 0 and frame_count == 0 and stride == 1:
+            yield from self.decode_frames_internal(container)
+            return
+
+        key = (self.__cache_owner, start_frame, frame_count, stride)
+        cached = DECODE_CACHE.get(key)
+        if cached is not None:
+            yield from cached
+            return
+
+        chunks = []
+        size = 0
+        for chunk in self.decode_frames_internal(container, start_frame, frame_count, stride):
+            if chunks is not None:
+                size += chunk.nbytes
+                if size > DECODE_CACHE.max_bytes:
+                    chunks = None
+                else:
+                    chunks.append(chunk)
+            yield chunk
+        if chunks is not None:
+            DECODE_CACHE.put(key, chunks)
+
+    def decode_frames(self, start_frame: int = 0, frame_count: int = 0, stride: int = 1) -> Iterator[torch.Tensor]:
+        """
+        Decode frames start_frame, start_frame + stride, ... of the video (frame_count of them, 0 for all until the end)
+        a chunk at a time without ever decoding the whole video into memory.
 
-        images = torch.stack(frames) if len(frames) > 0 else torch.zeros(0, 3, 0, 0)
+        Yields [N, H, W, 3] float tensors in the 0 to 1 range.
+        """
+        if isinstance(self.__file, io.BytesIO):
+            self.__file.seek(0)
+        with av.open(self.__file, mode='r') as container:
+            for chunk in self.decode_frames_cached(container, start_frame, frame_count, stride):
+                yield chunk.float() / 255.0
+
+    def get_components_internal(self, container: InputContainer, start_frame: int = 0, frame_count: int = 0, stride: int = 1) -> VideoComponents:
+        # Get video frames, kept as uint8 until all of them are decoded so the float images are only allocated once
+        chunks = list(self.decode_frames_cached(container, start_frame, frame_count, stride))
+        if len(chunks) > 0:
+            images = torch.empty((sum(c.shape[0] for c in chunks),) + tuple(chunks[0].shape[1:]), dtype=torch.float32)
+            offset = 0
+            for chunk in chunks:
+                torch.div(chunk, 255.0, out=images[offset:offset + chunk.shape[0]])
+                offset += chunk.shape[0]
+        else:
+            images = torch.zeros(0, 3, 0, 0)
+        selected_frames = images.shape[0]
+        del chunks
 
         # Get frame rate
         video_stream = next(s for s in container.streams if s.type == 'video')
@@ -227,6 +451,12 @@ class VideoFromFile(VideoInput):
                         audio_frames.append(frame.to_ndarray())  # shape: (channels, samples)
                 if len(audio_frames) > 0:
                     audio_data = np.concatenate(audio_frames, axis=1)  # shape: (channels, total_samples)
+                    if start_frame > 0 or frame_count > 0:
+                        # the audio of the selected time range
+                        sample_rate = int(stream.sample_rate) if stream.sample_rate else 1
+                        audio_start = int(start_frame / frame_rate * sample_rate)
+                        audio_end = int((start_frame + selected_frames * stride) / frame_rate * sample_rate)
+                        audio_data = audio_data[:, audio_start:audio_end]
                     audio_tensor = torch.from_numpy(audio_data).unsqueeze(0)  # shape: (1, channels, total_samples)
                     audio = AudioInput({
                         "waveform": audio_tensor,
@@ -236,13 +466,17 @@ class VideoFromFile(VideoInput):
             pass  # No audio stream
 
         metadata = container.metadata
-        return VideoComponents(images=images, audio=audio, frame_rate=frame_rate, metadata=metadata)
+        return VideoComponents(images=images, audio=audio, frame_rate=frame_rate / stride, metadata=metadata)
 
-    def get_components(self) -> VideoComponents:
+    def get_components(self, start_frame: int = 0, frame_count: int = 0, stride: int = 1) -> VideoComponents:
+        """
+        The images are only the frames start_frame, start_frame + stride, ... (frame_count of them, 0 for all until
+        the end) and the frame rate and audio match that selection.
+        """
         if isinstance(self.__file, io.BytesIO):
             self.__file.seek(0)  # Reset the BytesIO object to the beginning
         with av.open(self.__file, mode='r') as container:
-            return self.get_components_internal(container)
+            return self.get_components_internal(container, start_frame, frame_count, stride)
         raise ValueError(f"No video stream found in file '{self.__file}'")
 
     def save_to(
@@ -250,7 +484,8 @@ class VideoFromFile(VideoInput):
         path: str | io.BytesIO,
         format: VideoContainer = VideoContainer.AUTO,
         codec: VideoCodec = VideoCodec.AUTO,
-        metadata: Optional[dict] = None
+        metadata: Optional[dict] = None,
+        threads: int = 0
     ):
         if isinstance(self.__file, io.BytesIO):
             self.__file.seek(0)  # Reset the BytesIO object to the beginning
@@ -270,7 +505,8 @@ class VideoFromFile(VideoInput):
                     path,
                     format=format,
                     codec=codec,
-                    metadata=metadata
+                    metadata=metadata,
+                    threads=threads
                 )
 
             streams = container.streams
@@ -330,51 +566,89 @@ class VideoFromComponents(VideoInput):
         path: str,
         format: VideoContainer = VideoContainer.AUTO,
         codec: VideoCodec = VideoCodec.AUTO,
-        metadata: Optional[dict] = None
+        metadata: Optional[dict] = None,
+        threads: int = 0
     ):
         if format != VideoContainer.AUTO and format != VideoContainer.MP4:
             raise ValueError("Only MP4 format is supported for now")
         if codec != VideoCodec.AUTO and codec != VideoCodec.H264:
             raise ValueError("Only H264 codec is supported for now")
-        with av.open(path, mode='w', options={'movflags': 'use_metadata_tags'}) as output:
-            # Add metadata before writing any streams
-            if metadata is not None:
-                for key, value in metadata.items():
-                    output.metadata[key] = json.dumps(value)
-
-            frame_rate = Fraction(round(self.__components.frame_rate * 1000), 1000)
-            # Create a video stream
-            video_stream = output.add_stream('h264', rate=frame_rate)
-            video_stream.width = self.__components.images.shape[2]
-            video_stream.height = self.__components.images.shape[1]
-            video_stream.pix_fmt = 'yuv420p'
-
-            # Create an audio stream
-            audio_sample_rate = 1
-            audio_stream: Optional[av.AudioStream] = None
-            if self.__components.audio:
-                audio_sample_rate = int(self.__components.audio['sample_rate'])
-                audio_stream = output.add_stream('aac', rate=audio_sample_rate)
-
-            # Encode video
-            for i, frame in enumerate(self.__components.images):
-                img = (frame * 255).clamp(0, 255).byte().cpu().numpy() # shape: (H, W, 3)
-                frame = av.VideoFrame.from_ndarray(img, format='rgb24')
-                frame = frame.reformat(format='yuv420p')  # Convert to YUV420P as required by h264
-                packet = video_stream.encode(frame)
-                output.mux(packet)
+        images = self.__components.images
+        encode_video_frames(
+            path,
+            images.split(ENCODE_CHUNK_FRAMES),
+            width=images.shape[2],
+            height=images.shape[1],
+            frame_rate=self.__components.frame_rate,
+            audio=self.__components.audio,
+            metadata=metadata,
+            threads=threads,
+        )
+
+
+class VideoFromFrameGenerator(VideoInput):
+    """
+    Class representing a video whose frames are produced on demand in chunks, for example by a streaming VAE decode.
+    The frames get generated again every time the video is used instead of being kept in memory.
+    """
+
+    def __init__(
+        self,
+        frame_generator: Callable[[], Iterable[torch.Tensor]],
+        width: int,
+        height: int,
+        frame_count: int,
+        frame_rate: Fraction,
+        audio: Optional[AudioInput] = None,
+        output_device: torch.device | str = "cpu"
+    ):
+        """
+        frame_generator is called every time the frames are needed and has to return an iterable of
+        [N, H, W, 3] image tensors that add up to frame_count frames.
+        """
+        self.__frame_generator = frame_generator
+        self.__width = width
+        self.__height = height
+        self.__frame_count = frame_count
+        self.__frame_rate = frame_rate
+        self.__audio = audio
+        self.__output_device = output_device
+
+    def get_components(self) -> VideoComponents:
+        images = torch.cat([chunk.to(self.__output_device) for chunk in self.__frame_generator()], dim=0)
+        return VideoComponents(images=images, audio=self.__audio, frame_rate=self.__frame_rate)
+
+    def get_dimensions(self) -> tuple[int, int]:
+        return self.__width, self.__height
 
-            # Flush video
-            packet = video_stream.encode(None)
-            output.mux(packet)
+    def get_frame_count(self) -> int:
+        return self.__frame_count
+
+    def get_frame_rate(self) -> Fraction:
+        return self.__frame_rate
 
-            if audio_stream and self.__components.audio:
-                waveform = self.__components.audio['waveform']
-                waveform = waveform[:, :, :math.ceil((audio_sample_rate / frame_rate) * self.__components.images.shape[0])]
-                frame = av.AudioFrame.from_ndarray(waveform.movedim(2, 1).reshape(1, -1).float().numpy(), format='flt', layout='mono' if waveform.shape[1] == 1 else 'stereo')
-                frame.sample_rate = audio_sample_rate
-                frame.pts = 0
-                output.mux(audio_stream.encode(frame))
+    def get_duration(self) -> float:
+        return float(self.__frame_count / self.__frame_rate)
 
-                # Flush encoder
-                output.mux(audio_stream.encode(None))
+    def save_to(
+        self,
+        path: str,
+        format: VideoContainer = VideoContainer.AUTO,
+        codec: VideoCodec = VideoCodec.AUTO,
+        metadata: Optional[dict] = None,
+        threads: int = 0
+    ):
+        if format != VideoContainer.AUTO and format != VideoContainer.MP4:
+            raise ValueError("Only MP4 format is supported for now")
+        if codec != VideoCodec.AUTO and codec != VideoCodec.H264:
+            raise ValueError("Only H264 codec is supported for now")
+        encode_video_frames(
+            path,
+            self.__frame_generator(),
+            width=self.__width,
+            height=self.__height,
+            frame_rate=self.__frame_rate,
+            audio=self.__audio,
+            metadata=metadata,
+            threads=threads,
+        )
@@ -1,5 +1,9 @@
 from .torch_compile import set_torch_compile_wrapper
+from .compile_manager import set_torch_compile_manager_wrapper
+from .cuda_graph import set_cuda_graph_wrapper
 
 __all__ = [
     "set_torch_compile_wrapper",
+    "set_torch_compile_manager_wrapper",
+    "set_cuda_graph_wrapper",
 ]
@@ -0,0 +1,266 @@
+from __future__ import annotations
+import concurrent.futures
+import hashlib
+import logging
+import os
+import threading
+import torch
+
+import comfy.utils
+import comfy.model_management
+from comfy.patcher_extension import WrappersMP
+from .torch_compile import COMPILE_KEY, TORCH_COMPILE_KWARGS
+from typing import TYPE_CHECKING, Optional
+if TYPE_CHECKING:
+    from comfy.model_patcher import ModelPatcher
+    from comfy.patcher_extension import WrapperExecutor
+
+
+# attributes of the diffusion models that hold their repeated transformer/unet blocks
+BLOCK_LIST_NAMES = ("double_blocks", "single_blocks", "joint_blocks", "transformer_blocks", "blocks", "layers", "input_blocks", "output_blocks")
+BLOCK_NAMES = ("middle_block",)
+
+LOADED_ARTIFACTS = set()
+
+
+def find_blocks(diffusion_model: torch.nn.Module, prefix: str="diffusion_model") -> list[str]:
+    '''
+    Get the keys of the blocks of a diffusion model, compiling these one by one instead of the whole model
+    keeps the graphs small and lets identical blocks share their compiled code.
+    '''
+    keys = []
+    for name in BLOCK_LIST_NAMES:
+        blocks = getattr(diffusion_model, name, None)
+        if isinstance(blocks, torch.nn.ModuleList):
+            keys += [f"{prefix}.{name}.{i}" for i in range(len(blocks))]
+    for name in BLOCK_NAMES:
+        if isinstance(getattr(diffusion_model, name, None), torch.nn.Module):
+            keys.append(f"{prefix}.{name}")
+    return keys
+
+
+def shape_bucket(shape, dynamic: bool=False) -> tuple:
+    '''
+    Latent shapes in the same bucket share their compiled graphs. Static graphs are specialized on the exact shape so
+    every shape is its own bucket, graphs compiled with dynamic shapes work for every latent of the same rank.
+    '''
+    if dynamic:
+        return (len(shape),)
+    return tuple(shape)
+
+
+def model_compile_key(diffusion_model: torch.nn.Module, compile_kwargs: dict) -> str:
+    '''
+    Hash of the architecture (not the weights) of the model, the device and the compile settings.
+    The compiled code only depends on these so patched or finetuned weights can share the compiled artifacts.
+    '''
+    device = comfy.model_management.get_torch_device()
+    h = hashlib.sha256()
+    h.update(f"{type(diffusion_model).__name__} torch {torch.__version__} {comfy.model_management.get_torch_device_name(device)}".encode())
+    h.update(repr(sorted(compile_kwargs.items())).encode())
+    for k, v in diffusion_model.state_dict().items():
+        h.update(f"{k} {tuple(v.shape)} {v.dtype}\n".encode())
+    return h.hexdigest()[:32]
+
+
+class TensorSpec:
+    def __init__(self, tensor: torch.Tensor):
+        self.shape = tuple(tensor.shape)
+        self.stride = tuple(tensor.stride())
+        self.dtype = tensor.dtype
+        self.device = tensor.device
+
+    def materialize(self) -> torch.Tensor:
+        return torch.empty_strided(self.shape, self.stride, dtype=self.dtype, device=self.device).zero_()
+
+
+def map_tensors(obj, func):
+    if isinstance(obj, torch.Tensor):
+        return func(obj)
+    if isinstance(obj, dict):
+        return {k: map_tensors(v, func) for k, v in obj.items()}
+    if type(obj) in (list, tuple):
+        return type(obj)(map_tensors(v, func) for v in obj)
+    return obj
+
+
+COMPILE_WORKER = None
+COMPILE_WORKER_LOCK = threading.Lock()
+
+
+def get_compile_worker() -> concurrent.futures.ThreadPoolExecutor:
+    '''One thread for all the background compiles, Dynamo serializes the compiles of all threads anyway.'''
+    global COMPILE_WORKER
+    with COMPILE_WORKER_LOCK:
+        if COMPILE_WORKER is None:
+            COMPILE_WORKER = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="torch_compile")
+        return COMPILE_WORKER
+
+
+class CompileManager:
+    '''
+    APPLY_MODEL wrapper that runs torch.compiled blocks of the diffusion model.
+
+    The first time a latent shape bucket is seen the model runs eagerly while the input shapes of every block are recorded.
+    The compile worker thread then compiles the blocks on its own zero filled inputs of the same shapes, the sampling thread
+    keeps running the original (eager) blocks until it's done and only swaps in the compiled blocks afterwards, the worker
+    never touches the model structure. The compiled artifacts are saved so a restart only has to trace the model again
+    instead of recompiling everything.
+    '''
+    def __init__(self, compiled_modules: dict[str, torch.nn.Module], dynamic: bool=False, max_buckets: int=8,
+                 artifact_path: Optional[str]=None):
+        self.compiled_modules = compiled_modules
+        self.dynamic = dynamic
+        self.max_buckets = max_buckets
+        self.artifact_path = artifact_path
+        self.lock = threading.Lock()
+        self.ready = {}
+        self.pending = set()
+        self.failed = set()
+        self.load_artifacts()
+
+    def load_artifacts(self):
+        if self.artifact_path is None or self.artifact_path in LOADED_ARTIFACTS or not os.path.isfile(self.artifact_path):
+            return
+        if not hasattr(torch.compiler, "load_cache_artifacts"):
+            return
+        try:
+            with open(self.artifact_path, "rb") as f:
+                torch.compiler.load_cache_artifacts(f.read())
+            LOADED_ARTIFACTS.add(self.artifact_path)
+            logging.info(f"Loaded torch.compile artifacts from {self.artifact_path}")
+        except Exception as e:
+            logging.warning(f"Could not load torch.compile artifacts {self.artifact_path}: {e}")
+
+    def save_artifacts(self):
+        if self.artifact_path is None or not hasattr(torch.compiler, "save_cache_artifacts"):
+            return
+        try:
+            artifacts = torch.compiler.save_cache_artifacts()
+            if artifacts is None:
+                return
+            os.makedirs(os.path.dirname(self.artifact_path), exist_ok=True)
+            tmp_path = f"{self.artifact_path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(artifacts[0])
+            os.replace(tmp_path, self.artifact_path)
+            LOADED_ARTIFACTS.add(self.artifact_path)
+        except Exception as e:
+            logging.warning(f"Could not save torch.compile artifacts {self.artifact_path}: {e}")
+
+    def run_compiled(self, executor: WrapperExecutor, keys, args, kwargs):
+        orig_modules = {}
+        try:
+            for key in keys:
+                orig_modules[key] = comfy.utils.get_attr(executor.class_obj, key)
+                comfy.utils.set_attr(executor.class_obj, key, self.compiled_modules[key])
+            return executor(*args, **kwargs)
+        finally:
+            for key, value in orig_modules.items():
+                comfy.utils.set_attr(executor.class_obj, key, value)
+
+    def run_capturing(self, executor: WrapperExecutor, args, kwargs):
+        captured = {}
+        handles = []
+
+        def capture_hook(key):
+            def hook(module, hook_args, hook_kwargs):
+                # the containers get copied so later changes of the sampling thread (like the block index in the
+                # transformer_options) don't end up in the inputs the worker compiles with
+                if key not in captured:
+                    captured[key] = (map_tensors(hook_args, TensorSpec), map_tensors(hook_kwargs, TensorSpec))
+            return hook
+
+        try:
+            for key in self.compiled_modules:
+                module = comfy.utils.get_attr(executor.class_obj, key)
+                handles.append(module.register_forward_pre_hook(capture_hook(key), with_kwargs=True))
+            out = executor(*args, **kwargs)
+        finally:
+            for handle in handles:
+                handle.remove()
+        return out, captured
+
+    def warmup(self, bucket, captured: dict, inference_mode: bool, grad_enabled: bool):
+        try:
+            # grad and inference mode are thread local and part of the compile guards
+            with torch.inference_mode(inference_mode), torch.set_grad_enabled(grad_enabled):
+                for key, (args, kwargs) in captured.items():
+                    self.compiled_modules[key](*map_tensors(args, TensorSpec.materialize), **map_tensors(kwargs, TensorSpec.materialize))
+            self.save_artifacts()
+            with self.lock:
+                self.ready[bucket] = list(captured.keys())
+            logging.info(f"torch.compile: latent shape bucket {bucket} is compiled")
+        except Exception as e:
+            logging.warning(f"torch.compile of latent shape bucket {bucket} failed, it will keep running eagerly: {e}")
+            with self.lock:
+                self.failed.add(bucket)
+        finally:
+            with self.lock:
+                self.pending.discard(bucket)
+
+    def __call__(self, executor: WrapperExecutor, *args, **kwargs):
+        bucket = shape_bucket(args[0].shape, self.dynamic)
+        with self.lock:
+            keys = self.ready.get(bucket, None)
+            # one bucket at a time, the capture hooks would otherwise end up in the graphs that are being traced
+            schedule = (keys is None and len(self.pending) == 0 and bucket not in self.failed and
+                        len(self.ready) < self.max_buckets)
+            if schedule:
+                self.pending.add(bucket)
+
+        if keys is not None:
+            return self.run_compiled(executor, keys, args, kwargs)
+        if not schedule:
+            return executor(*args, **kwargs)
+
+        try:
+            out, captured = self.run_capturing(executor, args, kwargs)
+        except:
+            with self.lock:
+                self.pending.discard(bucket)
+            raise
+        logging.info(f"torch.compile: compiling latent shape bucket {bucket} in the background")
+        get_compile_worker().submit(self.warmup, bucket, captured, torch.is_inference_mode_enabled(), torch.is_grad_enabled())
+        return out
+
+
+def set_torch_compile_manager_wrapper(model: ModelPatcher, backend: str, options: Optional[dict[str,str]]=None,
+                                      mode: Optional[str]=None, per_block: bool=True, dynamic: bool=False,
+                                      max_buckets: int=8, cache_dir: Optional[str]=None) -> CompileManager:
+    '''
+    Like set_torch_compile_wrapper but compiles the blocks of the diffusion model one by one, compiles new latent shapes
+    in a background thread while the model keeps running eagerly, limits how many latent shape buckets get compiled and
+    persists the compiled artifacts in cache_dir.
+
+    Without dynamic a static graph gets compiled for every latent shape, with it one set of graphs with dynamic shapes
+    is used for all of them.
+    '''
+    model.remove_wrappers_with_key(WrappersMP.APPLY_MODEL, COMPILE_KEY)
+    diffusion_model = model.get_model_object("diffusion_model")
+    keys = find_blocks(diffusion_model) if per_block else []
+    if len(keys) == 0:
+        keys = ["diffusion_model"]
+
+    compile_kwargs = {
+        "backend": backend,
+        "options": options,
+        "mode": mode,
+        "fullgraph": False,
+        "dynamic": dynamic,
+    }
+
+    artifact_path = None
+    if cache_dir is not None:
+        # only has an effect if nothing was compiled yet in this process, the saved artifacts don't depend on it
+        os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", os.path.join(cache_dir, "inductor"))
+        artifact_path = os.path.join(cache_dir, f"{model_compile_key(diffusion_model, {**compile_kwargs, 'per_block': per_block})}.bin")
+
+    compiled_modules = {}
+    for key in keys:
+        compiled_modules[key] = torch.compile(model=model.get_model_object(key), **compile_kwargs)
+
+    manager = CompileManager(compiled_modules, dynamic=dynamic, max_buckets=max_buckets, artifact_path=artifact_path)
+    model.add_wrapper_with_key(WrappersMP.APPLY_MODEL, COMPILE_KEY, manager)
+    model.model_options[TORCH_COMPILE_KWARGS] = compile_kwargs
+    return manager
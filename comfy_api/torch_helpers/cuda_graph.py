@@ -0,0 +1,154 @@
+from __future__ import annotations
+import logging
+import uuid
+import torch
+
+from comfy.patcher_extension import WrappersMP
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from comfy.model_patcher import ModelPatcher
+    from comfy.patcher_extension import WrapperExecutor
+
+
+CUDA_GRAPH_KEY = "cuda_graph"
+VALUE_TYPES = (int, float, str, bool, type(None), uuid.UUID, torch.dtype, torch.device)
+
+
+def input_signature(obj, tensors: list, objects: list):
+    '''
+    Flatten the inputs of apply_model: the tensors get appended to tensors and the rest of the structure is returned as a hashable signature.
+    Anything that isn't a plain value is compared by identity (and kept in objects so the id can't get reused), so inputs that
+    are recreated every step prevent the capture.
+    '''
+    if isinstance(obj, torch.Tensor):
+        tensors.append(obj)
+        return ("tensor", tuple(obj.shape), obj.dtype, obj.device)
+    if isinstance(obj, dict):
+        return ("dict",) + tuple((k, input_signature(v, tensors, objects)) for k, v in obj.items())
+    if type(obj) in (list, tuple):
+        return (type(obj).__name__,) + tuple(input_signature(v, tensors, objects) for v in obj)
+    if isinstance(obj, VALUE_TYPES):
+        return obj
+    objects.append(obj)
+    return ("id", id(obj))
+
+
+def replace_tensors(obj, tensors):
+    if isinstance(obj, torch.Tensor):
+        return next(tensors)
+    if isinstance(obj, dict):
+        return {k: replace_tensors(v, tensors) for k, v in obj.items()}
+    if type(obj) in (list, tuple):
+        return type(obj)(replace_tensors(v, tensors) for v in obj)
+    return obj
+
+
+class CapturedGraph:
+    def __init__(self, graph: torch.cuda.CUDAGraph, static_inputs: list[torch.Tensor], static_output, objects: list):
+        self.graph = graph
+        self.static_inputs = static_inputs
+        self.static_output = static_output
+        self.objects = objects
+
+    def replay(self, tensors: list[torch.Tensor]):
+        for static_input, t in zip(self.static_inputs, tensors):
+            static_input.copy_(t)
+        self.graph.replay()
+        # the output buffer gets overwritten by the next replay
+        return self.static_output.clone()
+
+
+class CUDAGraphRunner:
+    '''
+    APPLY_MODEL wrapper that records the model call in a CUDA graph and replays it for the following steps.
+
+    The graphs are keyed by the shapes of the input tensors and the rest of the inputs (transformer_options, control, ...).
+    A graph is captured the second time the same key is seen so inputs that change every step (new patch objects,
+    hooks that change the weights, python values) never get captured and keep running eagerly.
+    All graphs are dropped at the end of sampling since they reference the memory of the loaded weights.
+    '''
+    def __init__(self, max_graphs: int=4):
+        self.max_graphs = max_graphs
+        self.graphs = {}
+        self.seen = {}
+        self.failed = set()
+
+    def clear(self):
+        self.graphs.clear()
+        self.seen.clear()
+        self.failed.clear()
+
+    def outer_sample_wrapper(self, executor: WrapperExecutor, *args, **kwargs):
+        try:
+            return executor(*args, **kwargs)
+        finally:
+            self.clear()
+
+    def can_capture(self, model, x: torch.Tensor) -> bool:
+        # lowvram mode moves weights in and out during the model call which can't be replayed
+        return x.device.type == "cuda" and not getattr(model, "model_lowvram", False) and not torch.compiler.is_compiling()
+
+    def capture(self, executor: WrapperExecutor, key, args, kwargs, tensors: list[torch.Tensor], objects: list):
+        static_inputs = [t.clone() for t in tensors]
+        static_args, static_kwargs = replace_tensors((args, kwargs), iter(static_inputs))
+
+        # warmup on a side stream as required before a capture, its output is the result of this step
+        stream = torch.cuda.Stream(device=static_inputs[0].device)
+        stream.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(stream):
+            out = executor(*static_args, **static_kwargs)
+        torch.cuda.current_stream().wait_stream(stream)
+
+        if not torch.is_tensor(out):
+            self.failed.add(key)
+            return out
+
+        try:
+            graph = torch.cuda.CUDAGraph()
+            with torch.cuda.graph(graph, capture_error_mode="thread_local"):
+                static_output = executor(*static_args, **static_kwargs)
+            self.graphs[key] = CapturedGraph(graph, static_inputs, static_output, objects)
+            logging.info(f"Captured a CUDA graph for the model call, {len(self.graphs)} graph(s) in use")
+        except Exception as e:
+            logging.warning(f"Could not capture a CUDA graph for the model call, running it eagerly: {e}")
+            self.failed.add(key)
+        return out
+
+    def __call__(self, executor: WrapperExecutor, *args, **kwargs):
+        model = executor.class_obj
+        if not self.can_capture(model, args[0]):
+            return executor(*args, **kwargs)
+
+        tensors = []
+        objects = []
+        patcher = getattr(model, "current_patcher", None)
+        # the patched weights and hooks are part of the key, a graph replays with the weights it was captured with
+        signature = input_signature((args, kwargs, getattr(patcher, "current_hooks", None)), tensors, objects)
+        key = (signature, getattr(model, "current_weight_patches_uuid", None), torch.is_grad_enabled(), torch.is_inference_mode_enabled())
+
+        captured = self.graphs.get(key, None)
+        if captured is not None:
+            return captured.replay(tensors)
+
+        if key in self.failed or len(tensors) == 0 or len(self.graphs) >= self.max_graphs:
+            return executor(*args, **kwargs)
+
+        if key not in self.seen:
+            self.seen[key] = objects
+            return executor(*args, **kwargs)
+
+        del self.seen[key]
+        return self.capture(executor, key, args, kwargs, tensors, objects)
+
+
+def set_cuda_graph_wrapper(model: ModelPatcher, max_graphs: int=4) -> CUDAGraphRunner:
+    '''
+    Record the model call of every sampling step in a CUDA graph and replay it, removing the kernel launch overhead
+    that dominates small resolutions and few step models.
+    '''
+    model.remove_wrappers_with_key(WrappersMP.APPLY_MODEL, CUDA_GRAPH_KEY)
+    model.remove_wrappers_with_key(WrappersMP.OUTER_SAMPLE, CUDA_GRAPH_KEY)
+    runner = CUDAGraphRunner(max_graphs=max_graphs)
+    model.add_wrapper_with_key(WrappersMP.OUTER_SAMPLE, CUDA_GRAPH_KEY, runner.outer_sample_wrapper)
+    model.add_wrapper_with_key(WrappersMP.APPLY_MODEL, CUDA_GRAPH_KEY, runner)
+    return runner
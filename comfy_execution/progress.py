@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import TypedDict, Dict, Optional, Tuple
+from typing import TypedDict, Dict, List, Optional, Tuple, Union
 from typing_extensions import override
 from PIL import Image
 from enum import Enum
@@ -12,7 +12,8 @@ if TYPE_CHECKING:
 from protocol import BinaryEventTypes
 from comfy_api import feature_flags
 
-PreviewImageTuple = Tuple[str, Image.Image, Optional[int]]
+# the image is a list of frames for animated previews
+PreviewImageTuple = Tuple[str, Union[Image.Image, List[Image.Image]], Optional[int]]
 
 class NodeState(Enum):
     Pending = "pending"
@@ -0,0 +1,51 @@
+import os
+from typing_extensions import override
+from comfy_api.latest import ComfyExtension, io
+import comfy.ldm.modules.attention_autotune
+import folder_paths
+
+AUTOTUNERS = {}
+
+
+def get_autotuner(persist: bool, iterations: int):
+    cache_path = os.path.join(folder_paths.get_user_directory(), "cache", "attention_autotune.json") if persist else None
+    key = (cache_path, iterations)
+    if key not in AUTOTUNERS:
+        AUTOTUNERS[key] = comfy.ldm.modules.attention_autotune.AttentionAutotuner(cache_path=cache_path, iterations=iterations)
+    return AUTOTUNERS[key]
+
+
+class AttentionAutotune(io.ComfyNode):
+    @classmethod
+    def define_schema(cls) -> io.Schema:
+        return io.Schema(
+            node_id="AttentionAutotune",
+            display_name="Attention Autotune",
+            description="Times every available attention function the first time an attention shape is seen and uses the fastest one for that shape from then on.",
+            category="advanced/model",
+            is_experimental=True,
+            inputs=[
+                io.Model.Input("model"),
+                io.Boolean.Input("persist", default=True, tooltip="Store the results in the user directory so they are reused after a restart."),
+                io.Int.Input("iterations", default=3, min=1, max=100, tooltip="Number of timed runs per attention function."),
+            ],
+            outputs=[io.Model.Output()],
+        )
+
+    @classmethod
+    def execute(cls, model, persist, iterations) -> io.NodeOutput:
+        m = model.clone()
+        m.model_options["transformer_options"]["optimized_attention_override"] = get_autotuner(persist, iterations)
+        return io.NodeOutput(m)
+
+
+class AttentionAutotuneExtension(ComfyExtension):
+    @override
+    async def get_node_list(self) -> list[type[io.ComfyNode]]:
+        return [
+            AttentionAutotune,
+        ]
+
+
+async def comfy_entrypoint() -> AttentionAutotuneExtension:
+    return AttentionAutotuneExtension()
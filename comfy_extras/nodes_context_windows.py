@@ -1,6 +1,8 @@
 from __future__ import annotations
+import torch
 from comfy_api.latest import ComfyExtension, io
 import comfy.context_windows
+import comfy.model_management
 import nodes
 
 
@@ -26,6 +28,7 @@ class ContextWindowsManualNode(io.ComfyNode):
                 io.Boolean.Input("closed_loop", default=False, tooltip="Whether to close the context window loop; only applicable to looped schedules."),
                 io.Combo.Input("fuse_method", options=comfy.context_windows.ContextFuseMethods.LIST_STATIC, default=comfy.context_windows.ContextFuseMethods.PYRAMID, tooltip="The method to use to fuse the context windows."),
                 io.Int.Input("dim", min=0, max=5, default=0, tooltip="The dimension to apply the context windows to."),
+                io.Boolean.Input("batch_windows", default=False, optional=True, tooltip="Run multiple context windows in one batched forward pass when free memory allows it; only applicable when dim is not 0."),
             ],
             outputs=[
                 io.Model.Output(tooltip="The model with context windows applied during sampling."),
@@ -34,7 +37,7 @@ class ContextWindowsManualNode(io.ComfyNode):
         )
 
     @classmethod
-    def execute(cls, model: io.Model.Type, context_length: int, context_overlap: int, context_schedule: str, context_stride: int, closed_loop: bool, fuse_method: str, dim: int) -> io.Model:
+    def execute(cls, model: io.Model.Type, context_length: int, context_overlap: int, context_schedule: str, context_stride: int, closed_loop: bool, fuse_method: str, dim: int, batch_windows: bool=False) -> io.Model:
         model = model.clone()
         model.model_options["context_handler"] = comfy.context_windows.IndexListContextHandler(
             context_schedule=comfy.context_windows.get_matching_context_schedule(context_schedule),
@@ -43,7 +46,8 @@ class ContextWindowsManualNode(io.ComfyNode):
             context_overlap=context_overlap,
             context_stride=context_stride,
             closed_loop=closed_loop,
-            dim=dim)
+            dim=dim,
+            batch_windows=batch_windows)
         # make memory usage calculation only take into account the context window latents
         comfy.context_windows.create_prepare_sampling_wrapper(model)
         return io.NodeOutput(model)
@@ -68,21 +72,49 @@ class WanContextWindowsManualNode(ContextWindowsManualNode):
                 io.Int.Input("context_stride", min=1, default=1, tooltip="The stride of the context window; only applicable to uniform schedules."),
                 io.Boolean.Input("closed_loop", default=False, tooltip="Whether to close the context window loop; only applicable to looped schedules."),
                 io.Combo.Input("fuse_method", options=comfy.context_windows.ContextFuseMethods.LIST_STATIC, default=comfy.context_windows.ContextFuseMethods.PYRAMID, tooltip="The method to use to fuse the context windows."),
+                io.Boolean.Input("batch_windows", default=False, optional=True, tooltip="Run multiple context windows in one batched forward pass when free memory allows it."),
         ]
         return schema
 
     @classmethod
-    def execute(cls, model: io.Model.Type, context_length: int, context_overlap: int, context_schedule: str, context_stride: int, closed_loop: bool, fuse_method: str) -> io.Model:
+    def execute(cls, model: io.Model.Type, context_length: int, context_overlap: int, context_schedule: str, context_stride: int, closed_loop: bool, fuse_method: str, batch_windows: bool=False) -> io.Model:
         context_length = max(((context_length - 1) // 4) + 1, 1)  # at least length 1
         context_overlap = max(((context_overlap - 1) // 4) + 1, 0)  # at least overlap 0
-        return super().execute(model, context_length, context_overlap, context_schedule, context_stride, closed_loop, fuse_method, dim=2)
+        return super().execute(model, context_length, context_overlap, context_schedule, context_stride, closed_loop, fuse_method, dim=2, batch_windows=batch_windows)
 
 
+class ContextWindowsMultiDeviceNode(io.ComfyNode):
+    @classmethod
+    def define_schema(cls) -> io.Schema:
+        return io.Schema(
+            node_id="ContextWindowsMultiDevice",
+            display_name="Context Windows (Multi Device)",
+            category="context",
+            description="Evaluate the context windows of a model in parallel on multiple local devices. Each extra device holds its own copy of the model.",
+            inputs=[
+                io.Model.Input("model", tooltip="The model with context windows applied."),
+                io.String.Input("devices", default="", tooltip="Comma separated list of extra devices, e.g. cuda:1,cuda:2. Leave empty to use every other visible device."),
+            ],
+            outputs=[
+                io.Model.Output(tooltip="The model with context windows split across devices."),
+            ],
+            is_experimental=True,
+        )
+
+    @classmethod
+    def execute(cls, model: io.Model.Type, devices: str) -> io.Model:
+        if devices.strip() == "":
+            device_list = comfy.model_management.get_all_torch_devices(exclude_current=True)
+        else:
+            device_list = [torch.device(d.strip()) for d in devices.split(",") if d.strip() != ""]
+        return io.NodeOutput(comfy.context_windows.create_multidevice_clones(model, device_list))
+
 class ContextWindowsExtension(ComfyExtension):
     async def get_node_list(self) -> list[type[io.ComfyNode]]:
         return [
             ContextWindowsManualNode,
             WanContextWindowsManualNode,
+            ContextWindowsMultiDeviceNode,
         ]
 
 def comfy_entrypoint():
@@ -0,0 +1,129 @@
+from __future__ import annotations
+from comfy_api.latest import io, ComfyExtension
+import comfy.patcher_extension
+import comfy.samplers
+import comfy.model_patcher
+import logging
+import torch
+
+
+def convergence_predict_noise_wrapper(executor, *args, **kwargs):
+    x: torch.Tensor = args[0]
+    timestep: torch.Tensor = args[1]
+    model_options: dict[str] = args[2]
+    monitor: ConvergenceMonitorHolder = model_options["transformer_options"]["convergence_monitor"]
+    output: torch.Tensor = executor(*args, **kwargs)
+    step = monitor.get_step(timestep, model_options)
+    # intermediate evaluations of multi stage samplers are not compared
+    if step is None:
+        return output
+    monitor.steps_run = step + 1
+    if monitor.denoised_prev is not None and monitor.denoised_prev.shape == output.shape:
+        change_rate = ((output - monitor.denoised_prev).flatten().abs().mean() / monitor.denoised_prev_norm).item()
+        monitor.change_rates.append(change_rate)
+        if monitor.verbose:
+            logging.info(f"ConvergenceMonitor [verbose] - step {step} change_rate: {change_rate}")
+        # exiting on the second to last step would not save anything
+        if monitor.can_exit(timestep, step) and change_rate < monitor.threshold:
+            monitor.converged_step = step
+            raise comfy.samplers.SamplingConverged(x, output, timestep, step)
+    monitor.denoised_prev = output
+    monitor.denoised_prev_norm = output.flatten().abs().mean()
+    return output
+
+def convergence_sample_wrapper(executor, *args, **kwargs):
+    """
+    This OUTER_SAMPLE wrapper gives every run its own monitor state and logs the achieved step count at the end.
+    """
+    try:
+        guider = executor.class_obj
+        orig_model_options = guider.model_options
+        guider.model_options = comfy.model_patcher.create_model_options_clone(orig_model_options)
+        guider.model_options["transformer_options"]["convergence_monitor"] = guider.model_options["transformer_options"]["convergence_monitor"].clone().prepare_timesteps(guider.model_patcher.model.model_sampling)
+        return executor(*args, **kwargs)
+    finally:
+        monitor: ConvergenceMonitorHolder = guider.model_options["transformer_options"]["convergence_monitor"]
+        total_steps = len(args[3]) - 1
+        if monitor.converged_step is not None:
+            logging.info(f"ConvergenceMonitor - converged after {monitor.steps_run}/{total_steps} steps, jumped to the final sigma.")
+        else:
+            logging.info(f"ConvergenceMonitor - ran all {total_steps} steps.")
+        monitor.reset()
+        guider.model_options = orig_model_options
+
+
+class ConvergenceMonitorHolder:
+    def __init__(self, threshold: float, start_percent: float, verbose: bool=False):
+        self.threshold = threshold
+        self.start_percent = start_percent
+        self.verbose = verbose
+        self.start_t = 0.0
+        self.reset()
+
+    def prepare_timesteps(self, model_sampling):
+        self.start_t = model_sampling.percent_to_sigma(self.start_percent)
+        return self
+
+    def get_step(self, timestep: torch.Tensor, model_options: dict[str]):
+        sample_sigmas = model_options["transformer_options"].get("sample_sigmas", None)
+        if sample_sigmas is None:
+            return None
+        matches = torch.nonzero(torch.isclose(sample_sigmas, timestep[0], rtol=0.0001))
+        if torch.numel(matches) == 0:
+            return None
+        self.total_steps = sample_sigmas.shape[-1] - 1
+        return int(matches[0].item())
+
+    def can_exit(self, timestep: torch.Tensor, step: int) -> bool:
+        return timestep[0] <= self.start_t and step < self.total_steps - 1
+
+    def reset(self):
+        self.denoised_prev = None
+        self.denoised_prev_norm = None
+        self.change_rates = []
+        self.steps_run = 0
+        self.total_steps = 0
+        self.converged_step = None
+        return self
+
+    def clone(self):
+        return ConvergenceMonitorHolder(self.threshold, self.start_percent, self.verbose)
+
+
+class ConvergenceEarlyExitNode(io.ComfyNode):
+    @classmethod
+    def define_schema(cls) -> io.Schema:
+        return io.Schema(
+            node_id="ConvergenceEarlyExit",
+            display_name="Convergence Early Exit",
+            description="Ends sampling early when the denoised prediction stops changing between steps and jumps straight to the final sigma. Useful for distilled and lightning models.",
+            category="advanced/debug/model",
+            is_experimental=True,
+            inputs=[
+                io.Model.Input("model", tooltip="The model to add the convergence monitor to."),
+                io.Float.Input("threshold", min=0.0, default=0.02, max=1.0, step=0.001, tooltip="Relative change of the denoised prediction between two steps under which sampling ends."),
+                io.Float.Input("start_percent", min=0.0, default=0.5, max=1.0, step=0.01, tooltip="The relative sampling step before which sampling never ends early."),
+                io.Boolean.Input("verbose", default=False, tooltip="Whether to log the change rate of every step."),
+            ],
+            outputs=[
+                io.Model.Output(tooltip="The model with the convergence monitor."),
+            ],
+        )
+
+    @classmethod
+    def execute(cls, model: io.Model.Type, threshold: float, start_percent: float, verbose: bool) -> io.NodeOutput:
+        model = model.clone()
+        model.model_options["transformer_options"]["convergence_monitor"] = ConvergenceMonitorHolder(threshold, start_percent, verbose=verbose)
+        model.add_wrapper_with_key(comfy.patcher_extension.WrappersMP.OUTER_SAMPLE, "convergence_monitor", convergence_sample_wrapper)
+        model.add_wrapper_with_key(comfy.patcher_extension.WrappersMP.PREDICT_NOISE, "convergence_monitor", convergence_predict_noise_wrapper)
+        return io.NodeOutput(model)
+
+
+class ConvergenceExtension(ComfyExtension):
+    async def get_node_list(self) -> list[type[io.ComfyNode]]:
+        return [
+            ConvergenceEarlyExitNode,
+        ]
+
+def comfy_entrypoint():
+    return ConvergenceExtension()
@@ -0,0 +1,57 @@
+from __future__ import annotations
+from typing_extensions import override
+from comfy_api.latest import ComfyExtension, io
+import comfy.patcher_extension
+import comfy.model_patcher
+import comfy.ldm.modules.attention
+
+
+def cross_attn_kv_cache_sample_wrapper(executor, *args, **kwargs):
+    """
+    This OUTER_SAMPLE wrapper gives every sampling run its own cache so nothing is kept after sampling ends.
+    """
+    guider = executor.class_obj
+    orig_model_options = guider.model_options
+    guider.model_options = comfy.model_patcher.create_model_options_clone(orig_model_options)
+    kv_cache = comfy.ldm.modules.attention.CrossAttentionKVCache()
+    guider.model_options["transformer_options"]["cross_attn_kv_cache"] = kv_cache
+    try:
+        return executor(*args, **kwargs)
+    finally:
+        kv_cache.clear()
+        guider.model_options = orig_model_options
+
+
+class CrossAttentionKVCacheNode(io.ComfyNode):
+    @classmethod
+    def define_schema(cls) -> io.Schema:
+        return io.Schema(
+            node_id="CrossAttentionKVCache",
+            display_name="Cross Attention KV Cache",
+            description="Computes the key/value projections of the text (and clip vision) context once per sampling run and reuses them for every step. "
+                        "Uses extra memory for the cached projections. Supported by SD/SDXL style unets and Wan.",
+            category="advanced/model",
+            is_experimental=True,
+            inputs=[
+                io.Model.Input("model"),
+            ],
+            outputs=[io.Model.Output()],
+        )
+
+    @classmethod
+    def execute(cls, model) -> io.NodeOutput:
+        m = model.clone()
+        m.add_wrapper_with_key(comfy.patcher_extension.WrappersMP.OUTER_SAMPLE, "cross_attn_kv_cache", cross_attn_kv_cache_sample_wrapper)
+        return io.NodeOutput(m)
+
+
+class CrossAttentionCacheExtension(ComfyExtension):
+    @override
+    async def get_node_list(self) -> list[type[io.ComfyNode]]:
+        return [
+            CrossAttentionKVCacheNode,
+        ]
+
+
+async def comfy_entrypoint() -> CrossAttentionCacheExtension:
+    return CrossAttentionCacheExtension()
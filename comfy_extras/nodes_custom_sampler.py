@@ -711,6 +711,35 @@ class CFGGuider:
         guider.set_cfg(cfg)
         return (guider,)
 
+class ProgressiveCFGGuider:
+    upscale_methods = ["bislerp", "nearest-exact", "bilinear", "area", "bicubic"]
+
+    @classmethod
+    def INPUT_TYPES(s):
+        return {"required":
+                    {"model": ("MODEL",),
+                    "positive": ("CONDITIONING", ),
+                    "negative": ("CONDITIONING", ),
+                    "cfg": ("FLOAT", {"default": 8.0, "min": 0.0, "max": 100.0, "step":0.1, "round": 0.01}),
+                    "start_scale": ("FLOAT", {"default": 0.5, "min": 0.1, "max": 1.0, "step": 0.05, "tooltip": "Latent resolution scale used for the high sigma steps."}),
+                    "upscale_percent": ("FLOAT", {"default": 0.3, "min": 0.0, "max": 1.0, "step": 0.01, "tooltip": "Sampling percent at which the latent gets upscaled to the full resolution."}),
+                    "upscale_method": (s.upscale_methods,),
+                     }
+                }
+
+    RETURN_TYPES = ("GUIDER",)
+
+    FUNCTION = "get_guider"
+    CATEGORY = "sampling/custom_sampling/guiders"
+
+    def get_guider(self, model, positive, negative, cfg, start_scale, upscale_percent, upscale_method):
+        model_sampling = model.get_model_object("model_sampling")
+        guider = comfy.samplers.ProgressiveCFGGuider(model)
+        guider.set_conds(positive, negative)
+        guider.set_cfg(cfg)
+        guider.set_resolution_schedule([(start_scale, model_sampling.percent_to_sigma(upscale_percent))], upscale_method)
+        return (guider,)
+
 class Guider_DualCFG(comfy.samplers.CFGGuider):
     def set_cfg(self, cfg1, cfg2, nested=False):
         self.cfg1 = cfg1
@@ -919,6 +948,7 @@ NODE_CLASS_MAPPINGS = {
     "SamplingPercentToSigma": SamplingPercentToSigma,
 
     "CFGGuider": CFGGuider,
+    "ProgressiveCFGGuider": ProgressiveCFGGuider,
     "DualCFGGuider": DualCFGGuider,
     "BasicGuider": BasicGuider,
     "RandomNoise": RandomNoise,
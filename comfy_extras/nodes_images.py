@@ -7,7 +7,6 @@ from comfy.cli_args import args
 from PIL import Image
 from PIL.PngImagePlugin import PngInfo
 
-import numpy as np
 import json
 import os
 import re
@@ -128,11 +127,7 @@ class SaveAnimatedWEBP:
         filename_prefix += self.prefix_append
         full_output_folder, filename, counter, subfolder, filename_prefix = folder_paths.get_save_image_path(filename_prefix, self.output_dir, images[0].shape[1], images[0].shape[0])
         results: list[FileLocator] = []
-        pil_images = []
-        for image in images:
-            i = 255. * image.cpu().numpy()
-            img = Image.fromarray(np.clip(i, 0, 255).astype(np.uint8))
-            pil_images.append(img)
+        pil_images = [Image.fromarray(i) for i in comfy.utils.images_to_uint8(images)]
 
         metadata = pil_images[0].getexif()
         if not args.disable_metadata:
@@ -189,11 +184,7 @@ class SaveAnimatedPNG:
         filename_prefix += self.prefix_append
         full_output_folder, filename, counter, subfolder, filename_prefix = folder_paths.get_save_image_path(filename_prefix, self.output_dir, images[0].shape[1], images[0].shape[0])
         results = list()
-        pil_images = []
-        for image in images:
-            i = 255. * image.cpu().numpy()
-            img = Image.fromarray(np.clip(i, 0, 255).astype(np.uint8))
-            pil_images.append(img)
+        pil_images = [Image.fromarray(i) for i in comfy.utils.images_to_uint8(images)]
 
         metadata = None
         if not args.disable_metadata:
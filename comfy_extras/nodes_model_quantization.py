@@ -0,0 +1,54 @@
+import os
+from typing_extensions import override
+from comfy_api.latest import ComfyExtension, io
+import comfy.sd
+import folder_paths
+
+QUANT_FORMATS = {
+    "int8": "int8_channelwise",
+    "fp8_e4m3fn": "float8_e4m3fn_channelwise",
+    "fp8_e4m3fn_blockwise": "float8_e4m3fn_blockwise",
+    "int4_groupwise": "int4_groupwise",
+}
+
+
+class UNETLoaderQuantized(io.ComfyNode):
+    @classmethod
+    def define_schema(cls):
+        return io.Schema(
+            node_id="UNETLoaderQuantized",
+            display_name="Load Diffusion Model (Quantize)",
+            category="advanced/loaders",
+            description="Loads a diffusion model and quantizes the weights of its linear layers to int8 or fp8 with one scale per output channel, fp8 with one scale per 128x128 block or 4 bit with a scale per group of 128 inputs. "
+                        "The matmuls run in the normal compute dtype so this works on every GPU, it lowers the memory use and the time spent moving weights.",
+            is_experimental=True,
+            inputs=[
+                io.Combo.Input("unet_name", options=folder_paths.get_filename_list("diffusion_models")),
+                io.Combo.Input("quant_format", options=list(QUANT_FORMATS.keys())),
+                io.Combo.Input("calibration", options=["absmax", "mse"], tooltip="Only used by the per channel formats.\nabsmax: scale from the largest weight of every channel.\nmse: pick the clipping per channel with the lowest quantization error, slower to load but more precise."),
+                io.Boolean.Input("cache", default=True, tooltip="Store the quantized model in the user directory so the next load skips the quantization. "
+                                 "Every model and format is a full quantized copy on disk, the total size is limited by --quantize-cache-size (64GB by default)."),
+            ],
+            outputs=[io.Model.Output()],
+        )
+
+    @classmethod
+    def execute(cls, unet_name, quant_format, calibration, cache) -> io.NodeOutput:
+        model_options = {"quantize": {"format": QUANT_FORMATS[quant_format], "calibration": calibration}}
+        if cache:
+            model_options["quantize_cache_dir"] = os.path.join(folder_paths.get_user_directory(), "cache", "quantized_models")
+        unet_path = folder_paths.get_full_path_or_raise("diffusion_models", unet_name)
+        model = comfy.sd.load_diffusion_model(unet_path, model_options=model_options)
+        return io.NodeOutput(model)
+
+
+class ModelQuantizationExtension(ComfyExtension):
+    @override
+    async def get_node_list(self) -> list[type[io.ComfyNode]]:
+        return [
+            UNETLoaderQuantized,
+        ]
+
+
+async def comfy_entrypoint() -> ModelQuantizationExtension:
+    return ModelQuantizationExtension()
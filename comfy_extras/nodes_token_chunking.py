@@ -0,0 +1,38 @@
+from comfy_api.latest import ComfyExtension, io
+from typing_extensions import override
+
+
+class BlockTokenChunking(io.ComfyNode):
+    @classmethod
+    def define_schema(cls):
+        return io.Schema(
+            node_id="BlockTokenChunking",
+            category="advanced/model_patches",
+            description="Runs the token wise parts of every transformer block (norms, modulation, cross attention, feed forward) in chunks of tokens to lower the peak memory use at very high resolutions and frame counts. Self attention still sees the full sequence. Supported by Wan and Qwen Image.",
+            is_experimental=True,
+            inputs=[
+                io.Model.Input("model"),
+                io.Int.Input("chunk_size", default=16384, min=0, max=1048576, step=1024, tooltip="Number of tokens per chunk, 0 disables chunking."),
+            ],
+            outputs=[
+                io.Model.Output(),
+            ],
+        )
+
+    @classmethod
+    def execute(cls, model, chunk_size) -> io.NodeOutput:
+        m = model.clone()
+        m.set_model_block_token_chunk_size(chunk_size)
+        return io.NodeOutput(m)
+
+
+class TokenChunkingExtension(ComfyExtension):
+    @override
+    async def get_node_list(self) -> list[type[io.ComfyNode]]:
+        return [
+            BlockTokenChunking
+        ]
+
+
+async def comfy_entrypoint() -> TokenChunkingExtension:
+    return TokenChunkingExtension()
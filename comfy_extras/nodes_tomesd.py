@@ -1,9 +1,11 @@
 #Taken from: https://github.com/dbolya/tomesd
 
 import torch
+import logging
 from typing import Tuple, Callable, Optional
 from typing_extensions import override
 from comfy_api.latest import ComfyExtension, io
+from comfy.ldm.wan.model import repeat_e
 import math
 
 def do_nothing(x: torch.Tensor, mode:str=None):
@@ -125,6 +127,112 @@ def bipartite_soft_matching_random2d(metric: torch.Tensor,
     return merge, unmerge
 
 
+def bipartite_soft_matching_random3d(metric: torch.Tensor,
+                                     t: int, h: int, w: int, st: int, sy: int, sx: int, r: int,
+                                     seed: int = 0, chunk_size: int = 4096) -> Tuple[Callable, Callable, Callable]:
+    """
+    Video version of bipartite_soft_matching_random2d, dst tokens are chosen randomly in each (st, sy, sx) region
+    so tokens can also get merged with the same token of the neighbouring frame.
+    Args:
+     - metric [B, N, C]: metric to use for similarity, N must be t * h * w
+     - t, h, w: size of the video in tokens
+     - st, sy, sx: stride in the t, y and x dimension for dst
+     - r: number of tokens to remove (by merging)
+     - seed: seed of the dst selection, doesn't touch the global rng
+    Returns merge, unmerge and gather. gather picks the dst token for every merged token, it's used for the
+    inputs that can't be averaged like the rope frequencies.
+    """
+    B, N, _ = metric.shape
+    st, sy, sx = min(st, t), min(sy, h), min(sx, w)
+
+    if r <= 0 or N != t * h * w or st * sy * sx == 1:
+        return do_nothing, do_nothing, do_nothing
+
+    gather = mps_gather_workaround if metric.device.type == "mps" else torch.gather
+
+    with torch.no_grad():
+        tst, hsy, wsx = t // st, h // sy, w // sx
+
+        generator = torch.Generator().manual_seed(seed)
+        rand_idx = torch.randint(st*sy*sx, size=(tst, hsy, wsx, 1), generator=generator).to(metric.device)
+
+        idx_buffer_view = torch.zeros(tst, hsy, wsx, st*sy*sx, device=metric.device, dtype=torch.int64)
+        idx_buffer_view.scatter_(dim=3, index=rand_idx, src=-torch.ones_like(rand_idx, dtype=rand_idx.dtype))
+        idx_buffer_view = idx_buffer_view.view(tst, hsy, wsx, st, sy, sx).permute(0, 3, 1, 4, 2, 5).reshape(tst * st, hsy * sy, wsx * sx)
+
+        if (tst * st) < t or (hsy * sy) < h or (wsx * sx) < w:
+            idx_buffer = torch.zeros(t, h, w, device=metric.device, dtype=torch.int64)
+            idx_buffer[:(tst * st), :(hsy * sy), :(wsx * sx)] = idx_buffer_view
+        else:
+            idx_buffer = idx_buffer_view
+
+        rand_idx = idx_buffer.reshape(1, -1, 1).argsort(dim=1)
+        del idx_buffer, idx_buffer_view
+
+        num_dst = tst * hsy * wsx
+        a_idx = rand_idx[:, num_dst:, :] # src
+        b_idx = rand_idx[:, :num_dst, :] # dst
+
+        def split(x):
+            C = x.shape[-1]
+            src = gather(x, dim=1, index=a_idx.expand(B, N - num_dst, C))
+            dst = gather(x, dim=1, index=b_idx.expand(B, num_dst, C))
+            return src, dst
+
+        metric = metric / metric.norm(dim=-1, keepdim=True)
+        a, b = split(metric)
+        r = min(a.shape[1], r)
+
+        # video token counts are too large for the full score matrix
+        node_max = []
+        node_idx = []
+        for i in range(0, a.shape[1], chunk_size):
+            m, idx = (a[:, i:i + chunk_size] @ b.transpose(-1, -2)).max(dim=-1)
+            node_max.append(m)
+            node_idx.append(idx)
+        node_max = torch.cat(node_max, dim=1)
+        node_idx = torch.cat(node_idx, dim=1)
+        edge_idx = node_max.argsort(dim=-1, descending=True)[..., None]
+
+        unm_idx = edge_idx[..., r:, :]  # Unmerged Tokens
+        src_idx = edge_idx[..., :r, :]  # Merged Tokens
+        dst_idx = gather(node_idx[..., None], dim=-2, index=src_idx)
+        a_idx_b = a_idx.expand(B, a_idx.shape[1], 1)
+        # original position of every token of the merged sequence
+        pos_idx = torch.cat((gather(a_idx_b, dim=1, index=unm_idx), b_idx.expand(B, num_dst, 1)), dim=1).squeeze(-1)
+
+    def merge(x: torch.Tensor, mode="mean") -> torch.Tensor:
+        src, dst = split(x)
+        n, t1, c = src.shape
+
+        unm = gather(src, dim=-2, index=unm_idx.expand(n, t1 - r, c))
+        src = gather(src, dim=-2, index=src_idx.expand(n, r, c))
+        dst = dst.scatter_reduce(-2, dst_idx.expand(n, r, c), src, reduce=mode)
+
+        return torch.cat([unm, dst], dim=1)
+
+    def unmerge(x: torch.Tensor) -> torch.Tensor:
+        unm_len = unm_idx.shape[1]
+        unm, dst = x[..., :unm_len, :], x[..., unm_len:, :]
+        _, _, c = unm.shape
+
+        src = gather(dst, dim=-2, index=dst_idx.expand(B, r, c))
+
+        out = torch.zeros(B, N, c, device=x.device, dtype=x.dtype)
+        out.scatter_(dim=-2, index=b_idx.expand(B, num_dst, c), src=dst)
+        out.scatter_(dim=-2, index=gather(a_idx_b, dim=1, index=unm_idx).expand(B, unm_len, c), src=unm)
+        out.scatter_(dim=-2, index=gather(a_idx_b, dim=1, index=src_idx).expand(B, r, c), src=src)
+
+        return out
+
+    def gather_positions(x: torch.Tensor, dim: int = 1) -> torch.Tensor:
+        x = x.expand(B, *x.shape[1:]).movedim(dim, 1)
+        index = pos_idx.view(B, -1, *([1] * (x.ndim - 2))).expand(B, -1, *x.shape[2:])
+        return torch.gather(x, 1, index).movedim(1, dim)
+
+    return merge, unmerge, gather_positions
+
+
 def get_functions(x, ratio, original_shape):
     b, c, original_h, original_w = original_shape
     original_tokens = original_h * original_w
@@ -178,11 +286,118 @@ class TomePatchModel(io.ComfyNode):
         return io.NodeOutput(m)
 
 
+def current_sigma(transformer_options):
+    """The sigma of the model call as a float, read once per call instead of syncing with the device in every block."""
+    sigmas = transformer_options["sigmas"]
+    cached = transformer_options.get("tome_sigma", None)
+    if cached is None or cached[0] is not sigmas:
+        cached = (sigmas, sigmas[0].item())
+        transformer_options["tome_sigma"] = cached
+    return cached[1]
+
+
+def tome_dit_block_patch(block_type, index, ratio, strides, sigma_start, sigma_end):
+    def block_patch(args, extra_args):
+        original_block = extra_args["original_block"]
+        transformer_options = args["transformer_options"]
+        token_grid = transformer_options.get("token_grid", None)
+        if token_grid is None or args.get("attn_mask", None) is not None:
+            return original_block(args)
+
+        sigma = current_sigma(transformer_options)
+        if sigma > sigma_start or sigma < sigma_end:
+            return original_block(args)
+
+        x = args["img"]
+        offset = token_grid["offsets"][block_type]
+        n = math.prod(token_grid["grid_sizes"])
+        merge, unmerge, gather_positions = bipartite_soft_matching_random3d(x[:, offset:offset + n], *token_grid["grid_sizes"], *strides, int(n * ratio), seed=index)
+        if merge is do_nothing:
+            return original_block(args)
+
+        def merge_tokens(t, offset, dim=1, merge_func=merge):
+            t = t.movedim(dim, 1)
+            merged = merge_func(t[:, offset:offset + n].flatten(2))
+            merged = merged.reshape(*merged.shape[:2], *t.shape[2:])
+            t = t.expand(merged.shape[0], *t.shape[1:])
+            return torch.cat((t[:, :offset], merged, t[:, offset + n:]), dim=1).movedim(1, dim)
+
+        new_args = args.copy()
+        new_args["img"] = merge_tokens(x, offset)
+        if args.get("pe", None) is not None:
+            new_args["pe"] = merge_tokens(args["pe"], token_grid["pe_offsets"][block_type], dim=token_grid["pe_dim"], merge_func=gather_positions)
+        vec = args.get("vec", None)
+        if torch.is_tensor(vec) and vec.ndim == 4 and vec.shape[1] > 1: # per token or per frame modulation (Wan 2.2 TI2V)
+            # spread the frame modulation over the tokens of each frame like the block does before merging them
+            new_args["vec"] = merge_tokens(repeat_e(vec, x), offset)
+
+        out = original_block(new_args)
+        # only the change made by the block gets unmerged so the tokens that were merged keep their own content
+        merged_n = new_args["img"].shape[1] - (x.shape[1] - n)
+        y = out["img"]
+        delta = y[:, offset:offset + merged_n] - new_args["img"][:, offset:offset + merged_n]
+        out["img"] = torch.cat((y[:, :offset], x[:, offset:offset + n] + unmerge(delta), y[:, offset + merged_n:]), dim=1)
+        return out
+    return block_patch
+
+
+class TomePatchModelDiT(io.ComfyNode):
+    @classmethod
+    def define_schema(cls):
+        return io.Schema(
+            node_id="TomePatchModelDiT",
+            display_name="Tome Patch Model (DiT)",
+            description="Token merging for Wan and Flux style models: similar image/video tokens are merged before each selected block and unmerged after it. "
+                        "Video latents have lots of temporal redundancy so the merging regions also span neighbouring frames.",
+            category="model_patches/dit",
+            inputs=[
+                io.Model.Input("model"),
+                io.Float.Input("ratio", default=0.3, min=0.0, max=0.9, step=0.01, tooltip="Fraction of the image/video tokens that gets merged away."),
+                io.Int.Input("temporal_stride", default=2, min=1, max=8, tooltip="Every temporal_stride x spatial_stride x spatial_stride region keeps one token that others can get merged into."),
+                io.Int.Input("spatial_stride", default=2, min=1, max=8),
+                io.Int.Input("start_block", default=2, min=0, max=1000, tooltip="First block that merges tokens, counted over all blocks of the model in execution order."),
+                io.Int.Input("end_block", default=-3, min=-1000, max=1000, tooltip="Last block that merges tokens, negative values count from the last block."),
+                io.Float.Input("start_percent", default=0.0, min=0.0, max=1.0, step=0.001),
+                io.Float.Input("end_percent", default=1.0, min=0.0, max=1.0, step=0.001),
+            ],
+            outputs=[io.Model.Output()],
+            is_experimental=True,
+        )
+
+    @classmethod
+    def execute(cls, model, ratio, temporal_stride, spatial_stride, start_block, end_block, start_percent, end_percent) -> io.NodeOutput:
+        model_sampling = model.get_model_object("model_sampling")
+        sigma_start = model_sampling.percent_to_sigma(start_percent)
+        sigma_end = model_sampling.percent_to_sigma(end_percent)
+        strides = (temporal_stride, spatial_stride, spatial_stride)
+
+        diffusion_model = model.get_model_object("diffusion_model")
+        blocks = []
+        if hasattr(diffusion_model, "double_blocks"):
+            blocks += [("double_block", i) for i in range(len(diffusion_model.double_blocks))]
+            blocks += [("single_block", i) for i in range(len(getattr(diffusion_model, "single_blocks", [])))]
+        elif hasattr(diffusion_model, "blocks"):
+            blocks += [("double_block", i) for i in range(len(diffusion_model.blocks))]
+
+        m = model.clone()
+        if len(blocks) == 0:
+            logging.warning("TomePatchModelDiT: unsupported model, no blocks were patched.")
+            return io.NodeOutput(m)
+
+        if end_block < 0:
+            end_block += len(blocks)
+        for index, (block_type, i) in enumerate(blocks):
+            if start_block <= index <= end_block:
+                m.set_model_patch_replace(tome_dit_block_patch(block_type, index, ratio, strides, sigma_start, sigma_end), "dit", block_type, i)
+        return io.NodeOutput(m)
+
+
 class TomePatchModelExtension(ComfyExtension):
     @override
     async def get_node_list(self) -> list[type[io.ComfyNode]]:
         return [
             TomePatchModel,
+            TomePatchModelDiT,
         ]
 
 
@@ -1,6 +1,8 @@
+import os
 from typing_extensions import override
 from comfy_api.latest import ComfyExtension, io
-from comfy_api.torch_helpers import set_torch_compile_wrapper
+from comfy_api.torch_helpers import set_torch_compile_wrapper, set_torch_compile_manager_wrapper, set_cuda_graph_wrapper
+import folder_paths
 
 
 class TorchCompileModel(io.ComfyNode):
@@ -27,11 +29,76 @@ class TorchCompileModel(io.ComfyNode):
         return io.NodeOutput(m)
 
 
+class TorchCompileModelAdvanced(io.ComfyNode):
+    @classmethod
+    def define_schema(cls) -> io.Schema:
+        return io.Schema(
+            node_id="TorchCompileModelAdvanced",
+            display_name="TorchCompileModel (Advanced)",
+            description="Compiles the blocks of the diffusion model one by one. New latent sizes get compiled in the background while the model "
+                        "keeps running without compiling, the compiled code is saved in the user directory so it's reused after a restart.",
+            category="_for_testing",
+            inputs=[
+                io.Model.Input("model"),
+                io.Combo.Input(
+                    "backend",
+                    options=["inductor", "cudagraphs"],
+                ),
+                io.Combo.Input(
+                    "mode",
+                    options=["default", "max-autotune-no-cudagraphs"],
+                ),
+                io.Boolean.Input("per_block", default=True, tooltip="Compile every block of the model separately instead of the whole model, identical blocks share their compiled code."),
+                io.Boolean.Input("dynamic", default=False, tooltip="Compile graphs with dynamic shapes that work for every latent size instead of a static graph for each size. "
+                                 "Static graphs are usually a bit faster, dynamic ones avoid recompiling when the size changes often."),
+                io.Boolean.Input("persist", default=True, tooltip="Store the compiled code in the user directory so it is reused after a restart. "
+                                 "Also points the inductor cache (TORCHINDUCTOR_CACHE_DIR) there when it isn't set and nothing was compiled yet."),
+            ],
+            outputs=[io.Model.Output()],
+            is_experimental=True,
+        )
+
+    @classmethod
+    def execute(cls, model, backend, mode, per_block, dynamic, persist) -> io.NodeOutput:
+        m = model.clone()
+        cache_dir = os.path.join(folder_paths.get_user_directory(), "cache", "torch_compile") if persist else None
+        set_torch_compile_manager_wrapper(model=m, backend=backend, mode=None if mode == "default" else mode, per_block=per_block,
+                                          dynamic=dynamic, cache_dir=cache_dir)
+        return io.NodeOutput(m)
+
+
+class CUDAGraphModel(io.ComfyNode):
+    @classmethod
+    def define_schema(cls) -> io.Schema:
+        return io.Schema(
+            node_id="CUDAGraphModel",
+            display_name="CUDA Graph Model",
+            description="Records the model call in a CUDA graph once the inputs of the sampling steps stop changing and replays it for the remaining steps, "
+                        "removing the kernel launch overhead. Helps most with small resolutions and few step models. "
+                        "Falls back to running normally when the model is partially loaded or when patches or hooks change every step.",
+            category="_for_testing",
+            inputs=[
+                io.Model.Input("model"),
+                io.Int.Input("max_graphs", default=4, min=1, max=64, tooltip="Maximum number of input shapes that get a graph, every graph keeps its own activation memory until sampling ends."),
+            ],
+            outputs=[io.Model.Output()],
+            is_experimental=True,
+        )
+
+    @classmethod
+    def execute(cls, model, max_graphs) -> io.NodeOutput:
+        m = model.clone()
+        set_cuda_graph_wrapper(model=m, max_graphs=max_graphs)
+        return io.NodeOutput(m)
+
+
 class TorchCompileExtension(ComfyExtension):
     @override
     async def get_node_list(self) -> list[type[io.ComfyNode]]:
         return [
             TorchCompileModel,
+            TorchCompileModelAdvanced,
+            CUDAGraphModel,
         ]
 
 
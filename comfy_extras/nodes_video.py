@@ -11,7 +11,7 @@ from fractions import Fraction
 from comfy_api.input import AudioInput, ImageInput, VideoInput
 from comfy_api.input_impl import VideoFromComponents, VideoFromFile
 from comfy_api.util import VideoCodec, VideoComponents, VideoContainer
-from comfy_api.latest import ComfyExtension, io, ui
+from comfy_api.latest import ComfyExtension, InputImpl, io, ui
 from comfy.cli_args import args
 
 class SaveWEBM(io.ComfyNode):
@@ -81,6 +81,7 @@ class SaveVideo(io.ComfyNode):
                 io.String.Input("filename_prefix", default="video/ComfyUI", tooltip="The prefix for the file to save. This may include formatting information such as %date:yyyy-MM-dd% or %Empty Latent Image.width% to include values from nodes."),
                 io.Combo.Input("format", options=VideoContainer.as_input(), default="auto", tooltip="The format to save the video as."),
                 io.Combo.Input("codec", options=VideoCodec.as_input(), default="auto", tooltip="The codec to use for the video."),
+                io.Int.Input("threads", default=0, min=0, max=256, optional=True, tooltip="Number of threads the video encoder uses, 0 picks it automatically."),
             ],
             outputs=[],
             hidden=[io.Hidden.prompt, io.Hidden.extra_pnginfo],
@@ -88,7 +89,7 @@ class SaveVideo(io.ComfyNode):
         )
 
     @classmethod
-    def execute(cls, video: VideoInput, filename_prefix, format, codec) -> io.NodeOutput:
+    def execute(cls, video: VideoInput, filename_prefix, format, codec, threads=0) -> io.NodeOutput:
         width, height = video.get_dimensions()
         full_output_folder, filename, counter, subfolder, filename_prefix = folder_paths.get_save_image_path(
             filename_prefix,
@@ -106,11 +107,16 @@ class SaveVideo(io.ComfyNode):
             if len(metadata) > 0:
                 saved_metadata = metadata
         file = f"{filename}_{counter:05}_.{VideoContainer.get_extension(format)}"
+        save_kwargs = {}
+        if threads > 0:
+            # VideoInput implementations from before the threads argument don't accept it
+            save_kwargs["threads"] = threads
         video.save_to(
             os.path.join(full_output_folder, file),
             format=format,
             codec=codec,
-            metadata=saved_metadata
+            metadata=saved_metadata,
+            **save_kwargs
         )
 
         return io.NodeOutput(ui=ui.PreviewVideo([ui.SavedResult(file, subfolder, io.FolderType.output)]))
@@ -140,6 +146,45 @@ class CreateVideo(io.ComfyNode):
             VideoFromComponents(VideoComponents(images=images, audio=audio, frame_rate=Fraction(fps)))
         )
 
+class VAEDecodeVideo(io.ComfyNode):
+    @classmethod
+    def define_schema(cls):
+        return io.Schema(
+            node_id="VAEDecodeVideo",
+            display_name="VAE Decode Video (Streaming)",
+            category="image/video",
+            description="Decodes a video latent straight into a video. The decoding happens a few frames at a time while the video gets encoded "
+                        "so the full decoded video is never kept in memory. Streams with causal video VAEs like Wan, other VAEs decode everything at once.",
+            inputs=[
+                io.Latent.Input("samples", tooltip="The video latent to decode."),
+                io.Vae.Input("vae"),
+                io.Float.Input("fps", default=16.0, min=1.0, max=120.0, step=1.0),
+                io.Audio.Input("audio", optional=True, tooltip="The audio to add to the video."),
+            ],
+            outputs=[
+                io.Video.Output(),
+            ],
+        )
+
+    @classmethod
+    def execute(cls, samples, vae, fps: float, audio: Optional[AudioInput] = None) -> io.NodeOutput:
+        latent = samples["samples"]
+        if latent.ndim != 5:
+            raise ValueError("VAEDecodeVideo needs a video latent.")
+        frame_count, height, width = vae.decode_output_shape(latent.shape)
+        return io.NodeOutput(
+            InputImpl.VideoFromFrameGenerator(
+                lambda: vae.decode_stream(latent),
+                width=width,
+                height=height,
+                frame_count=frame_count,
+                frame_rate=Fraction(fps),
+                audio=audio,
+                output_device=vae.output_device,
+            )
+        )
+
+
 class GetVideoComponents(io.ComfyNode):
     @classmethod
     def define_schema(cls):
@@ -150,6 +195,9 @@ class GetVideoComponents(io.ComfyNode):
             description="Extracts all components from a video: frames, audio, and framerate.",
             inputs=[
                 io.Video.Input("video", tooltip="The video to extract components from."),
+                io.Int.Input("start_frame", default=0, min=0, max=1000000, optional=True, tooltip="The first frame to extract."),
+                io.Int.Input("frame_count", default=0, min=0, max=1000000, optional=True, tooltip="The number of frames to extract, 0 extracts all frames until the end."),
+                io.Int.Input("stride", default=1, min=1, max=1000, optional=True, tooltip="Only extract every nth frame, the fps is divided by it."),
             ],
             outputs=[
                 io.Image.Output(display_name="images"),
@@ -159,8 +207,23 @@ class GetVideoComponents(io.ComfyNode):
         )
 
     @classmethod
-    def execute(cls, video: VideoInput) -> io.NodeOutput:
-        components = video.get_components()
+    def execute(cls, video: VideoInput, start_frame=0, frame_count=0, stride=1) -> io.NodeOutput:
+        if start_frame == 0 and frame_count == 0 and stride == 1:
+            components = video.get_components()
+        elif isinstance(video, VideoFromFile):
+            # only decodes the selected frames
+            components = video.get_components(start_frame=start_frame, frame_count=frame_count, stride=stride)
+        else:
+            components = video.get_components()
+            end = None if frame_count == 0 else start_frame + frame_count * stride
+            images = components.images[start_frame:end:stride]
+            audio = components.audio
+            if audio is not None:
+                sample_rate = audio["sample_rate"]
+                audio_start = int(start_frame / components.frame_rate * sample_rate)
+                audio_end = int((start_frame + images.shape[0] * stride) / components.frame_rate * sample_rate)
+                audio = {"waveform": audio["waveform"][..., audio_start:audio_end], "sample_rate": sample_rate}
+            components = VideoComponents(images=images, audio=audio, frame_rate=components.frame_rate / stride)
 
         return io.NodeOutput(components.images, components.audio, float(components.frame_rate))
 
@@ -210,6 +273,7 @@ class VideoExtension(ComfyExtension):
             SaveWEBM,
             SaveVideo,
             CreateVideo,
+            VAEDecodeVideo,
             GetVideoComponents,
             LoadVideo,
         ]
@@ -12,6 +12,7 @@ import asyncio
 
 import torch
 
+import comfy.image_saver
 import comfy.model_management
 import nodes
 from comfy_execution.caching import (
@@ -660,6 +661,25 @@ class PromptExecutor:
             }
             self.add_message("execution_error", mes, broadcast=False)
 
+    def wait_image_saves(self, dynamic_prompt):
+        """Waits for the images saved in the background, returns the error details of the first save that failed."""
+        try:
+            comfy.image_saver.IMAGE_SAVER.wait_all()
+        except comfy.image_saver.ImageSaveError as ex:
+            node_id = ex.node_id
+            if node_id is None or dynamic_prompt.get_real_node_id(node_id) not in dynamic_prompt.original_prompt:
+                # not saved by a node of this prompt, the error has been logged by the saver
+                return None, None
+            error_details = {
+                "node_id": dynamic_prompt.get_real_node_id(node_id),
+                "exception_message": str(ex),
+                "exception_type": full_type_name(type(ex)),
+                "traceback": traceback.format_tb(ex.__traceback__),
+                "current_inputs": {}
+            }
+            return error_details, ex
+        return None, None
+
     def execute(self, prompt, prompt_id, extra_data={}, execute_outputs=[]):
         asyncio.run(self.execute_async(prompt, prompt_id, extra_data, execute_outputs))
 
@@ -705,6 +725,8 @@ class PromptExecutor:
                 node_id, error, ex = await execution_list.stage_node_execution()
                 if error is not None:
                     self.handle_execution_error(prompt_id, dynamic_prompt.original_prompt, current_outputs, executed, error, ex)
+                    # don't leave the failed saves of this prompt to the next one
+                    self.wait_image_saves(dynamic_prompt)
                     break
 
                 assert node_id is not None, "Node ID should not be None at this point"
@@ -712,6 +734,7 @@ class PromptExecutor:
                 self.success = result != ExecutionResult.FAILURE
                 if result == ExecutionResult.FAILURE:
                     self.handle_execution_error(prompt_id, dynamic_prompt.original_prompt, current_outputs, executed, error, ex)
+                    self.wait_image_saves(dynamic_prompt)
                     break
                 elif result == ExecutionResult.PENDING:
                     execution_list.unstage_node_execution()
@@ -720,7 +743,13 @@ class PromptExecutor:
                 self.caches.outputs.poll(ram_headroom=self.cache_args["ram"])
             else:
                 # Only execute when the while-loop ends without break
-                self.add_message("execution_success", { "prompt_id": prompt_id }, broadcast=False)
+                # the outputs are on disk once the prompt is reported as done
+                error, ex = self.wait_image_saves(dynamic_prompt)
+                if error is not None:
+                    self.success = False
+                    self.handle_execution_error(prompt_id, dynamic_prompt.original_prompt, current_outputs, executed, error, ex)
+                else:
+                    self.add_message("execution_success", { "prompt_id": prompt_id }, broadcast=False)
 
             ui_outputs = {}
             meta_outputs = {}
@@ -2,12 +2,23 @@ import torch
 from PIL import Image
 from comfy.cli_args import args, LatentPreviewMethod
 from comfy.taesd.taesd import TAESD
+from comfy.taesd.taehv import TAEHV
 import comfy.model_management
 import folder_paths
 import comfy.utils
 import logging
+import threading
+import time
 
 MAX_PREVIEW_RESOLUTION = args.preview_size
+# previews that take longer than this get decoded from a downscaled latent
+PREVIEW_COST_TARGET = 0.1
+MIN_PREVIEW_SCALE = 0.25
+# animated previews of video latents, kept small and at most one every PREVIEW_VIDEO_INTERVAL seconds to bound the bandwidth
+PREVIEW_VIDEO_FRAMES = args.preview_video_frames
+PREVIEW_VIDEO_RESOLUTION = MAX_PREVIEW_RESOLUTION // 2
+PREVIEW_VIDEO_INTERVAL = 1.0
+PREVIEW_VIDEO_FRAME_DURATION = 125
 
 def preview_to_image(latent_image):
         latents_ubyte = (((latent_image + 1.0) / 2.0).clamp(0, 1)  # change scale from -1..1 to 0..1
@@ -19,66 +30,205 @@ def preview_to_image(latent_image):
 
         return Image.fromarray(latents_ubyte.numpy())
 
+def preview_to_frames(latent_images):
+    """[frames, H, W, 3] in -1..1 to a list of PIL images with the frame duration set for the animated encode."""
+    frames = [preview_to_image(x) for x in latent_images.to(device="cpu", dtype=torch.float32).unbind(0)]
+    frames[0].info["duration"] = PREVIEW_VIDEO_FRAME_DURATION
+    return frames
+
+def preview_frame_indexes(frames, max_frames):
+    if frames <= max_frames:
+        return list(range(frames))
+    if max_frames <= 1:
+        return [0]
+    return [round(i * (frames - 1) / (max_frames - 1)) for i in range(max_frames)]
+
 class LatentPreviewer:
+    supports_video = False
+
     def decode_latent_to_preview(self, x0):
         pass
 
+    def decode_latent_to_preview_frames(self, x0):
+        pass
+
     def decode_latent_to_preview_image(self, preview_format, x0):
+        if x0.ndim == 5 and x0.shape[2] > 1 and PREVIEW_VIDEO_FRAMES > 1 and self.supports_video:
+            return ("WEBP", self.decode_latent_to_preview_frames(x0), PREVIEW_VIDEO_RESOLUTION)
         preview_image = self.decode_latent_to_preview(x0)
         return ("JPEG", preview_image, MAX_PREVIEW_RESOLUTION)
 
 class TAESDPreviewerImpl(LatentPreviewer):
     def __init__(self, taesd):
         self.taesd = taesd
+        self.supports_video = isinstance(taesd, TAEHV)
 
     def decode_latent_to_preview(self, x0):
-        x_sample = self.taesd.decode(x0[:1])[0].movedim(0, 2)
+        if x0.ndim == 5:
+            x_sample = self.taesd.decode(x0[:1, :, :1])[0, :, 0].movedim(0, 2)
+        else:
+            x_sample = self.taesd.decode(x0[:1])[0].movedim(0, 2)
         return preview_to_image(x_sample)
 
+    def decode_latent_to_preview_frames(self, x0):
+        x_sample = self.taesd.decode(x0[:1])[0].movedim(0, -1)
+        return preview_to_frames(x_sample[preview_frame_indexes(x_sample.shape[0], PREVIEW_VIDEO_FRAMES)])
+
 
 class Latent2RGBPreviewer(LatentPreviewer):
+    supports_video = True
+
     def __init__(self, latent_rgb_factors, latent_rgb_factors_bias=None):
         self.latent_rgb_factors = torch.tensor(latent_rgb_factors, device="cpu").transpose(0, 1)
         self.latent_rgb_factors_bias = None
         if latent_rgb_factors_bias is not None:
             self.latent_rgb_factors_bias = torch.tensor(latent_rgb_factors_bias, device="cpu")
 
-    def decode_latent_to_preview(self, x0):
+    def latent_to_rgb(self, x0):
         self.latent_rgb_factors = self.latent_rgb_factors.to(dtype=x0.dtype, device=x0.device)
         if self.latent_rgb_factors_bias is not None:
             self.latent_rgb_factors_bias = self.latent_rgb_factors_bias.to(dtype=x0.dtype, device=x0.device)
+        return torch.nn.functional.linear(x0.movedim(0, -1), self.latent_rgb_factors, bias=self.latent_rgb_factors_bias)
 
+    def decode_latent_to_preview(self, x0):
         if x0.ndim == 5:
             x0 = x0[0, :, 0]
         else:
             x0 = x0[0]
 
-        latent_image = torch.nn.functional.linear(x0.movedim(0, -1), self.latent_rgb_factors, bias=self.latent_rgb_factors_bias)
+        latent_image = self.latent_to_rgb(x0)
         # latent_image = x0[0].permute(1, 2, 0) @ self.latent_rgb_factors
 
         return preview_to_image(latent_image)
 
+    def decode_latent_to_preview_frames(self, x0):
+        x0 = x0[0, :, preview_frame_indexes(x0.shape[2], PREVIEW_VIDEO_FRAMES)]
+        return preview_to_frames(self.latent_to_rgb(x0))
+
+
+def downscale_latent(x0, scale):
+    size = [max(1, round(x * scale)) for x in x0.shape[-2:]]
+    out = torch.nn.functional.interpolate(x0.reshape((x0.shape[0], -1) + tuple(x0.shape[-2:])), size=size, mode="area")
+    return out.reshape(tuple(x0.shape[:-2]) + tuple(size))
+
+
+class PreviewWorker:
+    """
+    Decodes the previews in a background thread so the sampling loop never waits on a preview decode or its copy to the cpu.
+
+    Only the newest latent waits to be decoded: when the worker can't keep up the older ones get dropped. After every preview
+    the worker idles for as long as the preview took so the previews use at most half of the time, and previews slower than
+    PREVIEW_COST_TARGET get decoded from a smaller latent.
+    """
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.pending = None
+        self.result = None
+        # owner of the latent being decoded
+        self.decoding = None
+        self.flushing = False
+        self.thread = None
+        self.scale = 1.0
+
+    def submit(self, owner, previewer, preview_format, x0):
+        with self.cond:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True, name="latent_preview")
+                self.thread.start()
+            self.pending = (owner, previewer, preview_format, x0)
+            self.cond.notify_all()
+
+    def take_result(self, owner):
+        with self.cond:
+            if self.result is None or self.result[0] is not owner:
+                return None
+            preview = self.result[1]
+            self.result = None
+            return preview
+
+    def finish(self, owner):
+        """Waits for the last latent submitted by owner to be decoded and returns its preview, None if there is none."""
+        with self.cond:
+            self.flushing = True
+            self.cond.notify_all()
+            self.cond.wait_for(lambda: (self.pending is None or self.pending[0] is not owner) and self.decoding is not owner)
+            self.flushing = False
+        return self.take_result(owner)
+
+    def decode(self, previewer, preview_format, x0):
+        if self.scale < 1.0:
+            x0 = downscale_latent(x0, self.scale)
+        start = time.perf_counter()
+        with torch.inference_mode():
+            preview = previewer.decode_latent_to_preview_image(preview_format, x0)
+        cost = time.perf_counter() - start
+
+        if cost > PREVIEW_COST_TARGET and self.scale > MIN_PREVIEW_SCALE:
+            self.scale /= 2
+        elif cost < PREVIEW_COST_TARGET / 4 and self.scale < 1.0:
+            self.scale *= 2
+        return preview, cost
+
+    def run(self):
+        while True:
+            with self.cond:
+                while self.pending is None:
+                    self.cond.wait()
+                owner, previewer, preview_format, x0 = self.pending
+                self.pending = None
+                self.decoding = owner
+
+            preview = None
+            cost = 0
+            try:
+                preview, cost = self.decode(previewer, preview_format, x0)
+            except Exception as e:
+                logging.warning("Latent preview failed: {}".format(e))
+            del x0
+
+            with self.cond:
+                self.decoding = None
+                if preview is not None:
+                    self.result = (owner, preview)
+                    if isinstance(preview[1], list):
+                        cost = max(cost, PREVIEW_VIDEO_INTERVAL)
+                self.cond.notify_all()
+                # idle unless the end of a sampling run waits for its last preview
+                self.cond.wait_for(lambda: self.flushing, timeout=cost)
+
+PREVIEW_WORKER = PreviewWorker()
+
+
+def get_taesd_decoder_path(latent_format):
+    """Path of the tiny decoder for latent_format in models/vae_approx, None if there is none."""
+    if latent_format.taesd_decoder_name is None:
+        return None
+    taesd_decoder_path = next(
+        (fn for fn in folder_paths.get_filename_list("vae_approx")
+            if fn.startswith(latent_format.taesd_decoder_name)),
+        ""
+    )
+    return folder_paths.get_full_path("vae_approx", taesd_decoder_path)
+
+def load_taesd_decoder(latent_format, device):
+    taesd_decoder_path = get_taesd_decoder_path(latent_format)
+    if not taesd_decoder_path:
+        return None
+    if latent_format.latent_dimensions == 3:
+        return TAEHV(taesd_decoder_path).to(device)
+    return TAESD(None, taesd_decoder_path, latent_channels=latent_format.latent_channels).to(device)
 
 def get_previewer(device, latent_format):
     previewer = None
     method = args.preview_method
     if method != LatentPreviewMethod.NoPreviews:
         # TODO previewer methods
-        taesd_decoder_path = None
-        if latent_format.taesd_decoder_name is not None:
-            taesd_decoder_path = next(
-                (fn for fn in folder_paths.get_filename_list("vae_approx")
-                    if fn.startswith(latent_format.taesd_decoder_name)),
-                ""
-            )
-            taesd_decoder_path = folder_paths.get_full_path("vae_approx", taesd_decoder_path)
-
         if method == LatentPreviewMethod.Auto:
             method = LatentPreviewMethod.Latent2RGB
 
         if method == LatentPreviewMethod.TAESD:
-            if taesd_decoder_path:
-                taesd = TAESD(None, taesd_decoder_path, latent_channels=latent_format.latent_channels).to(device)
+            taesd = load_taesd_decoder(latent_format, device)
+            if taesd is not None:
                 previewer = TAESDPreviewerImpl(taesd)
             else:
                 logging.warning("Warning: TAESD previews enabled, but could not find models/vae_approx/{}".format(latent_format.taesd_decoder_name))
@@ -102,7 +252,12 @@ def prepare_callback(model, steps, x0_output_dict=None):
 
         preview_bytes = None
         if previewer:
-            preview_bytes = previewer.decode_latent_to_preview_image(preview_format, x0)
+            # the preview of an earlier step that finished decoding in the meantime, if any
+            preview_bytes = PREVIEW_WORKER.take_result(callback)
+            PREVIEW_WORKER.submit(callback, previewer, preview_format, x0[:1].detach().clone())
+            if step + 1 == total_steps:
+                # nothing would deliver the preview of the last step otherwise
+                preview_bytes = PREVIEW_WORKER.finish(callback) or preview_bytes
         pbar.update_absolute(step + 1, total_steps, preview_bytes)
     return callback
 
@@ -27,7 +27,9 @@ import comfy.sample
 import comfy.sd
 import comfy.utils
 import comfy.controlnet
+import comfy.image_saver
 from comfy.comfy_types import IO, ComfyNodeABC, InputTypeDict, FileLocator
+from comfy_execution.utils import get_executing_context
 from comfy_api.internal import register_versions, ComfyAPIWithVersion
 from comfy_api.version_list import supported_versions
 from comfy_api.latest import io, ComfyExtension
@@ -303,7 +305,7 @@ class VAEDecodeTiled:
         return {"required": {"samples": ("LATENT", ), "vae": ("VAE", ),
                              "tile_size": ("INT", {"default": 512, "min": 64, "max": 4096, "step": 32}),
                              "overlap": ("INT", {"default": 64, "min": 0, "max": 4096, "step": 32}),
-                             "temporal_size": ("INT", {"default": 64, "min": 8, "max": 4096, "step": 4, "tooltip": "Only used for video VAEs: Amount of frames to decode at a time."}),
+                             "temporal_size": ("INT", {"default": 64, "min": 8, "max": 4096, "step": 4, "tooltip": "Only used for video VAEs: Amount of frames to decode at a time. Ignored by causal video VAEs like Wan that already decode the frames in chunks."}),
                              "temporal_overlap": ("INT", {"default": 8, "min": 4, "max": 4096, "step": 4, "tooltip": "Only used for video VAEs: Amount of frames to overlap."}),
                             }}
     RETURN_TYPES = ("IMAGE",)
@@ -785,6 +787,32 @@ class VAELoader:
         vae.throw_exception_if_invalid()
         return (vae,)
 
+class DraftVAELoader:
+    @classmethod
+    def INPUT_TYPES(s):
+        return {"required": { "model": ("MODEL", {"tooltip": "The model that samples the latents to decode."})}}
+    RETURN_TYPES = ("VAE",)
+    OUTPUT_TOOLTIPS = ("A VAE that can only decode.",)
+    FUNCTION = "load_vae"
+
+    CATEGORY = "loaders"
+    DESCRIPTION = "Loads the tiny autoencoder (TAESD, or TAEHV for video models) from models/vae_approx that the previews of the model use as a VAE that only decodes. It is a lot faster than the full VAE but less detailed, use it in place of the full VAE to iterate on drafts."
+
+    def load_vae(self, model):
+        latent_format = model.model.latent_format
+        decoder_path = latent_preview.get_taesd_decoder_path(latent_format)
+        if not decoder_path:
+            if latent_format.taesd_decoder_name is None:
+                raise RuntimeError("ERROR: there is no tiny autoencoder for the latents of this model.")
+            raise RuntimeError("ERROR: could not find models/vae_approx/{}".format(latent_format.taesd_decoder_name))
+
+        sd = comfy.utils.load_torch_file(decoder_path)
+        if latent_format.latent_dimensions != 3:
+            sd = {"taesd_decoder.{}".format(k): v for k, v in sd.items()}
+        vae = comfy.sd.VAE(sd=sd, latent_format=latent_format)
+        vae.throw_exception_if_invalid()
+        return (vae,)
+
 class ControlNetLoader:
     @classmethod
     def INPUT_TYPES(s):
@@ -1589,21 +1617,23 @@ class SaveImage:
         filename_prefix += self.prefix_append
         full_output_folder, filename, counter, subfolder, filename_prefix = folder_paths.get_save_image_path(filename_prefix, self.output_dir, images[0].shape[1], images[0].shape[0])
         results = list()
-        for (batch_number, image) in enumerate(images):
-            i = 255. * image.cpu().numpy()
-            img = Image.fromarray(np.clip(i, 0, 255).astype(np.uint8))
-            metadata = None
-            if not args.disable_metadata:
-                metadata = PngInfo()
-                if prompt is not None:
-                    metadata.add_text("prompt", json.dumps(prompt))
-                if extra_pnginfo is not None:
-                    for x in extra_pnginfo:
-                        metadata.add_text(x, json.dumps(extra_pnginfo[x]))
+        metadata = None
+        if not args.disable_metadata:
+            metadata = PngInfo()
+            if prompt is not None:
+                metadata.add_text("prompt", json.dumps(prompt))
+            if extra_pnginfo is not None:
+                for x in extra_pnginfo:
+                    metadata.add_text(x, json.dumps(extra_pnginfo[x]))
 
+        compress_level = comfy.image_saver.png_compress_level(images, self.compress_level)
+        executing_context = get_executing_context()
+        node_id = executing_context.node_id if executing_context is not None else None
+        # encoded in parallel in the background, the images are written while the next nodes run
+        for (batch_number, image) in enumerate(comfy.utils.images_to_uint8(images)):
             filename_with_batch_num = filename.replace("%batch_num%", str(batch_number))
             file = f"{filename_with_batch_num}_{counter:05}_.png"
-            img.save(os.path.join(full_output_folder, file), pnginfo=metadata, compress_level=self.compress_level)
+            comfy.image_saver.IMAGE_SAVER.save_png(image, os.path.join(full_output_folder, file), pnginfo=metadata, compress_level=compress_level, node_id=node_id)
             results.append({
                 "filename": file,
                 "subfolder": subfolder,
@@ -1957,6 +1987,7 @@ NODE_CLASS_MAPPINGS = {
     "VAEEncode": VAEEncode,
     "VAEEncodeForInpaint": VAEEncodeForInpaint,
     "VAELoader": VAELoader,
+    "DraftVAELoader": DraftVAELoader,
     "EmptyLatentImage": EmptyLatentImage,
     "LatentUpscale": LatentUpscale,
     "LatentUpscaleBy": LatentUpscaleBy,
@@ -2026,6 +2057,7 @@ NODE_DISPLAY_NAME_MAPPINGS = {
     "CheckpointLoader": "Load Checkpoint With Config (DEPRECATED)",
     "CheckpointLoaderSimple": "Load Checkpoint",
     "VAELoader": "Load VAE",
+    "DraftVAELoader": "Load Draft VAE",
     "LoraLoader": "Load LoRA",
     "CLIPLoader": "Load CLIP",
     "ControlNetLoader": "Load ControlNet Model",
@@ -2333,6 +2365,11 @@ async def init_builtin_extra_nodes():
         "nodes_chroma_radiance.py",
         "nodes_model_patch.py",
         "nodes_easycache.py",
+        "nodes_convergence.py",
+        "nodes_attention_autotune.py",
+        "nodes_cross_attention_cache.py",
+        "nodes_token_chunking.py",
+        "nodes_model_quantization.py",
         "nodes_audio_encoder.py",
         "nodes_rope.py",
         "nodes_nop.py",
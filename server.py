@@ -27,6 +27,7 @@ import mimetypes
 from comfy.cli_args import args
 import comfy.utils
 import comfy.model_management
+import comfy.image_saver
 from comfy_api import feature_flags
 import node_helpers
 from comfyui_version import __version__
@@ -486,6 +487,11 @@ class PromptServer():
                 filename = os.path.basename(filename)
                 file = os.path.join(output_dir, filename)
 
+                pending = comfy.image_saver.IMAGE_SAVER.pending(file)
+                if pending is not None:
+                    # the save nodes write their images in the background
+                    await asyncio.wait([asyncio.wrap_future(pending)])
+
                 if os.path.isfile(file):
                     if 'preview' in request.rel_url.query:
                         with Image.open(file) as img:
@@ -937,6 +943,10 @@ class PromptServer():
         image_type = image_data[0]
         image = image_data[1]
         max_size = image_data[2]
+        if isinstance(image, list):
+            # animated previews are only sent to clients that support the preview metadata, the others get the first frame
+            image_type = "JPEG"
+            image = image[0]
         if max_size is not None:
             if hasattr(Image, 'Resampling'):
                 resampling = Image.Resampling.BILINEAR
@@ -961,15 +971,20 @@ class PromptServer():
         image_type = image_data[0]
         image = image_data[1]
         max_size = image_data[2]
+        frames = image if isinstance(image, list) else [image]
         if max_size is not None:
             if hasattr(Image, 'Resampling'):
                 resampling = Image.Resampling.BILINEAR
             else:
                 resampling = Image.Resampling.LANCZOS
 
-            image = ImageOps.contain(image, (max_size, max_size), resampling)
+            frames = [ImageOps.contain(frame, (max_size, max_size), resampling) for frame in frames]
 
-        mimetype = "image/png" if image_type == "PNG" else "image/jpeg"
+        if isinstance(image, list):
+            mimetype = "image/webp"
+        else:
+            image = frames[0]
+            mimetype = "image/png" if image_type == "PNG" else "image/jpeg"
 
         # Prepare metadata
         if metadata is None:
@@ -983,7 +998,11 @@ class PromptServer():
 
         # Prepare image data
         bytesIO = BytesIO()
-        image.save(bytesIO, format=image_type, quality=95, compress_level=1)
+        if isinstance(image, list):
+            frames[0].save(bytesIO, format="WEBP", save_all=True, append_images=frames[1:], quality=70, method=0,
+                           duration=image[0].info.get("duration", 100), loop=0)
+        else:
+            image.save(bytesIO, format=image_type, quality=95, compress_level=1)
         image_bytes = bytesIO.getvalue()
 
         # Combine metadata and image
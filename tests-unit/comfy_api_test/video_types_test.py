@@ -5,7 +5,8 @@ import os
 import av
 import io
 from fractions import Fraction
-from comfy_api.input_impl.video_types import VideoFromFile, VideoFromComponents
+from comfy_api.input_impl.video_types import VideoFromFile, VideoFromComponents, VideoFromFrameGenerator
+from comfy_api.latest._input_impl.video_types import rgb_to_yuv420p, DecodedFramesCache
 from comfy_api.util.video_types import VideoComponents
 from comfy_api.input.basic_types import AudioInput
 from av.error import InvalidDataError
@@ -237,3 +238,108 @@ def test_duration_consistency(video_components):
     manual_duration = float(components.images.shape[0] / components.frame_rate)
 
     assert duration == pytest.approx(manual_duration)
+
+
+def test_video_from_frame_generator_save_to():
+    """Frames produced in chunks are all encoded and the generator runs again for every use"""
+    calls = []
+
+    def frame_generator():
+        calls.append(1)
+        for i in range(3):
+            yield torch.full((2, 8, 8, 3), i / 2.0)
+
+    video = VideoFromFrameGenerator(frame_generator, width=8, height=8, frame_count=6, frame_rate=Fraction(24))
+    assert video.get_dimensions() == (8, 8)
+    assert video.get_duration() == pytest.approx(6 / 24)
+    assert len(calls) == 0
+
+    with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as tmp:
+        tmp_name = tmp.name
+    try:
+        video.save_to(tmp_name)
+        saved = VideoFromFile(tmp_name)
+        assert saved.get_frame_count() == 6
+        assert saved.get_dimensions() == (8, 8)
+    finally:
+        os.unlink(tmp_name)
+
+    components = video.get_components()
+    assert components.images.shape == (6, 8, 8, 3)
+    assert len(calls) == 2
+
+
+def test_rgb_to_yuv420p_matches_swscale():
+    """The batched yuv conversion gives the same planes as converting every frame with av"""
+    # solid colors, swscale filters the chroma differently than a 2x2 average at the edges between colors
+    images = torch.rand(4, 1, 1, 3).expand(4, 6, 8, 3)
+    planes = rgb_to_yuv420p(images)
+    assert planes.shape == (4, 9, 8)
+
+    for image, yuv in zip((images * 255).byte().numpy(), planes):
+        reference = av.VideoFrame.from_ndarray(image, format="rgb24").reformat(format="yuv420p").to_ndarray()
+        assert abs(reference.astype(int) - yuv.astype(int)).max() <= 3
+
+
+def test_video_from_components_threads(video_components):
+    """Saving with an explicit encoder thread count"""
+    with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as tmp:
+        tmp_name = tmp.name
+    try:
+        video = VideoFromComponents(
+            VideoComponents(images=torch.rand(20, 4, 4, 3), frame_rate=Fraction(24))
+        )
+        video.save_to(tmp_name, threads=2)
+        assert VideoFromFile(tmp_name).get_frame_count() == 20
+    finally:
+        os.unlink(tmp_name)
+
+
+def test_video_from_file_frame_selection():
+    """Frame ranges and strides decode only the selected frames"""
+    tmp = tempfile.NamedTemporaryFile(suffix=".mp4", delete=False)
+    tmp.close()
+    try:
+        with av.open(tmp.name, mode="w") as container:
+            stream = container.add_stream("h264", rate=10)
+            stream.width = 16
+            stream.height = 16
+            stream.pix_fmt = "yuv420p"
+            for i in range(20):
+                frame = av.VideoFrame.from_ndarray(torch.full((16, 16, 3), i * 12, dtype=torch.uint8).numpy(), format="rgb24")
+                container.mux(stream.encode(frame.reformat(format="yuv420p")))
+            container.mux(stream.encode(None))
+
+        video = VideoFromFile(tmp.name)
+        full = video.get_components().images
+        assert full.shape[0] == 20
+
+        components = video.get_components(start_frame=5, frame_count=4, stride=3)
+        assert components.images.shape == (4, 16, 16, 3)
+        assert components.frame_rate == Fraction(10, 3)
+        assert torch.allclose(components.images, full[5:17:3], atol=EPSILON)
+
+        chunks = list(video.decode_frames(start_frame=12))
+        assert torch.allclose(torch.cat(chunks), full[12:], atol=EPSILON)
+    finally:
+        os.unlink(tmp.name)
+
+
+def test_decoded_frames_cache_bounded():
+    """The cache evicts the least recently used selections of all the videos together"""
+    cache = DecodedFramesCache(max_bytes=300)
+    owners = [object(), object()]
+    chunk = torch.zeros(100, dtype=torch.uint8)
+    cache.put((owners[0], 0, 1, 1), [chunk])
+    cache.put((owners[1], 0, 1, 1), [chunk])
+    cache.put((owners[0], 1, 1, 1), [chunk])
+    assert cache.get((owners[0], 0, 1, 1)) is not None
+    cache.put((owners[1], 1, 1, 1), [chunk])
+    assert cache.size == 300
+    assert cache.get((owners[1], 0, 1, 1)) is None
+    # larger than the whole cache
+    cache.put((owners[1], 2, 1, 1), [torch.zeros(400, dtype=torch.uint8)])
+    assert cache.get((owners[1], 2, 1, 1)) is None
+    cache.drop(owners[0])
+    assert list(cache.entries) == [(owners[1], 1, 1, 1)]
+    assert cache.size == 100
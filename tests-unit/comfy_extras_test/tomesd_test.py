@@ -0,0 +1,83 @@
+import torch
+
+from comfy_extras.nodes_tomesd import bipartite_soft_matching_random3d, do_nothing, tome_dit_block_patch
+
+
+class TestBipartiteSoftMatching3d:
+
+    def test_merge_unmerge_shapes(self):
+        """Test that r tokens get removed and unmerge restores the sequence length"""
+        x = torch.randn(2, 4 * 6 * 8, 16)
+        merge, unmerge, gather_positions = bipartite_soft_matching_random3d(x, 4, 6, 8, 2, 2, 2, r=50)
+
+        merged = merge(x)
+        assert merged.shape == (2, 4 * 6 * 8 - 50, 16)
+        assert unmerge(merged).shape == x.shape
+        assert gather_positions(x).shape == merged.shape
+
+    def test_duplicate_tokens_roundtrip(self):
+        """Test that merging identical tokens is lossless"""
+        frame = torch.randn(1, 1, 6 * 8, 16)
+        x = frame.expand(1, 4, 6 * 8, 16).reshape(1, 4 * 6 * 8, 16)
+        # every other frame is a duplicate, half of the tokens can be merged without loss
+        merge, unmerge, _ = bipartite_soft_matching_random3d(x, 4, 6, 8, 2, 1, 1, r=4 * 6 * 8 // 2)
+
+        assert torch.allclose(unmerge(merge(x)), x, atol=1e-5)
+
+    def test_gather_positions(self):
+        """Test that gather picks the original position of every merged token"""
+        x = torch.randn(1, 2 * 4 * 4, 8)
+        merge, _, gather_positions = bipartite_soft_matching_random3d(x, 2, 4, 4, 2, 2, 2, r=8)
+
+        positions = torch.arange(x.shape[1], dtype=torch.float32).view(1, -1, 1)
+        picked = gather_positions(positions).flatten().long()
+        assert picked.shape[0] == x.shape[1] - 8
+        assert len(set(picked.tolist())) == picked.shape[0]
+        # the kept tokens are unchanged by the merge
+        kept = merge(x)[:, :x.shape[1] - 8 - 4]
+        assert torch.equal(kept, x[:, picked[:kept.shape[1]]])
+
+    def test_single_frame(self):
+        """Test that single images only merge spatially and nothing happens without enough tokens"""
+        x = torch.randn(1, 8 * 8, 16)
+        merge, _, _ = bipartite_soft_matching_random3d(x, 1, 8, 8, 2, 2, 2, r=10)
+        assert merge(x).shape == (1, 8 * 8 - 10, 16)
+
+        merge, unmerge, gather_positions = bipartite_soft_matching_random3d(x, 1, 8, 8, 1, 1, 1, r=10)
+        assert merge is do_nothing
+
+
+class TestDiTBlockPatch:
+
+    def test_per_frame_modulation(self):
+        """Test that per frame modulation (Wan 2.2 TI2V) gets spread over the tokens and merged with them"""
+        t, h, w = 4, 6, 8
+        x = torch.randn(1, t * h * w, 16)
+        vec = torch.randn(1, t, 6, 16)
+        sigmas = torch.tensor([1.0])
+        calls = []
+
+        class CountedSigmas(torch.Tensor):
+            def item(self):
+                calls.append(1)
+                return super().item()
+
+        transformer_options = {"token_grid": {"grid_sizes": (t, h, w), "offsets": {"double_block": 0}}, "sigmas": sigmas.as_subclass(CountedSigmas)}
+        seen = []
+
+        def original_block(args):
+            seen.append(args)
+            return {"img": args["img"]}
+
+        patch = tome_dit_block_patch("double_block", 3, 0.25, (2, 2, 2), 2.0, 0.0)
+        for _ in range(2):
+            out = patch({"img": x, "vec": vec, "transformer_options": transformer_options}, {"original_block": original_block})
+            assert out["img"].shape == x.shape
+
+        merge, _, _ = bipartite_soft_matching_random3d(x, t, h, w, 2, 2, 2, int(t * h * w * 0.25), seed=3)
+        expected = merge(vec.repeat_interleave(h * w, dim=1).flatten(2)).reshape(1, -1, 6, 16)
+        assert seen[0]["vec"].shape == (1, seen[0]["img"].shape[1], 6, 16)
+        assert torch.allclose(seen[0]["vec"], expected)
+        # the sigma is only read from the device once per model call
+        assert len(calls) == 1
+
@@ -0,0 +1,197 @@
+import unittest
+import torch
+import sys
+import os
+
+# Add comfy to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+def has_gpu():
+    return torch.cuda.is_available()
+
+from comfy.cli_args import args
+if not has_gpu():
+    args.cpu = True
+
+from comfy import ops
+import comfy.model_patcher
+import comfy.weight_adapter
+from comfy.quant_ops import QuantizedTensor, ChannelwiseInt8Layout, ChannelwiseFP8Layout, Int4GroupwiseLayout
+
+
+class TestChannelwiseLayouts(unittest.TestCase):
+    """Test the per channel weight only layouts"""
+
+    def test_int8_roundtrip(self):
+        weight = torch.randn(64, 128, dtype=torch.float32) * torch.linspace(0.01, 10.0, 64).unsqueeze(1)
+        qt = QuantizedTensor.from_float(weight, "ChannelwiseInt8Layout")
+
+        self.assertEqual(qt._qdata.dtype, torch.int8)
+        self.assertEqual(qt._layout_params['scale'].shape, (64, 1))
+        # per channel scales keep the small channels precise
+        rel_error = ((qt.dequantize() - weight).abs().amax(dim=1) / weight.abs().amax(dim=1))
+        self.assertLess(rel_error.max().item(), 1.0 / 127)
+
+    def test_fp8_roundtrip(self):
+        weight = torch.randn(32, 64, dtype=torch.float32)
+        qt = QuantizedTensor.from_float(weight, "ChannelwiseFP8Layout")
+
+        self.assertEqual(qt._qdata.dtype, torch.float8_e4m3fn)
+        mean_rel_error = ((qt.dequantize() - weight).abs() / (weight.abs() + 1e-6)).mean()
+        self.assertLess(mean_rel_error, 0.1)
+
+    def test_mse_calibration(self):
+        weight = torch.randn(16, 256, dtype=torch.float32)
+        weight[:, 0] = 50.0
+        for layout in (ChannelwiseInt8Layout, ChannelwiseFP8Layout):
+            qdata, params = layout.quantize(weight, calibration="absmax")
+            error_absmax = (layout.dequantize(qdata, **params) - weight).square().sum()
+            qdata, params = layout.quantize(weight, calibration="mse")
+            error_mse = (layout.dequantize(qdata, **params) - weight).square().sum()
+            self.assertLessEqual(error_mse.item(), error_absmax.item())
+
+    def test_linear(self):
+        weight = torch.randn(20, 10, dtype=torch.float32)
+        bias = torch.randn(20, dtype=torch.float32)
+        x = torch.randn(5, 10, dtype=torch.float32)
+        qt = QuantizedTensor.from_float(weight, "ChannelwiseInt8Layout")
+
+        out = torch.nn.functional.linear(x, qt, bias)
+        ref = torch.nn.functional.linear(x, qt.dequantize(), bias)
+        self.assertNotIsInstance(out, QuantizedTensor)
+        self.assertTrue(torch.allclose(out, ref, atol=1e-5))
+
+
+class TestBlockLayouts(unittest.TestCase):
+    """Test the block scaled fp8 and int4 groupwise layouts"""
+
+    def test_blockwise_fp8(self):
+        # not a multiple of the block size on purpose
+        weight = torch.randn(200, 300, dtype=torch.float32)
+        weight[:10, :10] *= 1000.0
+        qt = QuantizedTensor.from_float(weight, "BlockwiseFP8Layout", block_size=128)
+
+        self.assertEqual(qt._qdata.shape, (200, 300))
+        self.assertEqual(qt._layout_params['scale'].shape, (2, 3))
+        dequantized = qt.dequantize()
+        # the outlier block doesn't ruin the precision of the other blocks
+        mean_rel_error = ((dequantized - weight).abs() / (weight.abs() + 1e-6))[128:, 128:].mean()
+        self.assertLess(mean_rel_error, 0.1)
+
+    def test_int4_pack(self):
+        q = torch.randint(0, 16, (8, 64), dtype=torch.uint8)
+        packed = Int4GroupwiseLayout.pack(q)
+        self.assertEqual(packed.shape, (8, 32))
+        self.assertTrue(torch.equal(Int4GroupwiseLayout.unpack(packed), q))
+
+    def test_int4_groupwise(self):
+        weight = torch.randn(16, 256, dtype=torch.float32)
+        qt = QuantizedTensor.from_float(weight, "Int4GroupwiseLayout", block_size=64)
+
+        self.assertEqual(qt._qdata.dtype, torch.uint8)
+        self.assertEqual(qt._qdata.shape, (16, 128))
+        self.assertEqual(qt._layout_params['scale'].shape, (16, 4))
+        dequantized = qt.dequantize()
+        self.assertEqual(dequantized.shape, (16, 256))
+        # at most half a step of error per group
+        max_error = (dequantized - weight).abs().reshape(16, 4, 64).amax(dim=-1)
+        self.assertTrue(torch.all(max_error <= qt._layout_params['scale'] * 0.5 + 1e-5))
+
+        x = torch.randn(3, 256, dtype=torch.float32)
+        out = torch.nn.functional.linear(x, qt)
+        self.assertTrue(torch.allclose(out, torch.nn.functional.linear(x, dequantized), atol=1e-4))
+
+    def test_int4_unsupported_shape(self):
+        with self.assertRaises(ValueError):
+            QuantizedTensor.from_float(torch.randn(16, 100), "Int4GroupwiseLayout", block_size=64)
+
+
+class SimpleModel(torch.nn.Module):
+    def __init__(self, operations):
+        super().__init__()
+        self.layer1 = operations.Linear(256, 512, device="cpu", dtype=torch.float32)
+        self.layer2 = operations.Linear(512, 16, device="cpu", dtype=torch.float32)
+
+    def forward(self, x):
+        return self.layer2(torch.nn.functional.relu(self.layer1(x)))
+
+
+class TestQuantizeOnLoad(unittest.TestCase):
+
+    def test_quantize_on_load(self):
+        state_dict = {
+            "layer1.weight": torch.randn(512, 256, dtype=torch.float32),
+            "layer1.bias": torch.randn(512, dtype=torch.float32),
+            "layer2.weight": torch.randn(16, 512, dtype=torch.float32),
+            "layer2.bias": torch.randn(16, dtype=torch.float32),
+        }
+        reference = SimpleModel(ops.disable_weight_init)
+        reference.load_state_dict(state_dict)
+
+        layer_quant_config = {}
+        model = SimpleModel(ops.mixed_precision_ops(layer_quant_config, compute_dtype=torch.float32, quantize_on_load={"format": "int8_channelwise"}))
+        model.load_state_dict(state_dict, strict=False)
+
+        # layer2 is too small to be quantized
+        self.assertIsInstance(model.layer1.weight, QuantizedTensor)
+        self.assertEqual(model.layer1.weight._layout_type, "ChannelwiseInt8Layout")
+        self.assertNotIsInstance(model.layer2.weight, QuantizedTensor)
+        self.assertEqual(layer_quant_config, {"layer1": {"format": "int8_channelwise"}})
+
+        x = torch.randn(4, 256, dtype=torch.float32)
+        out = model(x)
+        ref = reference(x)
+        self.assertLess(((out - ref).abs().mean() / ref.abs().mean()).item(), 0.02)
+
+    def test_load_int4_checkpoint(self):
+        weight = torch.randn(512, 256, dtype=torch.float32)
+        qdata, params = Int4GroupwiseLayout.quantize(weight, block_size=128)
+        state_dict = {
+            "layer1.weight": qdata,
+            "layer1.weight_scale": params['scale'],
+            "layer1.weight_zero_point": params['zero_point'],
+            "layer1.bias": torch.zeros(512, dtype=torch.float32),
+            "layer2.weight": torch.randn(16, 512, dtype=torch.float32),
+            "layer2.bias": torch.randn(16, dtype=torch.float32),
+        }
+        model = SimpleModel(ops.mixed_precision_ops({"layer1": {"format": "int4_groupwise"}}, compute_dtype=torch.float32))
+        model.load_state_dict(state_dict, strict=False)
+
+        self.assertIsInstance(model.layer1.weight, QuantizedTensor)
+        self.assertTrue(torch.equal(model.layer1.weight._layout_params['zero_point'], params['zero_point']))
+        self.assertEqual(model(torch.randn(2, 256, dtype=torch.float32)).shape, (2, 16))
+
+    def test_lora_on_int4_layer(self):
+        weight = torch.randn(512, 256, dtype=torch.float32)
+        qdata, params = Int4GroupwiseLayout.quantize(weight, block_size=128)
+        state_dict = {
+            "layer1.weight": qdata,
+            "layer1.weight_scale": params['scale'],
+            "layer1.weight_zero_point": params['zero_point'],
+            "layer1.bias": torch.zeros(512, dtype=torch.float32),
+            "layer2.weight": torch.randn(16, 512, dtype=torch.float32),
+            "layer2.bias": torch.randn(16, dtype=torch.float32),
+        }
+        model = SimpleModel(ops.mixed_precision_ops({"layer1": {"format": "int4_groupwise"}}, compute_dtype=torch.float32))
+        model.load_state_dict(state_dict, strict=False)
+        original = model.layer1.weight.dequantize()
+
+        up = torch.randn(512, 4, dtype=torch.float32)
+        down = torch.randn(4, 256, dtype=torch.float32)
+        lora = comfy.weight_adapter.LoRAAdapter(set(), (up, down, None, None, None, None))
+        patcher = comfy.model_patcher.ModelPatcher(model, load_device=torch.device("cpu"), offload_device=torch.device("cpu"))
+        self.assertEqual(patcher.add_patches({"layer1.weight": lora}), ["layer1.weight"])
+        patcher.patch_weight_to_device("layer1.weight", device_to=torch.device("cpu"))
+
+        patched = model.layer1.weight
+        self.assertIsInstance(patched, QuantizedTensor)
+        self.assertEqual(patched._layout_type, "Int4GroupwiseLayout")
+        self.assertEqual(patched._qdata.shape, (512, 128))
+        expected = original + up @ down
+        # within the int4 quantization error of the patched weight
+        max_error = (patched.dequantize() - expected).abs().reshape(512, 2, 128).amax(dim=-1)
+        self.assertTrue(torch.all(max_error <= patched._layout_params['scale'] * 0.5 + 1e-4))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+
+from comfy.image_saver import ImageSaver, ImageSaveError, png_compress_level, temp_path
+from comfy.cli_args import args
+
+
+def test_save_png(tmp_path):
+    saver = ImageSaver(max_workers=2)
+    images = (np.random.rand(4, 16, 16, 3) * 255).astype(np.uint8)
+    paths = [str(tmp_path / f"image_{i}.png") for i in range(4)]
+    for image, path in zip(images, paths):
+        saver.save_png(image, path)
+        # the name is reserved right away
+        assert os.path.isfile(path) or os.path.isfile(temp_path(path))
+
+    saver.wait_all()
+    for image, path in zip(images, paths):
+        assert saver.pending(path) is None
+        assert not os.path.exists(temp_path(path))
+        with Image.open(path) as img:
+            assert np.array_equal(np.array(img), image)
+
+
+def test_failed_save_removes_file(tmp_path):
+    saver = ImageSaver(max_workers=1)
+    path = str(tmp_path / "broken.png")
+    # not an image
+    saver.save_png(np.zeros((2, 2, 7), dtype=np.float64), path, node_id="9")
+    with pytest.raises(ImageSaveError) as e:
+        saver.wait_all()
+    assert e.value.node_id == "9"
+    assert not os.path.exists(path)
+    assert not os.path.exists(temp_path(path))
+    # the error is only raised once
+    saver.wait_all()
+
+
+def test_png_compress_level(monkeypatch):
+    small = torch.zeros(1, 64, 64, 3)
+    large = torch.zeros(16, 1024, 1024, 3)
+    monkeypatch.setattr(args, "png_compression", "default")
+    assert png_compress_level(large, 4) == 4
+    monkeypatch.setattr(args, "png_compression", "fast")
+    assert png_compress_level(small, 4) == 1
+    # never compresses more than the node asked for
+    assert png_compress_level(small, 0) == 0
+    monkeypatch.setattr(args, "png_compression", "auto")
+    assert png_compress_level(small, 4) == 4
+    assert png_compress_level(large, 4) == 1
@@ -0,0 +1,37 @@
+from types import SimpleNamespace
+
+import torch
+
+from comfy.samplers import ProgressiveCFGGuider
+
+
+def make_guider(resolution_schedule):
+    guider = ProgressiveCFGGuider(SimpleNamespace(model_options={}))
+    guider.set_resolution_schedule(resolution_schedule)
+    return guider
+
+
+def test_get_stages():
+    sigmas = torch.linspace(10.0, 0.0, 11)
+    assert make_guider([(0.5, 5.0)]).get_stages(sigmas) == [(0.5, 0, 5), (1.0, 5, 10)]
+    # sorted by sigma, the lowest resolution comes first
+    assert make_guider([(0.5, 3.0), (0.25, 7.0)]).get_stages(sigmas) == [(0.25, 0, 3), (0.5, 3, 7), (1.0, 7, 10)]
+    # the full resolution stage always keeps at least one step
+    assert make_guider([(0.5, -1.0)]).get_stages(sigmas) == [(1.0, 0, 10)]
+    assert make_guider([]).get_stages(sigmas) == [(1.0, 0, 10)]
+
+
+def test_resize_noise():
+    guider = make_guider([(0.5, 5.0)])
+    noise = torch.randn(2, 4, 32, 48, generator=torch.Generator().manual_seed(0))
+    resized = guider.resize_noise(noise, 0.5)
+    assert resized.shape == (2, 4, 16, 24)
+    assert abs(resized.std().item() - noise.std().item()) < 1e-4
+    assert guider.resize_noise(noise, 1.0) is noise
+
+
+def test_resize_zero_noise():
+    # DisableNoise gives all zero noise
+    resized = make_guider([(0.5, 5.0)]).resize_noise(torch.zeros(1, 4, 32, 32), 0.5)
+    assert resized.shape == (1, 4, 16, 16)
+    assert torch.count_nonzero(resized) == 0
@@ -0,0 +1,30 @@
+import os
+
+from comfy.quant_cache import cache_path, cache_prefix, cleanup
+
+
+def write(path, size, mtime):
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    os.utime(path, (mtime, mtime))
+
+
+def test_cache_path(tmp_path):
+    source = tmp_path / "model.safetensors"
+    write(source, 16, 1000)
+    quantize = {"format": "int8_channelwise", "calibration": "absmax"}
+    path = cache_path(str(tmp_path / "cache"), str(source), quantize)
+    assert os.path.basename(path).startswith(cache_prefix(str(source), quantize))
+    assert path != cache_path(str(tmp_path / "cache"), str(source), {"format": "int8_channelwise", "calibration": "mse"})
+
+
+def test_cleanup(tmp_path):
+    write(tmp_path / "a_int8_00000000_old.safetensors", 100, 1000)
+    write(tmp_path / "a_int8_00000000_new.safetensors", 100, 5000)
+    write(tmp_path / "b_int8_11111111_x.safetensors", 100, 2000)
+    write(tmp_path / "c_int8_22222222_x.safetensors", 100, 3000)
+    write(tmp_path / "notes.txt", 1000, 0)
+
+    cleanup(str(tmp_path), str(tmp_path / "a_int8_00000000_new.safetensors"), "a_int8_00000000_", 250)
+    # the stale copy of the same model goes first, then the least recently used file
+    assert sorted(os.listdir(tmp_path)) == ["a_int8_00000000_new.safetensors", "c_int8_22222222_x.safetensors", "notes.txt"]
@@ -0,0 +1,36 @@
+import torch
+
+from comfy.taesd.taehv import TAEHV, taehv_config
+
+
+def make_taehv(**kwargs):
+    torch.manual_seed(0)
+    model = TAEHV(**kwargs)
+    # the comfy ops skip the weight init
+    for p in model.parameters():
+        torch.nn.init.normal_(p, std=0.05)
+    return model
+
+
+def test_chunked_decode_matches_single_chunk():
+    model = make_taehv()
+    latent = torch.randn(2, 16, 5, 4, 6)
+    with torch.no_grad():
+        single = torch.cat(list(model.decode_stream(latent, chunk_frames=5)), 2)
+        chunked = model.decode(latent)
+        chunks = [x.shape[2] for x in model.decode_stream(latent, chunk_frames=1)]
+
+    # the first latent frame is a single image like in the causal video VAEs
+    assert single.shape == (2, 3, 17, 32, 48)
+    assert chunks == [1, 4, 4, 4, 4]
+    assert torch.allclose(single, chunked, atol=1e-5)
+    assert single.min() >= -1.0 and single.max() <= 1.0
+
+
+def test_config_from_state_dict():
+    assert taehv_config(make_taehv().state_dict()) == {"latent_channels": 16, "time_upscale": (True, True), "patch_size": 1}
+    model = make_taehv(latent_channels=48, time_upscale=(False, True), patch_size=2)
+    assert taehv_config(model.state_dict()) == {"latent_channels": 48, "time_upscale": (False, True), "patch_size": 2}
+    with torch.no_grad():
+        out = model.decode(torch.randn(1, 48, 3, 2, 2))
+    assert out.shape == (1, 3, 5, 32, 32)
@@ -0,0 +1,40 @@
+import torch
+
+import comfy.utils
+
+
+def upscale_fn(a):
+    return torch.nn.functional.interpolate(a, scale_factor=2, mode="nearest") * 2.0 + 1.0
+
+
+def test_tiled_scale_matches_full():
+    samples = torch.randn(2, 3, 40, 52)
+    out = comfy.utils.tiled_scale_multidim(samples, upscale_fn, tile=(16, 16), overlap=4, upscale_amount=2, out_channels=3)
+    assert torch.allclose(out, upscale_fn(samples), atol=1e-5)
+
+
+def test_tile_batch_matches_single_tiles():
+    samples = torch.randn(1, 3, 37, 45)
+    calls = []
+
+    def fn(a):
+        calls.append(a.shape[0])
+        return upscale_fn(a)
+
+    single = comfy.utils.tiled_scale_multidim(samples, fn, tile=(16, 16), overlap=4, upscale_amount=2, out_channels=3)
+    tiles = len(calls)
+    calls.clear()
+    batched = comfy.utils.tiled_scale_multidim(samples, fn, tile=(16, 16), overlap=4, upscale_amount=2, out_channels=3, tile_batch=4)
+
+    assert torch.allclose(single, batched, atol=1e-5)
+    assert sum(calls) == tiles
+    assert len(calls) < tiles
+    assert max(calls) <= 4
+
+
+def test_blend_mask():
+    mask = comfy.utils.tiled_blend_mask((4, 6), (2, 2))
+    assert mask.shape == (1, 1, 4, 6)
+    assert torch.allclose(mask[0, 0, :, 0], torch.tensor([0.25, 0.5, 0.5, 0.25]))
+    # no feathering when the overlap covers the whole tile
+    assert torch.equal(comfy.utils.tiled_blend_mask((2, 3), (2, 4)), torch.ones(1, 1, 2, 3))
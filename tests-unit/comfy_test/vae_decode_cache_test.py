@@ -0,0 +1,50 @@
+import torch
+
+from comfy.vae_decode_cache import DecodeCache, latent_hash
+
+
+def test_latent_hash():
+    latent = torch.randn(1, 4, 8, 8)
+    assert latent_hash(latent) == latent_hash(latent.clone())
+    assert latent_hash(latent) != latent_hash(latent.to(torch.float16))
+    assert latent_hash(latent) != latent_hash(latent.reshape(1, 4, 4, 16))
+    changed = latent.clone()
+    changed[0, 0, 0, 0] += 1.0
+    assert latent_hash(latent) != latent_hash(changed)
+
+
+def test_byte_budget_eviction():
+    # every entry is 4KB
+    cache = DecodeCache(max_bytes=3 * 4096)
+    for i in range(3):
+        cache.put(i, torch.zeros(1024))
+    # 0 becomes the most recently used
+    assert cache.get(0) is not None
+    cache.put(3, torch.zeros(1024))
+
+    assert cache.get(1) is None
+    assert all(cache.get(i) is not None for i in (0, 2, 3))
+    assert cache.size == 3 * 4096
+
+    # too big to ever fit
+    cache.put(4, torch.zeros(4096))
+    assert cache.get(4) is None
+    assert cache.size == 3 * 4096
+
+
+def test_returns_copies():
+    cache = DecodeCache(max_bytes=4096)
+    images = torch.zeros(4, 4)
+    cache.put(0, images)
+    images += 1.0
+    out = cache.get(0)
+    assert torch.equal(out, torch.zeros(4, 4))
+    out += 1.0
+    assert torch.equal(cache.get(0), torch.zeros(4, 4))
+
+
+def test_disabled():
+    cache = DecodeCache(max_bytes=0)
+    assert not cache.enabled()
+    cache.put(0, torch.zeros(1))
+    assert cache.get(0) is None